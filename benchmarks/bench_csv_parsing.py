@@ -0,0 +1,104 @@
+# benchmarks/bench_csv_parsing.py
+"""
+Compara la ruta query() (FluxCsvParser -> TableList -> FluxRecord) con el parser
+CSV ligero de services.flux_csv sobre la misma respuesta sintética, en formato
+largo (una fila por campo) y pivotado (una fila por instante).
+
+Uso:  python -m benchmarks.bench_csv_parsing [--points 5000] [--repeat 3] [--json out.json]
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+# La configuración exige estas variables; el benchmark no conecta a InfluxDB
+for _name in ("INFLUXDB_URL", "INFLUXDB_TOKEN", "INFLUXDB_ORG", "INFLUXDB_BUCKET"):
+    os.environ.setdefault(_name, "benchmark")
+
+from influxdb_client.client.flux_csv_parser import FluxCsvParser, FluxSerializationMode
+
+from bitergy_api.models.common import HistoricalDataPoint
+from bitergy_api.services.data_provider import (
+    _columns_from_csv,
+    _columns_from_pivoted_csv,
+    _electrical_variable_name,
+    get_unit_for_measurement
+)
+from .flux_data import ELECTRICAL_SERIES, annotated_csv, pivoted_csv
+
+class _BufferedResponse:
+    """Respuesta ya leída, tal como la acepta FluxCsvParser en modo síncrono."""
+    closed = True
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def close(self):
+        pass
+
+def record_path(payload: bytes) -> int:
+    """Ruta actual: TableList completo + bucle por FluxRecord + un modelo por punto."""
+    parser = FluxCsvParser(response=_BufferedResponse(payload), serialization_mode=FluxSerializationMode.tables)
+    list(parser.generator())
+    grouped = {}
+    for table in parser.tables:
+        for record in table.records:
+            measurement = record.get_measurement()
+            field = record.get_field()
+            name = _electrical_variable_name(measurement, field)
+            grouped.setdefault(name, []).append(HistoricalDataPoint(
+                timestamp=record.get_time(), value=record.get_value(), unit=get_unit_for_measurement(measurement, field)
+            ))
+    return sum(len(points) for points in grouped.values())
+
+def lean_path(payload: bytes) -> int:
+    """Ruta ligera: CSV -> columnas planas (epoch-µs, valor)."""
+    columns = _columns_from_csv(payload.decode("utf-8"), _electrical_variable_name, "electrical")
+    return sum(len(timestamps) for _, timestamps, _ in columns.values())
+
+def pivoted_path(payload: bytes) -> int:
+    """Ruta ligera sobre la respuesta pivotada en el servidor."""
+    columns = _columns_from_pivoted_csv(payload.decode("utf-8"), _electrical_variable_name, "electrical")
+    return sum(len(timestamps) for _, timestamps, _ in columns.values())
+
+def measure(fn, payload: bytes, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = fn(payload)
+        timings.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = min(timings)
+    return {"rows": rows, "best_seconds": round(best, 4), "rows_per_second": round(rows / best), "peak_bytes": peak}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=5000, help="Points per series")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    payload = annotated_csv(["bench-site"], ELECTRICAL_SERIES, start, args.points, timedelta(seconds=1)).encode("utf-8")
+    pivoted = pivoted_csv(["bench-site"], ELECTRICAL_SERIES, start, args.points, timedelta(seconds=1)).encode("utf-8")
+    results = {
+        "payload_bytes": len(payload),
+        "pivoted_payload_bytes": len(pivoted),
+        "query_records": measure(record_path, payload, args.repeat),
+        "lean_csv": measure(lean_path, payload, args.repeat),
+        "lean_csv_pivoted": measure(pivoted_path, pivoted, args.repeat),
+    }
+    results["speedup"] = round(results["query_records"]["best_seconds"] / results["lean_csv"]["best_seconds"], 2)
+    results["pivoted_speedup"] = round(results["query_records"]["best_seconds"] / results["lean_csv_pivoted"]["best_seconds"], 2)
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
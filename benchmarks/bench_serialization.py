@@ -0,0 +1,106 @@
+# benchmarks/bench_serialization.py
+"""
+Compara la serialización de una respuesta histórica agrupada: la ruta con modelos
+(un HistoricalDataPoint por punto + response_model de FastAPI, que vuelve a
+validar antes de volcar) frente a la ruta rápida de services.serialization
+(dict JSON directo desde las columnas). Comprueba además que ambas producen
+exactamente los mismos bytes.
+
+Uso:  python -m benchmarks.bench_serialization [--points 5000] [--repeat 3] [--severity] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+# La configuración exige estas variables; el benchmark no conecta a InfluxDB
+for _name in ("INFLUXDB_URL", "INFLUXDB_TOKEN", "INFLUXDB_ORG", "INFLUXDB_BUCKET"):
+    os.environ.setdefault(_name, "benchmark")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from bitergy_api.models.electrical import GroupedHistoricalElectricalData
+from bitergy_api.services.data_provider import (
+    HISTORICAL_ELECTRICAL_MEASUREMENTS,
+    _classify_columns,
+    _columns_from_csv,
+    _electrical_variable_name,
+    _grouped_points,
+    _severity_summaries
+)
+from bitergy_api.services.serialization import grouped_historical_json
+from .flux_data import ELECTRICAL_SERIES, annotated_csv
+
+_RESPONSE_FIELD = create_response_field(name="Response_bench", type_=GroupedHistoricalElectricalData)
+
+def model_path(columns, start: datetime, end: datetime, severity: bool) -> bytes:
+    """Ruta por defecto: modelos por punto, validación del response_model y JSONResponse."""
+    if severity:
+        severities = _classify_columns("bench-site", columns, HISTORICAL_ELECTRICAL_MEASUREMENTS)
+        data = GroupedHistoricalElectricalData(
+            asset_id="bench-site", start_time=start, end_time=end,
+            data=_grouped_points(columns, severities), severity_summary=_severity_summaries(columns, severities)
+        )
+    else:
+        data = GroupedHistoricalElectricalData(asset_id="bench-site", start_time=start, end_time=end, data=_grouped_points(columns))
+    content = asyncio.run(serialize_response(field=_RESPONSE_FIELD, response_content=data, exclude_none=True))
+    return JSONResponse(content=content).body
+
+def fast_path(columns, start: datetime, end: datetime, severity: bool) -> bytes:
+    """Ruta FAST_JSON_RESPONSES: dict JSON directo desde las columnas."""
+    if severity:
+        severities = _classify_columns("bench-site", columns, HISTORICAL_ELECTRICAL_MEASUREMENTS)
+        content = grouped_historical_json(
+            "bench-site", start, end, columns, severities, _severity_summaries(columns, severities)
+        )
+    else:
+        content = grouped_historical_json("bench-site", start, end, columns)
+    return JSONResponse(content=content).body
+
+def measure(fn, args: tuple, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = fn(*args)
+        timings.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"bytes": len(body), "best_seconds": round(min(timings), 4), "peak_bytes": peak}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=5000, help="Points per series")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--severity", action="store_true", help="Include per-point severity and summaries")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    end = start + timedelta(seconds=args.points)
+    payload = annotated_csv(["bench-site"], ELECTRICAL_SERIES, start, args.points, timedelta(seconds=1))
+    columns = _columns_from_csv(payload, _electrical_variable_name, "electrical")
+    call_args = (columns, start, end, args.severity)
+
+    if model_path(*call_args) != fast_path(*call_args):
+        raise SystemExit("ERROR: fast path output differs from the response_model output")
+    results = {
+        "points": sum(len(timestamps) for _, timestamps, _ in columns.values()),
+        "severity": args.severity,
+        "model_path": measure(model_path, call_args, args.repeat),
+        "fast_path": measure(fast_path, call_args, args.repeat),
+    }
+    results["speedup"] = round(results["model_path"]["best_seconds"] / results["fast_path"]["best_seconds"], 2)
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# benchmarks/fake_influx.py
+"""
+Servidor HTTP que se hace pasar por InfluxDB 2.x para pruebas de carga locales.
+
+Responde a /ping, /health, /api/v2/query y /api/v2/write. Las consultas se
+interpretan lo justo para devolver CSV anotado plausible: instalación, rango y
+ventana salen de los parámetros (`extern`), los measurements de los filtros del
+texto Flux y cada `yield` produce su propio resultado (pivotado si la rama usa
+pivot() y recortado a `_limit` filas por tabla si usa limit()). Los valores
+salen de flux_data.InstallationProfile, así que la misma consulta devuelve
+siempre los mismos datos.
+
+Uso:  python -m benchmarks.fake_influx [--port 8086] [--installations 20] [--cadence 10]
+                                       [--latency-ms 5] [--jitter-ms 2] [--max-points 20000]
+"""
+import argparse
+import asyncio
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Sequence, Tuple
+
+from aiohttp import web
+
+from .flux_data import REALISTIC_ELECTRICAL_FIELDS, REALISTIC_PHYSICAL_FIELDS, InstallationProfile, realistic_csv_tables
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MEASUREMENT_RE = re.compile(r'r\["_measurement"\] == "(\w+)"')
+_YIELD_RE = re.compile(r'\|> yield\(name: "(\w+)"\)')
+_ALL_FIELDS = REALISTIC_ELECTRICAL_FIELDS + REALISTIC_PHYSICAL_FIELDS
+
+def installation_ids(count: int) -> List[str]:
+    """IDs de las instalaciones simuladas ("site-000", "site-001", ...)."""
+    return [f"site-{i:03d}" for i in range(count)]
+
+def _extern_value(node: Dict[str, Any]) -> Any:
+    """Valor Python de un literal del AST `extern` con el que el cliente envía los parámetros."""
+    kind = node.get("type")
+    if kind == "DateTimeLiteral":
+        text = node["value"]
+        # El cliente manda nanosegundos; datetime solo admite microsegundos
+        return datetime.strptime(text[:26], "%Y-%m-%dT%H:%M:%S.%f").replace(tzinfo=timezone.utc)
+    if kind == "DurationLiteral":
+        return timedelta(microseconds=sum(int(d["magnitude"]) for d in node["values"] if d["unit"] == "us"))
+    if kind == "UnaryExpression":
+        return -_extern_value(node["argument"])
+    if kind == "ArrayExpression":
+        return [_extern_value(element) for element in node["elements"]]
+    if kind == "IntegerLiteral":
+        return int(node["value"])
+    return node.get("value")
+
+def query_params(body: Dict[str, Any]) -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+    for statement in (body.get("extern") or {}).get("body", []):
+        assignment = statement.get("assignment") or {}
+        if "id" in assignment:
+            params[assignment["id"]["name"]] = _extern_value(assignment["init"])
+    return params
+
+class FakeInflux:
+    """Estado del servidor: instalaciones simuladas, cadencia, latencia y contadores."""
+
+    def __init__(
+        self, installations: int, cadence: timedelta, latency_ms: float, jitter_ms: float,
+        max_points: int, seed: int = 0
+    ):
+        self.profiles = {installation_id: InstallationProfile(installation_id) for installation_id in installation_ids(installations)}
+        self.cadence = cadence
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.max_points = max_points
+        self.rng = random.Random(seed)
+        self.counters = {"queries": 0, "query_errors": 0, "csv_bytes": 0, "tables": 0, "writes": 0, "lines_written": 0}
+
+    async def _delay(self) -> None:
+        delay = self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def _times(self, params: Dict[str, Any]) -> List[datetime]:
+        """Instantes a devolver: la rejilla de la ventana (o la cadencia) dentro del rango, o el último punto."""
+        step = params.get("_every") or self.cadence
+        now = datetime.now(timezone.utc)
+        if "_start" not in params:
+            # Consultas de último valor (range relativo): un único punto reciente
+            return [now - (now - _EPOCH) % self.cadence]
+        start, stop = params["_start"], params.get("_stop") or now
+        offset = params.get("_offset") or timedelta(0)
+        first = start - (start - _EPOCH - offset) % step
+        if first < start:
+            first += step
+        count = min(self.max_points, max(0, -(-(stop - first) // step)))
+        return [first + step * i for i in range(count)]
+
+    def _fields(self, measurements: Sequence[str]) -> List[Tuple[str, str]]:
+        wanted = set(measurements)
+        return [key for key in _ALL_FIELDS if key[0] in wanted]
+
+    def answer(self, flux: str, params: Dict[str, Any]) -> str:
+        """CSV anotado para una consulta del servicio."""
+        if "schema.tagValues" in flux:
+            rows = "".join(f",_result,0,{installation_id}\r\n" for installation_id in self.profiles)
+            return "#datatype,string,long,string\r\n#group,false,false,false\r\n#default,_result,,\r\n,result,table,_value\r\n" + rows + "\r\n"
+        if 'first(column: "_time")' in flux:
+            return "" # Buckets de rollup vacíos: el worker empieza desde cero
+
+        ids = params.get("_installation_ids") or [params.get("_installation_id")]
+        profiles = [self.profiles[i] for i in ids if i in self.profiles]
+        if not profiles:
+            return ""
+        filters = [line for line in flux.splitlines() if '_measurement"] ==' in line]
+        all_measurements = _MEASUREMENT_RE.findall(filters[0]) if filters else []
+        times = self._times(params)
+
+        # Cada yield es un resultado; sus measurements son los del último filtro de su rama
+        parts = _YIELD_RE.split(flux)
+        branches = list(zip(parts[0::2], parts[1::2])) or [(flux, "_result")]
+        chunks: List[str] = []
+        table = 0
+        for profile in profiles:
+            for branch, result in branches:
+                filters = [line for line in branch.splitlines() if '_measurement"] ==' in line]
+                measurements = _MEASUREMENT_RE.findall(filters[-1]) if filters else all_measurements
+                fields = self._fields(measurements)
+                branch_times = times[:params["_limit"]] if "limit(" in branch else times
+                for chunk in realistic_csv_tables(profile, fields, branch_times, result, "pivot(" in branch, table):
+                    chunks.append(chunk)
+                    table += 1
+        self.counters["tables"] += len(chunks)
+        return "".join(chunks)
+
+    # --- Handlers HTTP ---
+
+    async def ping(self, request: web.Request) -> web.Response:
+        return web.Response(status=204, headers={"X-Influxdb-Version": "v2.7.0-fake"})
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"name": "influxdb", "status": "pass", "version": "v2.7.0-fake"})
+
+    async def query(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        await self._delay()
+        self.counters["queries"] += 1
+        try:
+            text = self.answer(body.get("query", ""), query_params(body))
+        except Exception as e:
+            self.counters["query_errors"] += 1
+            print(f"ERROR: Fake InfluxDB could not answer query: {e}")
+            return web.json_response({"code": "invalid", "message": str(e)}, status=400)
+        payload = text.encode("utf-8")
+        self.counters["csv_bytes"] += len(payload)
+        response = web.Response(body=payload, content_type="text/csv", charset="utf-8")
+        response.enable_compression() # Solo si el cliente envía Accept-Encoding: gzip
+        return response
+
+    async def write(self, request: web.Request) -> web.Response:
+        text = await request.text()
+        await self._delay()
+        self.counters["writes"] += 1
+        self.counters["lines_written"] += sum(1 for line in text.splitlines() if line.strip())
+        return web.Response(status=204)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.counters)
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/ping", self.ping)
+        app.router.add_get("/health", self.health)
+        app.router.add_post("/api/v2/query", self.query)
+        app.router.add_post("/api/v2/write", self.write)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8086)
+    parser.add_argument("--installations", type=int, default=20, help="Number of simulated installations (site-000, site-001, ...)")
+    parser.add_argument("--cadence", type=float, default=10.0, help="Seconds between raw points")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Base latency added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=2.0, help="Random +/- variation of the latency")
+    parser.add_argument("--max-points", type=int, default=20_000, help="Cap on points per series and query")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeInflux(
+        args.installations, timedelta(seconds=args.cadence), args.latency_ms, args.jitter_ms, args.max_points, args.seed
+    )
+    print(f"Fake InfluxDB on http://{args.host}:{args.port} with {args.installations} installations")
+    web.run_app(fake.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# benchmarks/flux_data.py
+"""Generadores de CSV anotado de Flux con series eléctricas y físicas sintéticas."""
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# (measurement, field, valor base, amplitud)
+ELECTRICAL_SERIES: List[Tuple[str, str, float, float]] = [
+    ("voltage", "phase_a", 230.0, 6.0), ("voltage", "phase_b", 231.0, 6.0), ("voltage", "phase_c", 229.0, 6.0),
+    ("current", "phase_a", 42.0, 15.0), ("current", "phase_b", 40.0, 15.0), ("current", "phase_c", 44.0, 15.0),
+    ("active_power", "phase_a", 9.5, 3.0), ("active_power", "phase_b", 9.2, 3.0), ("active_power", "phase_c", 10.1, 3.0),
+    ("active_power", "total", 28.8, 9.0),
+    ("power_factor", "phase_a", 0.95, 0.03), ("power_factor", "phase_b", 0.94, 0.03), ("power_factor", "phase_c", 0.96, 0.03),
+    ("frequency", "value", 50.0, 0.05),
+    ("energy", "total_kwh", 0.0, 0.0), # acumulativo: crece de forma monótona
+]
+PHYSICAL_SERIES: List[Tuple[str, str, float, float]] = [
+    ("temperature", "value", 24.0, 8.0), ("humidity", "value", 55.0, 20.0), ("level", "value", 1.5, 0.4),
+]
+
+_HEADER = (
+    "#datatype,string,long,dateTime:RFC3339,dateTime:RFC3339,dateTime:RFC3339,double,string,string,string\r\n"
+    "#group,false,false,true,true,false,false,true,true,true\r\n"
+    "#default,_result,,,,,,,,\r\n"
+    ",result,table,_start,_stop,_time,_value,_field,_measurement,installation_id\r\n"
+)
+
+def rfc3339(time: datetime) -> str:
+    return time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f").rstrip("0").rstrip(".") + "Z"
+
+def series_value(measurement: str, base: float, amplitude: float, i: int, rng: random.Random) -> float:
+    """Onda diaria con ruido; la energía es un contador creciente."""
+    if measurement == "energy":
+        return round(i * 0.008, 3)
+    daily = math.sin(2 * math.pi * (i % 86400) / 86400)
+    return round(base + amplitude * daily + rng.gauss(0, amplitude * 0.05), 4)
+
+def annotated_csv_chunks(
+    installation_ids: List[str], series: List[Tuple[str, str, float, float]],
+    start: datetime, points: int, cadence: timedelta, seed: Optional[int] = 0
+) -> Iterator[str]:
+    """Genera una respuesta CSV anotada (una tabla por serie) en bloques de texto."""
+    rng = random.Random(seed)
+    start_text = rfc3339(start)
+    stop_text = rfc3339(start + cadence * points)
+    table = 0
+    for installation_id in installation_ids:
+        for measurement, field, base, amplitude in series:
+            lines = [_HEADER]
+            for i in range(points):
+                value = series_value(measurement, base, amplitude, i, rng)
+                lines.append(
+                    f",,{table},{start_text},{stop_text},{rfc3339(start + cadence * i)},{value},{field},{measurement},{installation_id}\r\n"
+                )
+            lines.append("\r\n")
+            table += 1
+            yield "".join(lines)
+
+def annotated_csv(
+    installation_ids: List[str], series: List[Tuple[str, str, float, float]],
+    start: datetime, points: int, cadence: timedelta, seed: Optional[int] = 0
+) -> str:
+    return "".join(annotated_csv_chunks(installation_ids, series, start, points, cadence, seed))
+
+def pivoted_csv_chunks(
+    installation_ids: List[str], series: List[Tuple[str, str, float, float]],
+    start: datetime, points: int, cadence: timedelta, seed: Optional[int] = 0
+) -> Iterator[str]:
+    """
+    Misma serie sintética tras keep() + pivot(): una tabla por measurement y una
+    fila por instante, con una columna por campo.
+    """
+    rng = random.Random(seed)
+    table = 0
+    for _ in installation_ids:
+        # Mismo orden de generación que annotated_csv_chunks, para que ambos formatos lleven los mismos valores
+        by_measurement: dict = {}
+        for measurement, field, base, amplitude in series:
+            values = [series_value(measurement, base, amplitude, i, rng) for i in range(points)]
+            by_measurement.setdefault(measurement, []).append((field, values))
+        for measurement, fields in by_measurement.items():
+            names = [field for field, _ in fields]
+            lines = [
+                "#datatype,string,long,dateTime:RFC3339,string" + ",double" * len(names) + "\r\n",
+                "#group,false,false,false,true" + ",false" * len(names) + "\r\n",
+                "#default,_result,,,," + "," * (len(names) - 1) + "\r\n",
+                ",result,table,_time,_measurement," + ",".join(names) + "\r\n",
+            ]
+            for i in range(points):
+                row = ",".join(str(values[i]) for _, values in fields)
+                lines.append(f",,{table},{rfc3339(start + cadence * i)},{measurement},{row}\r\n")
+            lines.append("\r\n")
+            table += 1
+            yield "".join(lines)
+
+def pivoted_csv(
+    installation_ids: List[str], series: List[Tuple[str, str, float, float]],
+    start: datetime, points: int, cadence: timedelta, seed: Optional[int] = 0
+) -> str:
+    return "".join(pivoted_csv_chunks(installation_ids, series, start, points, cadence, seed))
+
+# --- Series realistas por instalación (usadas por el servidor InfluxDB falso) ---
+
+# (measurement, field) que genera InstallationProfile, en el orden en que se emiten
+REALISTIC_ELECTRICAL_FIELDS: List[Tuple[str, str]] = [
+    (measurement, field)
+    for measurement in ("voltage", "current", "active_power", "apparent_power", "reactive_power", "power_factor")
+    for field in ("phase_a", "phase_b", "phase_c")
+] + [
+    ("active_power", "total"), ("apparent_power", "total"), ("reactive_power", "total"),
+    ("frequency", "value"), ("energy", "total_kwh"),
+]
+REALISTIC_PHYSICAL_FIELDS: List[Tuple[str, str]] = [("temperature", "value"), ("humidity", "value"), ("level", "value")]
+
+_PHASES = ("phase_a", "phase_b", "phase_c")
+# Referencia para el contador de energía (evita lecturas de decenas de millones de kWh)
+_ENERGY_ORIGIN = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+
+def _noise(x: float) -> float:
+    """Ruido determinista en [-1, 1): el mismo instante da siempre el mismo valor, sin estado."""
+    return (math.sin(x * 12.9898) * 43758.5453) % 1.0 * 2.0 - 1.0
+
+class InstallationProfile:
+    """
+    Parámetros estables de una instalación (derivados de su ID) y valores coherentes
+    entre sí para cualquier instante: curva de carga diaria con pico de tarde y
+    fines de semana más bajos, desequilibrio entre fases, caída de tensión con la
+    carga, P = V·I·cosφ, contador de energía monótono y variables físicas con su
+    propio ciclo diario.
+    """
+
+    def __init__(self, installation_id: str):
+        rng = random.Random(installation_id)
+        self.installation_id = installation_id
+        self.peak_kw = rng.uniform(15.0, 60.0)
+        self.imbalance = [1.0 + rng.uniform(-0.08, 0.08) for _ in _PHASES]
+        self.nominal_voltage = rng.choice((229.0, 230.0, 231.0))
+        self.base_temperature = rng.uniform(18.0, 26.0)
+        self.tank_period = rng.uniform(4.0, 12.0) * 3600
+        self.seed = rng.uniform(0.0, 1000.0)
+
+    def load(self, epoch_seconds: float) -> float:
+        """Fracción de la potencia de pico (0..1) según la hora y el día de la semana."""
+        hour = (epoch_seconds % 86400) / 3600
+        daytime = max(0.0, math.sin(math.pi * (hour - 6) / 12))
+        evening = math.exp(-((hour - 19.5) / 1.5) ** 2)
+        weekday = int(epoch_seconds // 86400 + 3) % 7 # 0 = lunes (el 1/1/1970 fue jueves)
+        factor = 0.7 if weekday >= 5 else 1.0
+        return min(1.0, factor * (0.3 + 0.45 * daytime + 0.25 * evening) * (1.0 + 0.03 * _noise(epoch_seconds + self.seed)))
+
+    def values(self, epoch_seconds: float, fields: Sequence[Tuple[str, str]]) -> List[float]:
+        """Valor de cada (measurement, field) de `fields` en el instante dado."""
+        sample = self.sample(epoch_seconds)
+        return [sample[key] for key in fields]
+
+    def sample(self, epoch_seconds: float) -> Dict[Tuple[str, str], float]:
+        t = epoch_seconds
+        load = self.load(t)
+        sample: Dict[Tuple[str, str], float] = {}
+        totals = [0.0, 0.0, 0.0]
+        for p, phase in enumerate(_PHASES):
+            current = self.peak_kw * 1000 / 3 / self.nominal_voltage * load * self.imbalance[p]
+            voltage = self.nominal_voltage - 0.04 * current + 1.2 * _noise(t + self.seed + p)
+            power_factor = min(1.0, 0.86 + 0.1 * load + 0.01 * _noise(t * 0.5 + self.seed + p))
+            apparent = voltage * current / 1000
+            active = apparent * power_factor
+            reactive = math.sqrt(max(0.0, apparent * apparent - active * active))
+            sample[("voltage", phase)] = round(voltage, 2)
+            sample[("current", phase)] = round(current, 3)
+            sample[("power_factor", phase)] = round(power_factor, 3)
+            sample[("active_power", phase)] = round(active, 3)
+            sample[("apparent_power", phase)] = round(apparent, 3)
+            sample[("reactive_power", phase)] = round(reactive, 3)
+            totals[0] += active
+            totals[1] += apparent
+            totals[2] += reactive
+        sample[("active_power", "total")] = round(totals[0], 3)
+        sample[("apparent_power", "total")] = round(totals[1], 3)
+        sample[("reactive_power", "total")] = round(totals[2], 3)
+        sample[("frequency", "value")] = round(50.0 + 0.02 * _noise(t * 0.1 + self.seed), 3)
+        # Integral cerrada de una potencia media con oscilación diaria: siempre creciente
+        mean_kw = self.peak_kw * 0.5
+        elapsed = t - _ENERGY_ORIGIN
+        energy = mean_kw * (elapsed / 3600) - mean_kw * 0.3 * 86400 / (2 * math.pi * 3600) * math.cos(2 * math.pi * elapsed / 86400)
+        sample[("energy", "total_kwh")] = round(max(0.0, energy + 10_000.0), 3)
+
+        hour = (t % 86400) / 3600
+        temperature = self.base_temperature + 6.0 * math.sin(2 * math.pi * (hour - 9) / 24) + 0.3 * _noise(t + self.seed * 2)
+        sample[("temperature", "value")] = round(temperature, 2)
+        sample[("humidity", "value")] = round(min(100.0, max(5.0, 60.0 - 1.5 * (temperature - self.base_temperature) + 2.0 * _noise(t + self.seed * 3))), 2)
+        sample[("level", "value")] = round(0.5 + 1.5 * ((t + self.seed * 60) % self.tank_period) / self.tank_period, 3)
+        return sample
+
+def realistic_csv_tables(
+    profile: InstallationProfile, fields: Sequence[Tuple[str, str]], times: Sequence[datetime],
+    result: str = "_result", pivot: bool = False, first_table: int = 0
+) -> Iterator[str]:
+    """
+    Tablas CSV anotadas con los valores de `profile` en los instantes `times`: una
+    por serie o, con `pivot`, una por measurement con una columna por campo.
+    """
+    if not fields or not times:
+        return
+    time_texts = [rfc3339(t) for t in times]
+    samples = [profile.sample(t.timestamp()) for t in times]
+    table = first_table
+    if not pivot:
+        start_text, stop_text = time_texts[0], time_texts[-1]
+        for measurement, field in fields:
+            lines = [_HEADER.replace("#default,_result,", f"#default,{result},")]
+            for time_text, sample in zip(time_texts, samples):
+                lines.append(
+                    f",{result},{table},{start_text},{stop_text},{time_text},{sample[(measurement, field)]},{field},{measurement},{profile.installation_id}\r\n"
+                )
+            lines.append("\r\n")
+            table += 1
+            yield "".join(lines)
+        return
+
+    by_measurement: Dict[str, List[str]] = {}
+    for measurement, field in fields:
+        by_measurement.setdefault(measurement, []).append(field)
+    for measurement, names in by_measurement.items():
+        lines = [
+            "#datatype,string,long,dateTime:RFC3339,string" + ",double" * len(names) + "\r\n",
+            "#group,false,false,false,true" + ",false" * len(names) + "\r\n",
+            f"#default,{result},,," + "," * len(names) + "\r\n",
+            ",result,table,_time,_measurement," + ",".join(names) + "\r\n",
+        ]
+        for time_text, sample in zip(time_texts, samples):
+            row = ",".join(str(sample[(measurement, name)]) for name in names)
+            lines.append(f",{result},{table},{time_text},{measurement},{row}\r\n")
+        lines.append("\r\n")
+        table += 1
+        yield "".join(lines)
@@ -0,0 +1,401 @@
+# benchmarks/load_test.py
+"""
+Prueba de carga reproducible de la API contra un InfluxDB falso local.
+
+Arranca benchmarks.fake_influx y la API (uvicorn) como procesos aparte, recorre
+los escenarios (uno por endpoint y formato) con una concurrencia fija y guarda
+por escenario: throughput, latencias p50/p95/p99, bytes enviados por la API,
+consultas y bytes servidos por InfluxDB y memoria residente de la API. Los
+resultados van a JSON con el commit actual, para comparar entre commits.
+
+Uso:  python -m benchmarks.load_test [--concurrency 16] [--requests 200] [--installations 20]
+                                     [--cadence 10] [--latency-ms 5] [--scenario NAME ...]
+                                     [--env KEY=VALUE ...] [--json out.json]
+      python -m benchmarks.load_test --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import aiohttp
+
+from .fake_influx import installation_ids
+
+API_PREFIX = "/api/v1"
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class Call(NamedTuple):
+    """Una petición de un escenario. `kind` es "http", "sse" (hasta el primer evento) o "ws" (hasta el primer mensaje)."""
+    method: str
+    path: str
+    params: Optional[Dict[str, str]] = None
+    body: Optional[Any] = None
+    kind: str = "http"
+
+class Scenario(NamedTuple):
+    name: str
+    build: Callable[[random.Random, List[str], datetime], Call]
+
+def _range(rng: random.Random, anchor: datetime, span: timedelta) -> Dict[str, str]:
+    """Rango de `span` que acaba en un día aleatorio de la última semana (varía la clave de caché)."""
+    end = anchor - timedelta(days=rng.randint(0, 6))
+    return {"start_time": (end - span).isoformat(), "end_time": end.isoformat()}
+
+def _historical(kind: str, span: timedelta, **extra: str) -> Callable[[random.Random, List[str], datetime], Call]:
+    def build(rng: random.Random, ids: List[str], anchor: datetime) -> Call:
+        params = _range(rng, anchor, span)
+        params.update(extra)
+        return Call("GET", f"{API_PREFIX}/installations/{rng.choice(ids)}/{kind}/historical", params)
+    return build
+
+def _stats(kind: str) -> Callable[[random.Random, List[str], datetime], Call]:
+    def build(rng: random.Random, ids: List[str], anchor: datetime) -> Call:
+        params = _range(rng, anchor, timedelta(days=7))
+        params.update(window="day", aggregates="min,max,mean,p95,consumption")
+        return Call("GET", f"{API_PREFIX}/installations/{rng.choice(ids)}/{kind}/stats", params)
+    return build
+
+def _per_installation(path: str, kind: str = "http", method: str = "GET") -> Callable[[random.Random, List[str], datetime], Call]:
+    def build(rng: random.Random, ids: List[str], anchor: datetime) -> Call:
+        return Call(method, API_PREFIX + path.format(id=rng.choice(ids)), kind=kind)
+    return build
+
+def _fleet(method: str, kind: str = "http") -> Callable[[random.Random, List[str], datetime], Call]:
+    def build(rng: random.Random, ids: List[str], anchor: datetime) -> Call:
+        chosen = rng.sample(ids, min(len(ids), 20))
+        if method == "POST":
+            return Call("POST", f"{API_PREFIX}/installations/realtime", body={"ids": chosen})
+        path = "/installations/realtime/events" if kind == "sse" else "/installations/realtime/ws" if kind == "ws" else "/installations/realtime"
+        return Call("GET", API_PREFIX + path, {"ids": ",".join(chosen)}, kind=kind)
+    return build
+
+def _ingest(samples: int) -> Callable[[random.Random, List[str], datetime], Call]:
+    def build(rng: random.Random, ids: List[str], anchor: datetime) -> Call:
+        start = anchor - timedelta(seconds=samples * 10)
+        electrical = [
+            {
+                "timestamp": (start + timedelta(seconds=i * 10)).isoformat(),
+                "voltage": {"a": rng.uniform(225, 235), "b": rng.uniform(225, 235), "c": rng.uniform(225, 235)},
+                "current": {"a": rng.uniform(5, 50), "b": rng.uniform(5, 50), "c": rng.uniform(5, 50)},
+                "frequency": rng.uniform(49.9, 50.1),
+            }
+            for i in range(samples)
+        ]
+        return Call("POST", f"{API_PREFIX}/installations/{rng.choice(ids)}/measurements", body={"electrical": electrical})
+    return build
+
+# Un escenario por endpoint (y por formato en los históricos)
+SCENARIOS: List[Scenario] = [
+    Scenario("root", lambda rng, ids, anchor: Call("GET", "/")),
+    Scenario("electrical_realtime", _per_installation("/installations/{id}/electrical/realtime")),
+    Scenario("physical_realtime", _per_installation("/installations/{id}/physical/realtime")),
+    Scenario("snapshot_realtime", _per_installation("/installations/{id}/realtime")),
+    Scenario("fleet_realtime_get", _fleet("GET")),
+    Scenario("fleet_realtime_post", _fleet("POST")),
+    Scenario("electrical_historical_json", _historical("electrical", timedelta(days=1), max_points="1000")),
+    Scenario("electrical_historical_severity", _historical("electrical", timedelta(days=1), max_points="1000", include_severity="true")),
+    Scenario("electrical_historical_columnar", _historical("electrical", timedelta(days=1), max_points="1000", format="columnar")),
+    Scenario("electrical_historical_ndjson", _historical("electrical", timedelta(days=1), max_points="1000", format="ndjson")),
+    Scenario("electrical_historical_raw", _historical("electrical", timedelta(hours=2))),
+    Scenario("electrical_historical_page", _historical("electrical", timedelta(days=7), limit="2000")),
+    Scenario("electrical_historical_90d", _historical("electrical", timedelta(days=90), resolution="1h")),
+    Scenario("physical_historical_json", _historical("physical", timedelta(days=1), max_points="1000")),
+    Scenario("physical_historical_columnar", _historical("physical", timedelta(days=1), max_points="1000", format="columnar")),
+    Scenario("physical_historical_ndjson", _historical("physical", timedelta(days=1), max_points="1000", format="ndjson")),
+    Scenario("electrical_stats", _stats("electrical")),
+    Scenario("physical_stats", _stats("physical")),
+    Scenario("sse_installation", _per_installation("/installations/{id}/realtime/events", kind="sse")),
+    Scenario("sse_fleet", _fleet("GET", kind="sse")),
+    Scenario("ws_installation", _per_installation("/installations/{id}/realtime/ws", kind="ws")),
+    Scenario("ws_fleet", _fleet("GET", kind="ws")),
+    Scenario("ingest_batch", _ingest(100)),
+    Scenario("admin_cache", lambda rng, ids, anchor: Call("GET", f"{API_PREFIX}/admin/cache")),
+    Scenario("admin_rollups", lambda rng, ids, anchor: Call("GET", f"{API_PREFIX}/admin/rollups")),
+    Scenario("admin_thresholds", _per_installation("/admin/thresholds/{id}")),
+    Scenario("admin_thresholds_reload", lambda rng, ids, anchor: Call("POST", f"{API_PREFIX}/admin/thresholds/reload")),
+]
+
+def thresholds_config(ids: List[str]) -> Dict[str, Any]:
+    """Umbrales para las instalaciones simuladas, con defaults, un grupo y algún ajuste por instalación."""
+    return {
+        "defaults": {
+            "voltage": {"critical_low": 207, "low": 218.5, "high": 241.5, "critical_high": 253},
+            "frequency": {"critical_low": 48, "low": 49.5, "high": 50.5, "critical_high": 52},
+            "temperature": {"low": 5, "high": 30, "critical_high": 40},
+            "humidity": {"high": 70, "critical_high": 85},
+        },
+        "groups": {"industrial": {"thresholds": {"current": {"high": 60, "critical_high": 80}}}},
+        "installations": {
+            installation_id: {"group": "industrial", "thresholds": {"temperature": {"high": 28}} if i % 2 else {}}
+            for i, installation_id in enumerate(ids)
+        },
+    }
+
+# --- Procesos ---
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _memory(pid: int) -> Dict[str, Optional[int]]:
+    """RSS actual y pico (VmRSS/VmHWM) de un proceso; None fuera de Linux."""
+    memory: Dict[str, Optional[int]] = {"rss_bytes": None, "peak_rss_bytes": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    memory["rss_bytes"] = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    memory["peak_rss_bytes"] = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return memory
+
+async def _wait_ready(session: aiohttp.ClientSession, url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with session.get(url) as response:
+                if response.status < 500:
+                    return
+        except aiohttp.ClientError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+        await asyncio.sleep(0.2)
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=_REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# --- Ejecución de peticiones ---
+
+async def _perform(session: aiohttp.ClientSession, base_url: str, call: Call) -> Tuple[int, int]:
+    """Ejecuta una petición y devuelve (status, bytes recibidos)."""
+    url = base_url + call.path
+    if call.kind == "ws":
+        async with session.ws_connect(url.replace("http", "ws", 1), params=call.params) as ws:
+            message = await ws.receive(timeout=30)
+            if message.type != aiohttp.WSMsgType.TEXT:
+                return 599, 0
+            return 200, len(message.data.encode("utf-8"))
+    async with session.request(call.method, url, params=call.params, json=call.body) as response:
+        if call.kind == "sse" and response.status == 200:
+            # Solo hasta el primer evento (la instantánea completa); después se cierra
+            received = 0
+            async for line in response.content:
+                received += len(line)
+                if line.startswith(b"data:"):
+                    break
+            response.close()
+            return response.status, received
+        payload = await response.read()
+        return response.status, len(payload)
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Percentil por rango más cercano."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+async def run_scenario(
+    session: aiohttp.ClientSession, base_url: str, scenario: Scenario, ids: List[str],
+    total: int, concurrency: int, warmup: int, seed: int
+) -> Dict[str, Any]:
+    rng = random.Random(f"{seed}:{scenario.name}")
+    anchor = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    calls = [scenario.build(rng, ids, anchor) for _ in range(total + warmup)]
+    for call in calls[:warmup]:
+        try:
+            await _perform(session, base_url, call)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+
+    pending = iter(calls[warmup:])
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    received = 0
+
+    async def worker():
+        nonlocal received
+        for call in pending:
+            t0 = time.perf_counter()
+            try:
+                status, size = await _perform(session, base_url, call)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, size = 599, 0
+                print(f"WARN: {scenario.name} request failed: {type(e).__name__}: {e}")
+            latencies.append(time.perf_counter() - t0)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            received += size
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(n for status, n in statuses.items() if int(status) >= 400),
+        "status": statuses,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            name: round(value * 1000, 2) if value is not None else None
+            for name, value in (
+                ("p50", _percentile(latencies, 50)), ("p95", _percentile(latencies, 95)),
+                ("p99", _percentile(latencies, 99)), ("max", latencies[-1] if latencies else None),
+            )
+        },
+        "bytes_sent": received,
+        "bytes_per_request": round(received / len(latencies)) if latencies else 0,
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    wanted = set(args.scenario or [])
+    unknown = wanted - {s.name for s in SCENARIOS}
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    scenarios = [s for s in SCENARIOS if not wanted or s.name in wanted]
+    ids = installation_ids(args.installations)
+
+    influx_port, api_port = _free_port(), _free_port()
+    influx = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_influx", "--port", str(influx_port),
+         "--installations", str(args.installations), "--cadence", str(args.cadence),
+         "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms)],
+        cwd=_REPO_ROOT, stdout=subprocess.DEVNULL
+    )
+    thresholds = tempfile.NamedTemporaryFile("w", suffix=".json", prefix="load-test-thresholds-", delete=False)
+    with thresholds:
+        json.dump(thresholds_config(ids), thresholds)
+    env = dict(os.environ)
+    env.update(
+        INFLUXDB_URL=f"http://127.0.0.1:{influx_port}", INFLUXDB_TOKEN="load-test",
+        INFLUXDB_ORG="load-test", INFLUXDB_BUCKET="load-test", THRESHOLDS_FILE=thresholds.name
+    )
+    env.update(dict(item.split("=", 1) for item in args.env))
+    api_log = open(args.api_log, "w") if args.api_log else subprocess.DEVNULL
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bitergy_api.main:app", "--host", "127.0.0.1",
+         "--port", str(api_port), "--log-level", "warning", "--no-access-log"],
+        cwd=_REPO_ROOT, env=env, stdout=api_log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{api_port}"
+    influx_url = f"http://127.0.0.1:{influx_port}"
+    results: Dict[str, Any] = {}
+    try:
+        timeout = aiohttp.ClientTimeout(total=args.timeout)
+        connector = aiohttp.TCPConnector(limit=args.concurrency * 2)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            await _wait_ready(session, influx_url + "/ping")
+            await _wait_ready(session, base_url + "/")
+            for scenario in scenarios:
+                async with session.get(influx_url + "/stats") as response:
+                    before = await response.json()
+                result = await run_scenario(
+                    session, base_url, scenario, ids, args.requests, args.concurrency, args.warmup, args.seed
+                )
+                async with session.get(influx_url + "/stats") as response:
+                    after = await response.json()
+                result["influx"] = {name: after[name] - before[name] for name in ("queries", "csv_bytes", "writes")}
+                result["api_memory"] = _memory(api.pid)
+                results[scenario.name] = result
+                latency = result["latency_ms"]
+                print(
+                    f"{scenario.name:32s} {result['throughput_rps']:>9} req/s  p50 {latency['p50']:>8} ms  "
+                    f"p95 {latency['p95']:>8} ms  p99 {latency['p99']:>8} ms  errors {result['errors']}"
+                )
+    finally:
+        api_memory = _memory(api.pid)
+        for process in (api, influx):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if args.api_log:
+            api_log.close()
+        os.unlink(thresholds.name)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                name: getattr(args, name)
+                for name in ("concurrency", "requests", "warmup", "installations", "cadence", "latency_ms", "jitter_ms", "seed", "env")
+            },
+        },
+        "api_peak_rss_bytes": api_memory["peak_rss_bytes"],
+        "scenarios": results,
+    }
+
+def compare(before_path: str, after_path: str) -> None:
+    """Tabla de cambios de throughput y p95 por escenario entre dos ficheros de resultados."""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    for name, new in after["scenarios"].items():
+        old = before["scenarios"].get(name)
+        if old is None:
+            continue
+        def change(a, b):
+            return f"{(b - a) / a * 100:+7.1f}%" if a and b is not None else "    n/a"
+        print(
+            f"{name:32s} req/s {old['throughput_rps']:>9} -> {new['throughput_rps']:>9} {change(old['throughput_rps'], new['throughput_rps'])}"
+            f"   p95 {old['latency_ms']['p95']:>8} -> {new['latency_ms']['p95']:>8} ms {change(old['latency_ms']['p95'], new['latency_ms']['p95'])}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight per scenario")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests before each scenario")
+    parser.add_argument("--installations", type=int, default=20)
+    parser.add_argument("--cadence", type=float, default=10.0, help="Seconds between raw points in the fake InfluxDB")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Fake InfluxDB latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Client timeout per request, in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenario", action="append", help="Run only this scenario (repeatable)")
+    parser.add_argument("--env", action="append", default=[], help="Extra API setting, e.g. FAST_JSON_RESPONSES=true (repeatable)")
+    parser.add_argument("--api-log", help="Write the API output to this file")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files and exit")
+    parser.add_argument("--list", action="store_true", help="List scenarios and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.list:
+        print("\n".join(s.name for s in SCENARIOS))
+        return
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# benchmarks/startup.py
+"""
+Benchmark de arranque en frío de la API.
+
+Mide, cada vez en un proceso nuevo:
+  - import: lo que tarda `import bitergy_api.main` (y si se han cargado módulos
+    que deberían importarse de forma diferida, como influxdb_client o aiohttp, o
+    se ha creado ya la configuración);
+  - primera petición: desde lanzar uvicorn hasta el primer 200 de un endpoint
+    realtime servido a través de InfluxDB (benchmarks.fake_influx), lifespan incluido.
+
+Con --max-import-ms / --max-first-request-ms el proceso sale con código 1 si la
+mediana supera el presupuesto, para detectar regresiones de arranque en CI.
+
+Uso:  python -m benchmarks.startup [--runs 5] [--path /api/v1/installations/site-000/electrical/realtime]
+                                   [--env KEY=VALUE ...] [--max-import-ms 1500] [--max-first-request-ms 3000]
+                                   [--json out.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .load_test import _REPO_ROOT, _free_port, _git_commit
+
+# Módulos pesados que la app solo debe importar al crear el cliente (lifespan)
+LAZY_MODULES = ("influxdb_client", "aiohttp", "reactivex")
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import bitergy_api.main
+elapsed = time.perf_counter() - started
+from bitergy_api.core.config import get_settings
+print(json.dumps({
+    "seconds": elapsed, "loaded": [m for m in %r if m in sys.modules],
+    "settings": get_settings.cache_info().currsize > 0,
+}))
+""" % (LAZY_MODULES,)
+
+def _api_env(influx_port: int, extra: List[str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(
+        INFLUXDB_URL=f"http://127.0.0.1:{influx_port}", INFLUXDB_TOKEN="startup",
+        INFLUXDB_ORG="startup", INFLUXDB_BUCKET="startup"
+    )
+    env.update(dict(item.split("=", 1) for item in extra))
+    return env
+
+def measure_import(env: Dict[str, str]) -> Dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE], cwd=_REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure_first_request(env: Dict[str, str], path: str, timeout: float) -> float:
+    """Segundos desde lanzar uvicorn hasta el primer 200 en `path`."""
+    port = _free_port()
+    started = time.perf_counter()
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bitergy_api.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=_REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        url = f"http://127.0.0.1:{port}{path}"
+        while True:
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            if api.poll() is not None:
+                raise RuntimeError(f"API exited with code {api.returncode} before answering {path}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"{path} did not answer 200 within {timeout:.0f}s")
+            time.sleep(0.01)
+    finally:
+        api.terminate()
+        try:
+            api.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            api.kill()
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    ms = [v * 1000 for v in values]
+    return {"median": round(statistics.median(ms), 1), "min": round(min(ms), 1), "max": round(max(ms), 1)}
+
+def run(args) -> Dict[str, Any]:
+    influx_port = _free_port()
+    influx = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_influx", "--port", str(influx_port), "--installations", "3",
+         "--latency-ms", "1", "--jitter-ms", "0"],
+        cwd=_REPO_ROOT, stdout=subprocess.DEVNULL
+    )
+    env = _api_env(influx_port, args.env)
+    try:
+        # El InfluxDB falso debe estar listo para no medir su propio arranque
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{influx_port}/ping", timeout=1).close()
+                break
+            except (urllib.error.URLError, ConnectionError):
+                if time.monotonic() > deadline:
+                    raise RuntimeError("Fake InfluxDB did not start")
+                time.sleep(0.1)
+        imports = [measure_import(env) for _ in range(args.runs)]
+        first_requests = [measure_first_request(env, args.path, args.timeout) for _ in range(args.runs)]
+    finally:
+        influx.terminate()
+        try:
+            influx.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            influx.kill()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {"runs": args.runs, "path": args.path, "env": args.env},
+        },
+        "import_ms": _summary([i["seconds"] for i in imports]),
+        "eagerly_loaded": sorted({m for i in imports for m in i["loaded"]}),
+        "settings_at_import": any(i["settings"] for i in imports),
+        "first_request_ms": _summary(first_requests),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--path", default="/api/v1/installations/site-000/electrical/realtime", help="Endpoint for the first request")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the first 200")
+    parser.add_argument("--env", action="append", default=[], help="Extra API setting, e.g. ALERTS_ENABLED=true (repeatable)")
+    parser.add_argument("--max-import-ms", type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument("--max-first-request-ms", type=float, help="Fail if the median time to first request exceeds this")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    imports, first = results["import_ms"], results["first_request_ms"]
+    print(f"import          median {imports['median']:>8} ms  min {imports['min']:>8} ms  max {imports['max']:>8} ms")
+    print(f"first request   median {first['median']:>8} ms  min {first['min']:>8} ms  max {first['max']:>8} ms")
+    if results["eagerly_loaded"]:
+        print(f"WARN: imported at startup instead of lazily: {', '.join(results['eagerly_loaded'])}")
+    if results["settings_at_import"]:
+        print("WARN: Settings() is created when importing bitergy_api.main")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    failures: List[str] = []
+    budgets: Dict[str, Optional[float]] = {"import": args.max_import_ms, "first request": args.max_first_request_ms}
+    for name, summary in (("import", imports), ("first request", first)):
+        budget = budgets[name]
+        if budget is not None and summary["median"] > budget:
+            failures.append(f"{name} median {summary['median']} ms > budget {budget} ms")
+    if failures:
+        print("ERROR: " + "; ".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# core/compression.py
+import gzip
+from time import perf_counter
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from .metrics import add_phase, timed_phase
+
+# Cuerpos a partir de este tamaño se comprimen en un hilo (zlib libera el GIL)
+THREAD_MIN_BYTES = 256 * 1024
+
+def _quality(params: str) -> float:
+    """Valor q de los parámetros de una codificación ("q=0.5"); 1 si no lo indica, 0 si es inválido."""
+    for param in params.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value.strip())
+            except ValueError:
+                return 0.0
+    return 1.0
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    True si Accept-Encoding admite gzip.
+
+    Una entrada "gzip" explícita decide por sí sola, esté donde esté; "*" solo
+    cuenta si gzip no aparece ("*;q=0, gzip" admite gzip, "gzip;q=0, *" no).
+    """
+    wildcard = None
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if coding == "gzip":
+            return _quality(params) > 0
+        if coding == "*" and wildcard is None:
+            wildcard = _quality(params) > 0
+    return bool(wildcard)
+
+class JSONGZipMiddleware:
+    """
+    Middleware ASGI: comprime con gzip las respuestas JSON completas de al menos
+    `minimum_size` bytes si el cliente lo admite. A diferencia del GZipMiddleware de
+    Starlette no toca los streams (NDJSON, SSE) ni respuestas de otros tipos, que
+    pasan tal cual. Con mtime=0 el mismo JSON da siempre los mismos bytes; el tiempo
+    de compresión cuenta en la fase 'compress'.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, compresslevel: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        gzip_ok = accepts_gzip(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if not headers.get("content-type", "").startswith("application/json"):
+                    await send(message)
+                    return
+                # La representación depende de Accept-Encoding: las cachés deben distinguirla
+                MutableHeaders(scope=message).add_vary_header("Accept-Encoding")
+                if not gzip_ok or "content-encoding" in headers:
+                    await send(message)
+                    return
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Respuesta por partes o pequeña: sin comprimir
+                await send(start)
+                await send(message)
+                return
+            if len(body) >= THREAD_MIN_BYTES:
+                started = perf_counter()
+                body = await run_in_threadpool(gzip.compress, body, self.compresslevel, mtime=0)
+                add_phase("compress", perf_counter() - started)
+            else:
+                with timed_phase("compress"):
+                    body = gzip.compress(body, self.compresslevel, mtime=0)
+            headers = MutableHeaders(scope=start)
+            headers["Content-Encoding"] = "gzip"
+            headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,5 +1,7 @@
 # core/config.py
-from typing import Optional
+import json
+from functools import lru_cache
+from typing import Any, Dict, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -13,9 +15,122 @@ class Settings(BaseSettings):
     INFLUXDB_ORG: str
     INFLUXDB_BUCKET: str
 
+    # Conexión a InfluxDB
+    INFLUXDB_POOL_SIZE: int = 64
+    INFLUXDB_KEEPALIVE_SECONDS: float = 30.0
+    INFLUXDB_ENABLE_GZIP: bool = True
+    INFLUXDB_TIMEOUT_SECONDS: float = 60.0
+    INFLUXDB_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    INFLUXDB_VERIFY_SSL: bool = True
+    INFLUXDB_SSL_CA_CERT: Optional[str] = None # Bundle de CA propio (PEM)
+    INFLUXDB_CERT_FILE: Optional[str] = None # Certificado de cliente (mTLS)
+    INFLUXDB_CERT_KEY_FILE: Optional[str] = None
+    INFLUXDB_WARMUP_CONNECTIONS: int = 2
+    # Límite global de consultas concurrentes; parte de las plazas se reserva a realtime
+    INFLUXDB_MAX_CONCURRENT_QUERIES: int = 32
+    INFLUXDB_REALTIME_RESERVED: int = 8
+    INFLUXDB_REALTIME_QUERY_TIMEOUT_SECONDS: float = 5.0
+    INFLUXDB_HISTORICAL_QUERY_TIMEOUT_SECONDS: float = 60.0
+
     # Configuración Opcional
     LOG_LEVEL: str = "INFO"
 
+    # Umbrales de severidad (YAML o JSON); sin fichero se usan los umbrales integrados
+    THRESHOLDS_FILE: Optional[str] = None
+    THRESHOLDS_RELOAD_SECONDS: float = 5.0
+    # SHA-256 (hex) de la clave de /admin (Authorization: Bearer <clave>); sin ella no se monta
+    ADMIN_KEY_SHA256: Optional[str] = None
+
+    # Caché de datos en tiempo real
+    REALTIME_CACHE_TTL_SECONDS: float = 1.0
+    REALTIME_CACHE_MAX_ENTRIES: int = 1024
+
+    # Lectura histórica con el parser CSV ligero (query_raw) en lugar de FluxRecord
+    HISTORICAL_LEAN_CSV: bool = True
+    # Pivot en el servidor: una fila por instante con todas las fases en lugar de una por campo
+    HISTORICAL_PIVOT: bool = True
+
+    # Paginación histórica por cursor: `limit` en puntos por serie
+    HISTORICAL_PAGE_MAX_LIMIT: int = 100_000
+    # Clave HMAC de los cursores. Sin ella se genera una por proceso: los cursores no
+    # sobreviven a un reinicio ni sirven entre workers distintos
+    HISTORICAL_CURSOR_SECRET: Optional[str] = None
+
+    # Fan-out de rangos largos: subconsultas concurrentes dimensionadas por los puntos que lee InfluxDB
+    HISTORICAL_FANOUT_ENABLED: bool = True
+    HISTORICAL_FANOUT_PARALLELISM: int = 4 # Subconsultas a la vez por petición
+    HISTORICAL_FANOUT_CHUNK_POINTS: int = 25_000 # Puntos leídos por serie (crudos o del nivel de rollup) en cada subconsulta
+    HISTORICAL_FANOUT_MAX_CHUNKS: int = 32
+    HISTORICAL_RAW_INTERVAL_SECONDS: float = 10.0 # Cadencia esperada de los datos crudos
+
+    # Respuestas JSON construidas directamente (sin response_model); mismo contenido byte a byte
+    FAST_JSON_RESPONSES: bool = False
+
+    # Endpoint /metrics (formato Prometheus) y cabecera Server-Timing por petición
+    METRICS_ENABLED: bool = True
+
+    # Caché histórica por segmentos
+    HISTORICAL_CACHE_ENABLED: bool = True
+    HISTORICAL_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    HISTORICAL_CACHE_SEGMENT_SECONDS: int = 3600
+    HISTORICAL_CACHE_MAX_SEGMENTS: int = 2000 # Rangos con más segmentos se consultan sin caché
+    HISTORICAL_CACHE_SETTLE_SECONDS: int = 60 # Margen para datos que llegan tarde
+
+    # Caché HTTP de rangos históricos ya cerrados (fin anterior al margen anterior): los que
+    # ya no pueden cambiar se marcan inmutables; los que aún pueden (ingesta atrasada,
+    # rollups, severidades) se cachean poco tiempo y se revalidan. 0 = sin Cache-Control
+    HTTP_IMMUTABLE_MAX_AGE_SECONDS: int = 365 * 24 * 3600
+    HTTP_HISTORICAL_MAX_AGE_SECONDS: int = 300
+
+    # Compresión gzip negociada de respuestas JSON completas (no de streams NDJSON/SSE)
+    GZIP_ENABLED: bool = True
+    GZIP_MIN_BYTES: int = 1024
+    GZIP_LEVEL: int = 6
+
+    # Push realtime (WebSocket / SSE)
+    PUSH_POLL_INTERVAL_SECONDS: float = 1.0
+    PUSH_CLIENT_QUEUE_SIZE: int = 100
+
+    # Rollups (1m/1h/1d) calculados en segundo plano; los buckets deben existir.
+    # Sin nombre explícito se usa "<INFLUXDB_BUCKET>_1m", "_1h" y "_1d".
+    ROLLUP_ENABLED: bool = False
+    ROLLUP_BUCKET_1M: Optional[str] = None
+    ROLLUP_BUCKET_1H: Optional[str] = None
+    ROLLUP_BUCKET_1D: Optional[str] = None
+    ROLLUP_INTERVAL_SECONDS: float = 60.0
+    ROLLUP_LAG_SECONDS: int = 120 # Solo se consolidan ventanas cerradas hace al menos este margen
+    ROLLUP_BACKFILL_DAYS: int = 7 # Historia inicial cuando un nivel aún no tiene datos
+    ROLLUP_MAX_WINDOWS_PER_RUN: int = 1440 # Ventanas por instalación y nivel en cada pasada
+
+    # Motor de alertas: evalúa en segundo plano los últimos valores contra los umbrales
+    ALERTS_ENABLED: bool = False # Opt-in: consulta InfluxDB periódicamente
+    ALERTS_INTERVAL_SECONDS: float = 10.0
+    ALERTS_BATCH_SIZE: int = 200 # Instalaciones por consulta de últimos valores
+    ALERTS_QUERY_PARALLELISM: int = 2
+    ALERTS_HYSTERESIS_PERCENT: float = 2.0 # Margen (sobre el valor) para volver a un nivel menos severo
+    ALERTS_MIN_DURATION_SECONDS: float = 30.0 # Un nivel nuevo debe mantenerse esto (tiempo del dato) para confirmarse
+    ALERTS_FEED_SIZE: int = 1000 # Transiciones recientes que se conservan
+    ALERTS_DISCOVERY_INTERVAL_SECONDS: float = 300.0 # Con umbrales por defecto: cada cuánto se buscan instalaciones
+    ALERTS_DISCOVERY_LOOKBACK_SECONDS: int = 3600
+
+    # Ingesta por lotes: buffer acotado que agrupa escrituras (lleno = 429)
+    INGEST_ENABLED: bool = False # Opt-in: expone un endpoint de escritura
+    INGEST_KEYS_FILE: Optional[str] = None # Claves por gateway (YAML o JSON); sin fichero se rechaza toda escritura
+    INGEST_KEYS_RELOAD_SECONDS: float = 5.0 # Como mucho una comprobación del mtime del fichero cada tanto
+    INGEST_MAX_BATCH_SAMPLES: int = 10_000 # Muestras por petición; más = 413
+    INGEST_MAX_BODY_BYTES: int = 8 * 1024 * 1024 # Cuerpo de una petición; más = 413 antes de leerlo
+    # Antigüedad máxima de una muestra (422 si es mayor). Los datos atrasados invalidan la
+    # caché histórica y retrasan los rollups; más allá de esto el histórico ya no cambia
+    INGEST_MAX_BACKFILL_SECONDS: int = 7 * 24 * 3600
+    # Margen para relojes de gateway adelantados; muestras más allá del futuro = 422
+    INGEST_MAX_FUTURE_SKEW_SECONDS: int = 300
+    INGEST_BUFFER_MAX_LINES: int = 200_000
+    INGEST_FLUSH_LINES: int = 5_000 # Líneas por escritura a InfluxDB
+    INGEST_FLUSH_INTERVAL_SECONDS: float = 1.0
+    INGEST_MAX_RETRIES: int = 5
+    INGEST_RETRY_BASE_SECONDS: float = 0.5
+    INGEST_RETRY_MAX_SECONDS: float = 30.0
+
     model_config = SettingsConfigDict(
         env_file='.env',
         env_file_encoding='utf-8',
@@ -23,4 +138,20 @@ class Settings(BaseSettings):
         case_sensitive=False
     )
 
-settings = Settings()
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Configuración de la aplicación, creada (leyendo .env y el entorno) en el primer uso.
+
+    Se llama dentro de funciones y del lifespan, nunca al importar, para que importar
+    la app no dependa del entorno ni pague su validación.
+    """
+    return Settings()
+
+def read_config_file(path: str) -> Dict[str, Any]:
+    """Lee un fichero de configuración auxiliar (umbrales, claves): YAML por extensión, JSON si no."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml # Solo necesario para ficheros YAML
+            return yaml.safe_load(f) or {}
+        return json.load(f)
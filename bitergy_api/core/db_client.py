@@ -1,26 +1,261 @@
 # core/db_client.py
-import influxdb_client
-from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
-from ..core.config import settings
-from typing import Optional # <-- Importar Optional
-_async_influx_client: Optional[InfluxDBClientAsync] = None
+import asyncio
+import ssl
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional
 
-def get_influxdb_client() -> InfluxDBClientAsync:
+from ..core.config import get_settings
+from ..core.enums import QueryLane
+from .metrics import INFLUX_QUERY_ROWS, INFLUX_QUERY_SECONDS, StatsCollector, add_phase
+
+if TYPE_CHECKING:
+    import aiohttp
+    from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
+
+_async_influx_client: Optional["InfluxDBClientAsync"] = None
+# Conectores que el cliente crea y _tuned_session sustituye; se cierran con await en cuanto se puede
+_replaced_connectors: List["aiohttp.BaseConnector"] = []
+
+def _ssl_context() -> ssl.SSLContext:
+    """Mismo contexto SSL que construye el cliente de InfluxDB a partir de su configuración."""
+    settings = get_settings()
+    context = ssl.create_default_context(cafile=settings.INFLUXDB_SSL_CA_CERT)
+    if settings.INFLUXDB_CERT_FILE:
+        context.load_cert_chain(settings.INFLUXDB_CERT_FILE, keyfile=settings.INFLUXDB_CERT_KEY_FILE)
+    if not settings.INFLUXDB_VERIFY_SSL:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+def _tuned_session(connector: "aiohttp.TCPConnector", **kwargs) -> "aiohttp.ClientSession":
+    """
+    Crea la sesión aiohttp del cliente con un conector propio.
+
+    El cliente de InfluxDB solo permite fijar `limit`; aquí se sustituye su conector
+    (aún sin conexiones) por uno con límite por host, keep-alive y caché DNS, y el
+    mismo contexto SSL (verify_ssl, CA propia, certificado de cliente).
+    """
+    settings = get_settings()
+    import aiohttp
+    tuned = aiohttp.TCPConnector(
+        limit=settings.INFLUXDB_POOL_SIZE,
+        limit_per_host=settings.INFLUXDB_POOL_SIZE,
+        keepalive_timeout=settings.INFLUXDB_KEEPALIVE_SECONDS,
+        ttl_dns_cache=300,
+        ssl=_ssl_context(),
+    )
+    _replaced_connectors.append(connector)
+    return aiohttp.ClientSession(connector=tuned, **kwargs)
+
+async def _close_replaced_connectors() -> None:
+    while _replaced_connectors:
+        await _replaced_connectors.pop().close()
+
+def create_influxdb_client() -> "InfluxDBClientAsync":
+    """
+    Crea el cliente asíncrono con pool, keep-alive, gzip y timeouts configurables.
+
+    influxdb_client (con sus cientos de módulos `domain` y reactivex) y aiohttp se
+    importan aquí, en el lifespan, y no al importar la app: el import de
+    bitergy_api.main y cada reinicio de worker son bastante más rápidos.
+    """
+    settings = get_settings()
+    import aiohttp
+    from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
+    return InfluxDBClientAsync(
+        url=settings.INFLUXDB_URL,
+        token=settings.INFLUXDB_TOKEN,
+        org=settings.INFLUXDB_ORG,
+        enable_gzip=settings.INFLUXDB_ENABLE_GZIP,
+        timeout=aiohttp.ClientTimeout(
+            total=settings.INFLUXDB_TIMEOUT_SECONDS,
+            connect=settings.INFLUXDB_CONNECT_TIMEOUT_SECONDS,
+        ),
+        connection_pool_maxsize=settings.INFLUXDB_POOL_SIZE,
+        verify_ssl=settings.INFLUXDB_VERIFY_SSL,
+        ssl_ca_cert=settings.INFLUXDB_SSL_CA_CERT,
+        cert_file=settings.INFLUXDB_CERT_FILE,
+        cert_key_file=settings.INFLUXDB_CERT_KEY_FILE,
+        client_session_type=_tuned_session,
+    )
+
+def get_influxdb_client() -> "InfluxDBClientAsync":
     """Obtiene una instancia Singleton del cliente asíncrono de InfluxDB."""
     global _async_influx_client
     if _async_influx_client is None:
+        # Normalmente ya lo ha creado init_influxdb_client() en el arranque
         print("Initializing InfluxDB async client...") # Debug message
-        _async_influx_client = InfluxDBClientAsync(
-            url=settings.INFLUXDB_URL,
-            token=settings.INFLUXDB_TOKEN,
-            org=settings.INFLUXDB_ORG
-        )
+        _async_influx_client = create_influxdb_client()
     return _async_influx_client
 
-async def get_query_api():
-    """Obtiene la API de consulta del cliente InfluxDB."""
+async def init_influxdb_client() -> None:
+    """Crea el cliente en el arranque y abre conexiones del pool con pings concurrentes."""
+    settings = get_settings()
+    client = get_influxdb_client()
+    await _close_replaced_connectors()
+    results = await asyncio.gather(
+        *(client.ping() for _ in range(max(1, settings.INFLUXDB_WARMUP_CONNECTIONS))),
+        return_exceptions=True
+    )
+    if not any(r is True for r in results):
+        print(f"WARN: InfluxDB at '{settings.INFLUXDB_URL}' did not answer the warm-up ping")
+
+class QueryLimiter:
+    """
+    Limita las consultas concurrentes a InfluxDB con carriles de prioridad.
+
+    Todas las consultas comparten `max_concurrent` plazas, pero las que no son
+    realtime solo pueden ocupar `max_concurrent - realtime_reserved`, de modo que
+    una ráfaga de históricos nunca deja sin plaza a los paneles en tiempo real.
+    Las peticiones que no encuentran plaza esperan (backpressure) en lugar de
+    saturar InfluxDB.
+    """
+
+    def __init__(self, max_concurrent: int, realtime_reserved: int):
+        self.max_concurrent = max_concurrent
+        self.realtime_reserved = min(realtime_reserved, max_concurrent - 1)
+        self._total = asyncio.Semaphore(max_concurrent)
+        self._bulk = asyncio.Semaphore(max_concurrent - self.realtime_reserved)
+        self.active: Dict[QueryLane, int] = {lane: 0 for lane in QueryLane}
+        self.waiting: Dict[QueryLane, int] = {lane: 0 for lane in QueryLane}
+        self.timeouts = 0
+
+    @asynccontextmanager
+    async def slot(self, lane: QueryLane) -> AsyncIterator[None]:
+        self.waiting[lane] += 1
+        try:
+            if lane != QueryLane.REALTIME:
+                await self._bulk.acquire()
+            try:
+                await self._total.acquire()
+            except BaseException:
+                if lane != QueryLane.REALTIME:
+                    self._bulk.release()
+                raise
+        finally:
+            self.waiting[lane] -= 1
+        self.active[lane] += 1
+        try:
+            yield
+        finally:
+            self.active[lane] -= 1
+            self._total.release()
+            if lane != QueryLane.REALTIME:
+                self._bulk.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "realtime_reserved": self.realtime_reserved,
+            "active": {lane.value: n for lane, n in self.active.items()},
+            "waiting": {lane.value: n for lane, n in self.waiting.items()},
+            "timeouts": self.timeouts,
+        }
+
+@lru_cache(maxsize=None)
+def get_query_limiter() -> QueryLimiter:
+    """Limitador compartido por todas las consultas, creado en el primer uso."""
+    settings = get_settings()
+    return QueryLimiter(settings.INFLUXDB_MAX_CONCURRENT_QUERIES, settings.INFLUXDB_REALTIME_RESERVED)
+
+StatsCollector(
+    "bitergy_influx_limiter", "InfluxDB query limiter state (per lane where labelled).",
+    {"": lambda: get_query_limiter().stats()}, counters={"timeouts"}, nested_label="lane"
+)
+
+def _lane_timeout(lane: QueryLane) -> float:
+    settings = get_settings()
+    if lane == QueryLane.REALTIME:
+        return settings.INFLUXDB_REALTIME_QUERY_TIMEOUT_SECONDS
+    return settings.INFLUXDB_HISTORICAL_QUERY_TIMEOUT_SECONDS
+
+class LimitedQueryApi:
+    """
+    QueryApiAsync que pasa cada consulta por el limitador y aplica el timeout de su carril.
+
+    Mide la espera de plaza (fase 'queue') y el viaje a InfluxDB (fase 'influx' y
+    métrica por `query_type`). Las filas se cuentan solas en query() y query_stream();
+    con query_raw las informa quien parsea el CSV mediante record_rows().
+    """
+
+    def __init__(self, query_api, lane: QueryLane, query_type: str = "other"):
+        self._query_api = query_api
+        self._lane = lane
+        self._timeout = _lane_timeout(lane)
+        self._limiter = get_query_limiter()
+        self._query_type = query_type
+
+    def _observe(self, started: float) -> None:
+        elapsed = perf_counter() - started
+        add_phase("influx", elapsed)
+        INFLUX_QUERY_SECONDS.observe(elapsed, self._query_type, self._lane.value)
+
+    def record_rows(self, rows: int) -> None:
+        INFLUX_QUERY_ROWS.observe(rows, self._query_type)
+
+    async def _limited(self, coro):
+        queued = perf_counter()
+        async with self._limiter.slot(self._lane):
+            started = perf_counter()
+            add_phase("queue", started - queued)
+            try:
+                return await asyncio.wait_for(coro, timeout=self._timeout)
+            except asyncio.TimeoutError:
+                self._limiter.timeouts += 1
+                raise
+            finally:
+                self._observe(started)
+
+    async def query(self, query: str, org=None, params: dict = None):
+        result = await self._limited(self._query_api.query(query=query, org=org, params=params))
+        self.record_rows(sum(len(table.records) for table in result))
+        return result
+
+    async def query_raw(self, query: str, org=None, params: dict = None):
+        return await self._limited(self._query_api.query_raw(query=query, org=org, params=params))
+
+    async def query_stream(self, query: str, org=None, params: dict = None):
+        """La plaza se mantiene mientras se consume el stream; el timeout cubre solo la respuesta inicial."""
+        queued = perf_counter()
+        slot = self._limiter.slot(self._lane)
+        await slot.__aenter__()
+        started = perf_counter()
+        add_phase("queue", started - queued)
+        try:
+            records = await asyncio.wait_for(
+                self._query_api.query_stream(query=query, org=org, params=params), timeout=self._timeout
+            )
+        except BaseException as e:
+            if isinstance(e, asyncio.TimeoutError):
+                self._limiter.timeouts += 1
+            await slot.__aexit__(type(e), e, e.__traceback__)
+            raise
+        finally:
+            self._observe(started)
+
+        async def release_when_done():
+            rows = 0
+            try:
+                async for record in records:
+                    rows += 1
+                    yield record
+            finally:
+                self.record_rows(rows)
+                try:
+                    # Corta también la respuesta HTTP si el stream se abandona a medias
+                    aclose = getattr(records, "aclose", None)
+                    if aclose is not None:
+                        await aclose()
+                finally:
+                    await slot.__aexit__(None, None, None)
+        return release_when_done()
+
+async def get_query_api(lane: QueryLane = QueryLane.HISTORICAL, query_type: str = "other") -> LimitedQueryApi:
+    """Obtiene la API de consulta del cliente InfluxDB, limitada según el carril de prioridad."""
     client = get_influxdb_client()
-    return client.query_api()
+    return LimitedQueryApi(client.query_api(), lane, query_type)
 
 async def close_influxdb_client():
     """Cierra la conexión del cliente InfluxDB si existe."""
@@ -29,3 +264,4 @@ async def close_influxdb_client():
         print("Closing InfluxDB async client...") # Debug message
         await _async_influx_client.close()
         _async_influx_client = None
+    await _close_replaced_connectors()
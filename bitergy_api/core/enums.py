@@ -9,3 +9,39 @@ class SeverityLevel(str, Enum):
     CRITICAL_LOW = "Critical Low"
     CRITICAL_HIGH = "Critical High"
     UNKNOWN = "Unknown"
+
+class HistoricalFormat(str, Enum):
+    """Formatos de respuesta disponibles para los endpoints históricos."""
+    JSON = "json"       # GroupedHistorical*Data (por defecto)
+    NDJSON = "ndjson"   # Streaming línea a línea (application/x-ndjson)
+    COLUMNAR = "columnar"  # Series columnares compactas (ColumnarHistoricalData)
+
+class AggregateFunction(str, Enum):
+    """Función de agregación usada al reducir series históricas."""
+    MEAN = "mean"
+    MIN = "min"
+    MAX = "max"
+    LAST = "last"
+    LTTB = "lttb"   # Reducción que preserva la forma (Largest-Triangle-Three-Buckets)
+
+class QueryLane(str, Enum):
+    """Carril de prioridad de una consulta a InfluxDB."""
+    REALTIME = "realtime"       # Paneles en vivo: plazas reservadas
+    HISTORICAL = "historical"   # Consultas de rango, potencialmente pesadas
+    BACKGROUND = "background"   # Tareas internas (rollups, alertas...)
+
+class StatsWindow(str, Enum):
+    """Ventana de los endpoints de estadísticas (alineada a UTC)."""
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"   # De lunes a domingo
+
+class StatsAggregate(str, Enum):
+    """Estadísticos por ventana, calculados en InfluxDB."""
+    MIN = "min"
+    MAX = "max"
+    MEAN = "mean"
+    STDDEV = "stddev"
+    P95 = "p95"
+    P99 = "p99"
+    CONSUMPTION = "consumption"  # Solo contadores acumulados (energy): spread dentro de la ventana
@@ -0,0 +1,337 @@
+# core/metrics.py
+import asyncio
+import math
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import AbstractSet, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+
+# Límites (segundos) de los histogramas de latencia y (filas) de tamaño de resultado
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ROW_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class MetricsRegistry:
+    """Métricas del proceso, expuestas en formato de texto de Prometheus."""
+
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+
+    def register(self, metric: "_Metric") -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.register(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Contador monótono; una entrada de diccionario por combinación de etiquetas."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+class Gauge(Counter):
+    """Valor que sube y baja (p.ej. peticiones en curso)."""
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+class Histogram(_Metric):
+    """
+    Histograma con cubetas fijas: cada serie tiene su lista de contadores reservada
+    al crearse y una observación es un bisect y dos sumas, sin bloqueos.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], _HistogramSeries] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _HistogramSeries(len(self.bounds) + 1)
+        series.counts[bisect_left(self.bounds, value)] += 1 # La última cubeta es +Inf
+        series.sum += value
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        bounds = self.bounds + (math.inf,)
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, series.counts):
+                cumulative += count
+                bucket_labels = _labels(self.labelnames + ("le",), labels + (_number(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(series.sum)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+class StatsCollector(_Metric):
+    """
+    Publica los valores numéricos de los `stats()` que ya existen (cachés, limitador,
+    push...) en el momento de la lectura, sin duplicar contadores en el camino caliente.
+
+    Cada clave numérica es una métrica `<prefix>_<clave>` (las de `counters` como
+    contador `_total`); un diccionario anidado añade la etiqueta `nested_label`.
+    """
+
+    def __init__(
+        self, prefix: str, documentation: str, sources: Dict[str, Callable[[], Dict[str, Any]]],
+        label: Optional[str] = None, counters: AbstractSet[str] = frozenset(), nested_label: str = "key"
+    ):
+        super().__init__(prefix, documentation)
+        self.sources = sources
+        self.label = label
+        self.counters = counters
+        self.nested_label = nested_label
+
+    def render(self) -> List[str]:
+        samples: Dict[str, List[str]] = {}
+        for source, stats in self.sources.items():
+            base = {self.label: source} if self.label else {}
+            for key, value in stats().items():
+                name = f"{self.name}_{key}_total" if key in self.counters else f"{self.name}_{key}"
+                if isinstance(value, dict):
+                    items = [({**base, self.nested_label: nested}, v) for nested, v in value.items()]
+                else:
+                    items = [(base, value)]
+                for labels, v in items:
+                    if isinstance(v, (int, float)): # bool incluido (0/1)
+                        samples.setdefault(name, []).append(
+                            f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(v)}"
+                        )
+        lines: List[str] = []
+        for name, metric_lines in samples.items():
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines.append(f"# HELP {name} {self.documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(metric_lines)
+        return lines
+
+# --- Métricas del servicio ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "bitergy_http_request_duration_seconds", "HTTP request latency until the last body byte, by route template.",
+    ("route", "method", "status")
+)
+HTTP_REQUEST_PHASE_SECONDS = Histogram(
+    "bitergy_http_request_phase_seconds", "Time spent per request phase (queue, influx, parse, build, serialize, compress).",
+    ("route", "phase")
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("bitergy_http_requests_in_flight", "HTTP requests currently being served.")
+INFLUX_QUERY_SECONDS = Histogram(
+    "bitergy_influx_query_duration_seconds",
+    "InfluxDB round trip per query, without limiter wait (query() also includes client-side record parsing).",
+    ("query_type", "lane")
+)
+INFLUX_QUERY_ROWS = Histogram(
+    "bitergy_influx_query_rows", "Rows (points) returned per InfluxDB query.", ("query_type",), ROW_BUCKETS
+)
+SKIPPED_RECORDS = Counter(
+    "bitergy_skipped_records_total", "Records or CSV rows skipped because they could not be parsed.", ("source",)
+)
+
+# --- Desglose de tiempos por petición (Server-Timing) ---
+
+class RequestTimings:
+    """Segundos acumulados por fase durante una petición."""
+    __slots__ = ("phases", "endpoint_done")
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.endpoint_done: Optional[float] = None
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.phases.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+def add_phase(phase: str, seconds: float) -> None:
+    """Suma tiempo a una fase de la petición en curso (no hace nada fuera de una petición)."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+class timed_phase:
+    """`with timed_phase("parse"):` suma la duración del bloque a esa fase de la petición en curso."""
+    __slots__ = ("phase", "start")
+
+    def __init__(self, phase: str):
+        self.phase = phase
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        add_phase(self.phase, perf_counter() - self.start)
+
+def timed(phase: str):
+    """Decorador: suma la duración de cada llamada (síncrona o async) a la fase `phase`."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    add_phase(phase, perf_counter() - start)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                add_phase(phase, perf_counter() - start)
+        return wrapper
+    return decorator
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute que atribuye a la fase 'serialize' lo que ocurre entre que el endpoint
+    devuelve y la respuesta queda lista: validación del response_model y render JSON.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        super().__init__(path, endpoint, **kwargs)
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call):
+            @wraps(call)
+            async def timed_call(**values):
+                try:
+                    return await call(**values)
+                finally:
+                    timings = _request_timings.get()
+                    if timings is not None:
+                        timings.endpoint_done = perf_counter()
+            self.dependant.call = timed_call
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            timings = _request_timings.get()
+            if timings is not None and timings.endpoint_done is not None:
+                timings.add("serialize", perf_counter() - timings.endpoint_done)
+            return response
+        return timed_handler
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latencia por plantilla de ruta, peticiones en curso y cabecera
+    Server-Timing con el desglose por fases. En respuestas en streaming la cabecera
+    cubre hasta el primer byte; el histograma, la respuesta completa.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        start = perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", timings.server_timing(perf_counter() - start))
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            # Plantilla de la ruta (cardinalidad acotada); rutas propias de Starlette (/docs) por su path fijo
+            if route is not None:
+                route_label = route.path
+            elif "endpoint" in scope:
+                route_label = scope["path"]
+            else:
+                route_label = "unmatched"
+            HTTP_REQUEST_SECONDS.observe(elapsed, route_label, scope["method"], str(status))
+            for phase, seconds in timings.phases.items():
+                HTTP_REQUEST_PHASE_SECONDS.observe(seconds, route_label, phase)
+            _request_timings.reset(token)
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -1,31 +1,109 @@
 # main.py
-from fastapi import FastAPI
+import math
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
 # Usar importaciones relativas DENTRO del paquete bitergy_api
-from .routers import electrical, physical
-from .core.config import settings
-from .core.db_client import close_influxdb_client
+from .routers import admin, alerts, electrical, fleet, ingest, metrics, physical, push
+from .core.compression import JSONGZipMiddleware
+from .core.config import get_settings
+from .core.db_client import close_influxdb_client, init_influxdb_client
+from .core.metrics import MetricsMiddleware
+from .services.alerts import get_alert_engine
+from .services.data_provider import get_rollup_worker, warm_query_templates
+from .services.ingest import get_ingest_buffer
+from .services.realtime_push import get_realtime_hub
+from .services.thresholds import get_threshold_store
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    print(f"Starting {settings.PROJECT_NAME}...")
+    # Crea el cliente (aquí se importa influxdb_client) y calienta el pool antes de aceptar tráfico
+    await init_influxdb_client()
+    warm_query_templates()
+    get_threshold_store().start_watching()
+    if settings.ROLLUP_ENABLED:
+        get_rollup_worker().start()
+    if settings.INGEST_ENABLED:
+        if not settings.INGEST_KEYS_FILE:
+            print("WARN: INGEST_KEYS_FILE is not set; every ingestion request will be rejected with 401")
+        get_ingest_buffer().start()
+    if settings.ALERTS_ENABLED:
+        get_alert_engine().start()
+    yield
+    print(f"Shutting down {settings.PROJECT_NAME}...")
+    await get_rollup_worker().stop()
+    await get_alert_engine().stop()
+    await get_realtime_hub().close()
+    await get_threshold_store().stop_watching()
+    # Vacía lo pendiente de ingesta antes de cerrar el cliente
+    await get_ingest_buffer().stop()
+    await close_influxdb_client()
 
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    description="API for accessing real-time and historical electrical and physical data from BITERGY installations.",
-    version="1.1.0",
-)
+def _json_safe(value):
+    # NaN/Infinity no son JSON válido: se devuelven como texto
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_json_safe(item) for item in value]
+    return value
 
-# Incluir ambos routers
-app.include_router(electrical.router, prefix=settings.API_V1_STR)
-app.include_router(physical.router, prefix=settings.API_V1_STR) # Mismo prefijo base API
+async def request_validation_handler(request: Request, exc: RequestValidationError):
+    """Igual que el 422 por defecto, pero sin fallar si la entrada rechazada contiene NaN/Infinity."""
+    return JSONResponse(status_code=422, content={"detail": _json_safe(jsonable_encoder(exc.errors()))})
 
-@app.get("/", tags=["Root"])
 async def read_root():
     """Endpoint raíz para verificar que la API está funcionando."""
-    return {"message": f"Welcome to the {settings.PROJECT_NAME}. Visit /docs for documentation."}
+    return {"message": f"Welcome to the {get_settings().PROJECT_NAME}. Visit /docs for documentation."}
 
-@app.on_event("startup")
-async def startup_event():
-    print(f"Starting {settings.PROJECT_NAME}...")
-    # Puedes añadir inicializaciones aquí si es necesario
+@lru_cache(maxsize=None)
+def create_app() -> FastAPI:
+    """
+    Construye la app según la configuración. Se llama al pedir `bitergy_api.main:app`
+    (o con `uvicorn --factory bitergy_api.main:create_app`), no al importar el módulo.
+    """
+    settings = get_settings()
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        description="API for accessing real-time and historical electrical and physical data from BITERGY installations.",
+        version="1.1.0",
+        lifespan=lifespan,
+    )
+    app.add_exception_handler(RequestValidationError, request_validation_handler)
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    print(f"Shutting down {settings.PROJECT_NAME}...")
-    await close_influxdb_client()
+    if settings.GZIP_ENABLED:
+        # Antes que MetricsMiddleware para quedar dentro: la compresión cuenta en la latencia
+        app.add_middleware(JSONGZipMiddleware, minimum_size=settings.GZIP_MIN_BYTES, compresslevel=settings.GZIP_LEVEL)
+
+    if settings.METRICS_ENABLED:
+        # Latencia por ruta, desglose por fases (Server-Timing) y /metrics para Prometheus
+        app.add_middleware(MetricsMiddleware)
+        app.include_router(metrics.router)
+
+    # Incluir ambos routers
+    app.include_router(electrical.router, prefix=settings.API_V1_STR)
+    app.include_router(physical.router, prefix=settings.API_V1_STR) # Mismo prefijo base API
+    app.include_router(fleet.router, prefix=settings.API_V1_STR)
+    app.include_router(push.router, prefix=settings.API_V1_STR)
+    if settings.ADMIN_KEY_SHA256:
+        app.include_router(admin.router, prefix=settings.API_V1_STR)
+    if settings.ALERTS_ENABLED:
+        app.include_router(alerts.router, prefix=settings.API_V1_STR)
+    if settings.INGEST_ENABLED:
+        app.include_router(ingest.router, prefix=settings.API_V1_STR)
+
+    app.add_api_route("/", read_root, methods=["GET"], tags=["Root"])
+    return app
+
+def __getattr__(name: str):
+    # `bitergy_api.main:app` sigue funcionando: la app se crea en el primer acceso
+    if name == "app":
+        return create_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
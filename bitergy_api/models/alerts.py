@@ -0,0 +1,36 @@
+# models/alerts.py
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime
+from ..core.enums import SeverityLevel
+
+class AlertState(BaseModel):
+    asset_id: str
+    variable: str # "measurement.field" (p.ej. "voltage.phase_a"), como en value_age_seconds
+    severity: SeverityLevel # Nivel confirmado (con histéresis y duración mínima)
+    value: float # Último valor evaluado
+    value_time: datetime
+    since: datetime # Primer dato con el nivel actual
+    pending_severity: Optional[SeverityLevel] = None # Nivel nuevo aún sin la duración mínima
+
+class ActiveAlerts(BaseModel):
+    evaluated_at: Optional[datetime] = None
+    alerts: List[AlertState] = [] # Variables cuyo nivel confirmado no es Normal
+
+class InstallationAlerts(BaseModel):
+    asset_id: str
+    evaluated_at: Optional[datetime] = None
+    variables: List[AlertState] = []
+
+class AlertTransition(BaseModel):
+    seq: int # Creciente; sirve como `after` para leer solo lo nuevo
+    asset_id: str
+    variable: str
+    from_severity: SeverityLevel
+    to_severity: SeverityLevel
+    value: float # Valor con el que se confirmó
+    time: datetime # Primer dato con el nivel nuevo
+
+class AlertTransitionFeed(BaseModel):
+    transitions: List[AlertTransition] = []
+    last_seq: int # Pasar como `after` en la siguiente llamada
@@ -1,6 +1,6 @@
 # models/common.py
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from ..core.enums import SeverityLevel
 
@@ -13,6 +13,30 @@ class HistoricalDataPoint(BaseModel):
     timestamp: datetime
     value: float
     unit: str
+    severity: Optional[SeverityLevel] = None # Solo con include_severity
+
+class SeveritySummary(BaseModel):
+    counts: Dict[SeverityLevel, int] = {}
+    seconds: Dict[SeverityLevel, float] = {}
+    out_of_band_percent: float = 0.0
+
+class ColumnarSeries(BaseModel):
+    """Serie histórica en formato columnar: unidad una vez y arrays planos."""
+    unit: str
+    # Epoch en milisegundos; se omite si la serie es regular (start + step)
+    timestamps: Optional[List[int]] = None
+    start: Optional[int] = None
+    step: Optional[int] = None
+    values: List[float]
+    severity: Optional[List[SeverityLevel]] = None # Solo con include_severity
+
+class ColumnarHistoricalData(BaseModel):
+    asset_id: str
+    start_time: datetime
+    end_time: datetime
+    series: Dict[str, ColumnarSeries]
+    severity_summary: Optional[Dict[str, SeveritySummary]] = None
+    next_cursor: Optional[str] = None # Solo en lecturas paginadas con más datos pendientes
 
 class Thresholds(BaseModel):
     critical_low: Optional[float] = None
@@ -0,0 +1,23 @@
+# models/fleet.py
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
+from datetime import datetime
+from ..models.electrical import RealtimeElectricalData
+from ..models.physical import RealtimePhysicalData
+
+class InstallationRealtimeData(BaseModel):
+    asset_id: str
+    electrical: Optional[RealtimeElectricalData] = None
+    physical: Optional[RealtimePhysicalData] = None
+
+class FleetRealtimeRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1)
+
+class FleetRealtimeData(BaseModel):
+    installations: Dict[str, InstallationRealtimeData]
+    missing: List[str] = [] # IDs solicitados sin datos recientes
+
+class RealtimeSnapshotData(InstallationRealtimeData):
+    generated_at: datetime
+    # Antigüedad en segundos de cada valor, clave "measurement.field" (p.ej. "voltage.phase_a")
+    value_age_seconds: Dict[str, float] = {}
@@ -0,0 +1,65 @@
+# models/ingest.py
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from typing import Optional, List
+from datetime import datetime
+
+from ..core.config import get_settings
+
+# Muestras que envían los gateways. Los nombres (y alias) son los mismos que los de
+# RealtimeElectricalData / RealtimePhysicalData, pero con valores numéricos sin unidad
+# ni severidad: la unidad la fija el measurement y la severidad se calcula al leer.
+
+class PhaseValues(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, allow_inf_nan=False)
+
+    a: Optional[float] = Field(None, alias="Phase A")
+    b: Optional[float] = Field(None, alias="Phase B")
+    c: Optional[float] = Field(None, alias="Phase C")
+
+class ElectricalSample(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, allow_inf_nan=False)
+
+    timestamp: datetime
+    voltage: Optional[PhaseValues] = None
+    current: Optional[PhaseValues] = None
+    active_power: Optional[PhaseValues] = Field(None, alias="Active Power (kW)")
+    apparent_power: Optional[PhaseValues] = Field(None, alias="Apparent Power (kVA)")
+    reactive_power: Optional[PhaseValues] = Field(None, alias="Reactive Power (kVAR)")
+    power_factor: Optional[PhaseValues] = Field(None, alias="Power Factor")
+    frequency: Optional[float] = None
+    total_active_power: Optional[float] = Field(None, alias="Total Active Power (kW)")
+    total_energy_kwh: Optional[float] = Field(None, alias="Total Energy (kWh)")
+
+class PhysicalSample(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, allow_inf_nan=False)
+
+    timestamp: datetime
+    temperature: Optional[float] = None
+    humidity: Optional[float] = None
+    level: Optional[float] = Field(None, alias="Level")
+    # Se guarda como tag "location": solo caracteres que no rompen el line protocol
+    sensor_location: Optional[str] = Field(None, max_length=128, pattern=r"^[\w][\w .:/()#-]*$")
+
+class MeasurementBatch(BaseModel):
+    electrical: List[ElectricalSample] = []
+    physical: List[PhysicalSample] = []
+
+    @field_validator("electrical", "physical", mode="before")
+    @classmethod
+    def _max_samples(cls, value):
+        # Cada lista por separado y antes de validar sus muestras; el total de ambas se
+        # comprueba en el endpoint (413)
+        maximum = get_settings().INGEST_MAX_BATCH_SAMPLES
+        if isinstance(value, list) and len(value) > maximum:
+            raise ValueError(f"List should have at most {maximum} items")
+        return value
+
+    @model_validator(mode="after")
+    def _not_empty(self) -> "MeasurementBatch":
+        if not self.electrical and not self.physical:
+            raise ValueError("Batch must contain at least one electrical or physical sample")
+        return self
+
+class IngestResult(BaseModel):
+    samples: int
+    points: int # Líneas de line protocol aceptadas en el buffer
@@ -1,14 +1,20 @@
 # models/physical.py
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import Optional, List, Dict
 from datetime import datetime
-from ..models.common import BaseVariableValue, HistoricalDataPoint
+from ..models.common import BaseVariableValue, HistoricalDataPoint, SeveritySummary
 
 class PhysicalVariableValue(BaseVariableValue):
     sensor_location: Optional[str] = None
     pass
 
 class RealtimePhysicalData(BaseModel):
+    # Hora del último valor de cada serie ("measurement.field"); no se serializa, alimenta el ETag
+    _series_times: Dict[str, datetime] = PrivateAttr(default_factory=dict)
+
+    def series_times(self) -> Dict[str, datetime]:
+        return self._series_times
+
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     asset_id: str
     temperature: Optional[PhysicalVariableValue] = None
@@ -20,3 +26,5 @@ class GroupedHistoricalPhysicalData(BaseModel):
      start_time: datetime
      end_time: datetime
      data: Dict[str, List[HistoricalDataPoint]]
+     severity_summary: Optional[Dict[str, SeveritySummary]] = None
+     next_cursor: Optional[str] = None # Solo en lecturas paginadas con más datos pendientes
@@ -0,0 +1,28 @@
+# models/stats.py
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
+from datetime import datetime
+from ..core.enums import StatsAggregate, StatsWindow
+
+class StatisticsWindow(BaseModel):
+    start: datetime # Inicio de la ventana (la primera se recorta al inicio del rango)
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    stddev: Optional[float] = None
+    p95: Optional[float] = None
+    p99: Optional[float] = None
+    consumption: Optional[float] = None # Energía consumida en la ventana (solo energy)
+
+class VariableStatistics(BaseModel):
+    unit: str
+    windows: List[StatisticsWindow]
+
+class InstallationStatistics(BaseModel):
+    asset_id: str
+    start_time: datetime
+    end_time: datetime
+    window: StatsWindow
+    aggregates: List[StatsAggregate]
+    # Clave: nombre de la variable (p.ej. "Voltage Phase A", "Energy")
+    data: Dict[str, VariableStatistics] = Field(default_factory=dict)
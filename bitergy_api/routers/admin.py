@@ -0,0 +1,83 @@
+# routers/admin.py
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Security
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from ..core.config import get_settings
+from ..core.db_client import get_query_limiter
+from ..core.metrics import TimedRoute
+from ..services.alerts import get_alert_engine
+from ..services.data_provider import get_historical_cache, get_realtime_cache, get_rollup_worker
+from ..services.gateway_keys import hash_key
+from ..services.ingest import get_ingest_buffer
+from ..services.realtime_push import get_realtime_hub
+from ..services.thresholds import get_threshold_store
+
+_bearer = HTTPBearer(auto_error=False, description="Admin key (Authorization: Bearer <key>)")
+
+async def require_admin_key(credentials: Optional[HTTPAuthorizationCredentials] = Security(_bearer)) -> None:
+    """Comprueba la clave de administración contra ADMIN_KEY_SHA256; sin ella configurada se rechaza todo."""
+    expected = (get_settings().ADMIN_KEY_SHA256 or "").strip().lower()
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Missing admin key", headers={"WWW-Authenticate": "Bearer"})
+    if not expected or not hmac.compare_digest(hash_key(credentials.credentials), expected):
+        raise HTTPException(status_code=401, detail="Invalid admin key", headers={"WWW-Authenticate": "Bearer"})
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin_key)],
+    responses={401: {"description": "Missing or invalid admin key"}},
+    route_class=TimedRoute
+)
+
+@router.get("/cache", summary="Get Cache Statistics")
+async def read_cache_stats():
+    """Returns hit/miss counters of the in-process caches and InfluxDB query concurrency."""
+    return {
+        "realtime": get_realtime_cache().stats(),
+        "historical": get_historical_cache().stats(),
+        "push": get_realtime_hub().stats(),
+        "influx": get_query_limiter().stats(),
+    }
+
+@router.get("/rollups", summary="Get Rollup Status")
+async def read_rollup_status():
+    """Returns the rollup tiers, run counters and the watermark of each installation per tier."""
+    return get_rollup_worker().stats()
+
+@router.get("/alerts", summary="Get Alert Engine Status")
+async def read_alert_engine_status():
+    """Returns the alert engine counters and the number of active alerts per severity."""
+    return get_alert_engine().stats()
+
+@router.get("/ingest", summary="Get Ingestion Buffer Status")
+async def read_ingest_status():
+    """Returns the fill level of the ingestion write buffer and its write/retry/drop counters."""
+    return get_ingest_buffer().stats()
+
+@router.get("/thresholds/{installation_id}", summary="Get Effective Thresholds")
+async def read_effective_thresholds(installation_id: str = Path(..., description="Unique ID of the installation")):
+    """Returns the thresholds applied to an installation after defaults and group inheritance."""
+    index = get_threshold_store().index
+    thresholds = index.get(installation_id)
+    return {
+        "installation_id": installation_id,
+        "group": index.group_of(installation_id),
+        "source": index.source,
+        "loaded_at": index.loaded_at,
+        "version": index.version,
+        "thresholds": thresholds.model_dump(exclude_none=True) if thresholds else None,
+    }
+
+@router.post("/thresholds/reload", summary="Reload Thresholds File")
+async def reload_thresholds():
+    """Forces a reload of THRESHOLDS_FILE; the previous thresholds stay active if it is invalid."""
+    store = get_threshold_store()
+    if not store.path:
+        raise HTTPException(status_code=400, detail="No THRESHOLDS_FILE configured")
+    if not store.reload():
+        raise HTTPException(status_code=422, detail="Thresholds file is invalid; previous thresholds kept")
+    return {"source": store.index.source, "installations": len(store.index)}
@@ -0,0 +1,37 @@
+# routers/alerts.py
+from fastapi import APIRouter, HTTPException, Path, Query
+
+from ..core.metrics import TimedRoute
+from ..models.alerts import ActiveAlerts, AlertTransitionFeed, InstallationAlerts
+from ..services.alerts import get_alert_engine
+from .common import json_response
+
+# Transiciones máximas por llamada al feed
+MAX_TRANSITIONS_PER_PAGE = 1000
+
+router = APIRouter(
+    prefix="/alerts",
+    tags=["Alerts"],
+    route_class=TimedRoute
+)
+
+@router.get("", response_model=ActiveAlerts, summary="Get Active Alerts")
+async def read_active_alerts():
+    """Variables whose confirmed severity is not Normal, most severe first. Served from memory."""
+    return json_response(get_alert_engine().active_alerts())
+
+@router.get("/transitions", response_model=AlertTransitionFeed, summary="Get Alert Transitions")
+async def read_alert_transitions(
+    after: int = Query(0, ge=0, description="Return transitions with a sequence number greater than this (use last_seq of the previous call)"),
+    limit: int = Query(100, ge=1, le=MAX_TRANSITIONS_PER_PAGE, description="Maximum transitions to return")
+):
+    """Confirmed severity changes, oldest first. Only the most recent ALERTS_FEED_SIZE are kept."""
+    return json_response(get_alert_engine().transitions_after(after, limit))
+
+@router.get("/{installation_id}", response_model=InstallationAlerts, summary="Get Installation Alert State")
+async def read_installation_alerts(installation_id: str = Path(..., description="Unique ID of the installation")):
+    """Alert state of every evaluated variable of an installation."""
+    content = get_alert_engine().installation_alerts(installation_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Installation is not evaluated by the alert engine")
+    return json_response(content)
@@ -0,0 +1,207 @@
+# routers/common.py
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import AsyncIterator, Awaitable, Dict, List, Mapping, Optional, TypeVar
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+
+from ..core.config import get_settings
+from ..core.enums import HistoricalFormat, StatsAggregate, StatsWindow
+from ..core.metrics import timed_phase
+from ..services.downsampling import parse_duration
+from ..services.flux_queries import STATS_WINDOWS
+from ..services.pagination import PageCursor, decode_cursor
+from ..services.serialization import model_json
+from ..services.thresholds import get_threshold_store
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+DEFAULT_STATS_AGGREGATES = "min,max,mean,consumption"
+# Máximo de ventanas por petición de estadísticas (p.ej. ~13 meses de ventanas horarias)
+MAX_STATS_WINDOWS = 10_000
+# Cada cuánto se comprueba si el cliente sigue conectado durante una consulta larga
+DISCONNECT_POLL_SECONDS = 0.5
+
+T = TypeVar("T")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def resolve_historical_format(request: Request, requested: HistoricalFormat) -> HistoricalFormat:
+    """Determina el formato histórico a partir del parámetro `format` o de la cabecera Accept."""
+    if requested != HistoricalFormat.JSON:
+        return requested
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return HistoricalFormat.NDJSON
+    return requested
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Espera `awaitable` vigilando la conexión. Si el cliente se va se cancela (y con
+    él las subconsultas en curso) en lugar de terminar un trabajo que nadie recibirá.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
+def json_response(content) -> JSONResponse:
+    """JSONResponse de un contenido ya serializable; el render cuenta en la fase 'serialize'."""
+    with timed_phase("serialize"):
+        return JSONResponse(content=content)
+
+def _utc(time: datetime) -> datetime:
+    # Las fechas sin zona se interpretan como UTC
+    if time.tzinfo is None:
+        return time.replace(tzinfo=timezone.utc)
+    return time.astimezone(timezone.utc)
+
+def _client_has_current(request: Request, etag: str) -> bool:
+    # Comparación débil de ETags (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+def realtime_response(request: Request, response: Response, data, series_times: Mapping[str, datetime]):
+    """
+    Respuesta realtime con ETag débil: huella de la hora de cada serie
+    ("measurement.field") y de la versión (huella del contenido) de los umbrales,
+    de la que dependen las severidades. Un dato nuevo de una serie lenta cambia el
+    ETag aunque sea anterior al más reciente de otra, y el ETag es igual en todos
+    los workers y tras reinicios. Si el cliente ya tiene esta lectura (If-None-Match)
+    se responde 304 sin serializar nada.
+
+    Last-Modified (la hora más reciente) es solo informativo: no cambia cuando se
+    actualiza una serie más lenta, así que If-Modified-Since nunca da 304.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(series_times):
+        digest.update(f"{name}={(_utc(series_times[name]) - _EPOCH) // timedelta(microseconds=1):x};".encode("utf-8"))
+    etag = f'W/"{digest.hexdigest()[:16]}-{get_threshold_store().index.version}"'
+    latest = max((_utc(time) for time in series_times.values()), default=_EPOCH)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(latest, usegmt=True),
+        "Cache-Control": "no-cache" # Reutilizable, pero siempre revalidando
+    }
+    if _client_has_current(request, etag):
+        return Response(status_code=304, headers=headers)
+    if get_settings().FAST_JSON_RESPONSES:
+        result = json_response(model_json(data))
+        result.headers.update(headers)
+        return result
+    response.headers.update(headers)
+    return data
+
+def closed_range_headers(end_time: datetime, include_severity: bool = False, aggregated: bool = False) -> Dict[str, str]:
+    """
+    Cache-Control de un rango histórico ya cerrado (fin anterior al margen de datos
+    tardíos, HISTORICAL_CACHE_SETTLE_SECONDS).
+
+    Solo es `immutable` si la respuesta ya no puede cambiar: fuera del alcance de la
+    ingesta atrasada (INGEST_MAX_BACKFILL_SECONDS), sin severidades (dependen de los
+    umbrales vigentes) y sin agregación con rollups activos (la misma URL pasa del
+    bucket crudo al nivel de rollup cuando éste cubre el rango). Si no, caché acotada
+    a HTTP_HISTORICAL_MAX_AGE_SECONDS con revalidación. Los rangos abiertos no llevan cabecera.
+    """
+    settings = get_settings()
+    now = datetime.now(timezone.utc)
+    end = _utc(end_time)
+    if end > now - timedelta(seconds=settings.HISTORICAL_CACHE_SETTLE_SECONDS):
+        return {}
+    backfill_seconds = settings.INGEST_MAX_BACKFILL_SECONDS if settings.INGEST_ENABLED else 0
+    final = (
+        end <= now - timedelta(seconds=max(settings.HISTORICAL_CACHE_SETTLE_SECONDS, backfill_seconds))
+        and not include_severity
+        and not (aggregated and settings.ROLLUP_ENABLED)
+    )
+    if final and settings.HTTP_IMMUTABLE_MAX_AGE_SECONDS > 0:
+        return {"Cache-Control": f"public, max-age={settings.HTTP_IMMUTABLE_MAX_AGE_SECONDS}, immutable"}
+    if settings.HTTP_HISTORICAL_MAX_AGE_SECONDS > 0:
+        return {"Cache-Control": f"public, max-age={settings.HTTP_HISTORICAL_MAX_AGE_SECONDS}, must-revalidate"}
+    return {}
+
+def with_headers(result, response: Response, headers: Dict[str, str]):
+    """
+    Añade `headers` a lo que devuelve el endpoint: a la Response si la construye él
+    (FastAPI no le copia las cabeceras de la inyectada) y si no a la inyectada.
+    """
+    if headers:
+        target = result if isinstance(result, Response) else response
+        target.headers.update(headers)
+    return result
+
+async def ndjson_lines(chunks: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Serializa cada bloque como una línea JSON independiente; al terminar o abandonarse cierra `chunks`."""
+    try:
+        async for chunk in chunks:
+            yield json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n"
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+def parse_resolution(resolution: Optional[str]) -> Optional[timedelta]:
+    """Valida el parámetro `resolution` ("30s", "5m", "1h"...) y lo convierte a timedelta."""
+    if resolution is None:
+        return None
+    try:
+        return parse_duration(resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def check_page_limit(limit: Optional[int]) -> None:
+    """400 si `limit` pasa de HISTORICAL_PAGE_MAX_LIMIT (no va en Query, que lo leería al importar)."""
+    maximum = get_settings().HISTORICAL_PAGE_MAX_LIMIT
+    if limit is not None and limit > maximum:
+        raise HTTPException(status_code=400, detail=f"limit must be at most {maximum}")
+
+def parse_page_cursor(
+    cursor: Optional[str], kind: str, installation_id: str, start_time: datetime, end_time: datetime
+) -> Optional[PageCursor]:
+    """Decodifica el parámetro `cursor` y comprueba que pertenece a esta misma consulta."""
+    if cursor is None:
+        return None
+    try:
+        page_cursor = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not page_cursor.matches(kind, installation_id, start_time, end_time):
+        raise HTTPException(status_code=400, detail="Cursor does not belong to this installation and time range")
+    return page_cursor
+
+def parse_stats_aggregates(aggregates: str) -> List[StatsAggregate]:
+    """Convierte "min,max,p95" en la lista de estadísticos, sin duplicados y en orden."""
+    names = list(dict.fromkeys(a.strip().lower() for a in aggregates.split(",") if a.strip()))
+    if not names:
+        raise HTTPException(status_code=400, detail="At least one aggregate is required")
+    try:
+        return [StatsAggregate(name) for name in names]
+    except ValueError:
+        valid = ", ".join(a.value for a in StatsAggregate)
+        raise HTTPException(status_code=400, detail=f"Invalid aggregates '{aggregates}'. Valid values: {valid}")
+
+def check_stats_range(start_time: datetime, end_time: datetime, window: StatsWindow) -> None:
+    """Valida el rango y que no produzca más de MAX_STATS_WINDOWS ventanas."""
+    if start_time >= end_time:
+        raise HTTPException(status_code=400, detail="End time must be after start time")
+    every, _ = STATS_WINDOWS[window]
+    if (end_time - start_time) / every > MAX_STATS_WINDOWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range too long for '{window.value}' windows (max {MAX_STATS_WINDOWS}); use a larger window"
+        )
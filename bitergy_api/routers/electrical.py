@@ -1,5 +1,6 @@
 # routers/electrical.py
-from fastapi import APIRouter, HTTPException, Query, Path
+from fastapi import APIRouter, HTTPException, Query, Path, Request, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from datetime import datetime
 from ..models.electrical import RealtimeElectricalData, GroupedHistoricalElectricalData # Correcto
@@ -7,31 +8,131 @@ from ..models.common import HistoricalDataPoint
 
 
 
-from ..services.data_provider import get_realtime_electrical_data, get_historical_electrical_data
+from ..core.config import get_settings
+from ..core.enums import AggregateFunction, HistoricalFormat, StatsWindow
+from ..core.metrics import TimedRoute
+from ..models.stats import InstallationStatistics
+from ..services.data_provider import (
+    get_realtime_electrical_data,
+    get_historical_electrical_data,
+    get_historical_electrical_columnar,
+    get_historical_electrical_json,
+    stream_historical_electrical_data,
+    get_electrical_statistics
+)
+from .common import (
+    DEFAULT_STATS_AGGREGATES,
+    NDJSON_MEDIA_TYPE,
+    cancel_on_disconnect,
+    check_page_limit,
+    check_stats_range,
+    closed_range_headers,
+    json_response,
+    ndjson_lines,
+    parse_page_cursor,
+    parse_resolution,
+    parse_stats_aggregates,
+    realtime_response,
+    resolve_historical_format,
+    with_headers
+)
 
 router = APIRouter(
     prefix="/installations/{installation_id}/electrical",
-    tags=["Electrical Data"]
+    tags=["Electrical Data"],
+    route_class=TimedRoute
 )
 
 @router.get("/realtime", response_model=RealtimeElectricalData, summary="Get Real-time Electrical Data")
-async def read_realtime_electrical(installation_id: str = Path(..., description="Unique ID of the installation")):
-    """Fetches the most recent electrical measurements."""
+async def read_realtime_electrical(
+    request: Request,
+    response: Response,
+    installation_id: str = Path(..., description="Unique ID of the installation")
+):
+    """Fetches the most recent electrical measurements. Supports If-None-Match (304 while no series has a newer value)."""
     data = await get_realtime_electrical_data(installation_id)
     if data is None:
         raise HTTPException(status_code=404, detail="Electrical realtime data not found")
-    return data
+    return realtime_response(request, response, data, data.series_times())
 
-@router.get("/historical", response_model=GroupedHistoricalElectricalData, summary="Get Historical Electrical Data")
+@router.get(
+    "/historical",
+    response_model=GroupedHistoricalElectricalData,
+    response_model_exclude_none=True,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}, "description": "Grouped (default), columnar or NDJSON stream"}},
+    summary="Get Historical Electrical Data"
+)
 async def read_historical_electrical(
+    request: Request,
+    response: Response,
     installation_id: str = Path(..., description="Unique ID of the installation"),
     start_time: datetime = Query(..., description="Start timestamp ISO 8601"),
-    end_time: datetime = Query(..., description="End timestamp ISO 8601")
+    end_time: datetime = Query(..., description="End timestamp ISO 8601"),
+    format: HistoricalFormat = Query(HistoricalFormat.JSON, description="Response format: 'json' (default), 'columnar' (compact arrays) or 'ndjson' (streamed)"),
+    max_points: Optional[int] = Query(None, ge=10, le=100_000, description="Maximum points per series; the server picks the aggregation window"),
+    resolution: Optional[str] = Query(None, description="Explicit aggregation window (e.g. '30s', '5m', '1h'); overrides max_points"),
+    aggregate: AggregateFunction = Query(AggregateFunction.MEAN, description="Aggregation function; cumulative energy always uses 'last'"),
+    include_severity: bool = Query(False, description="Add per-point severity and a per-series severity summary (json/columnar formats)"),
+    limit: Optional[int] = Query(None, ge=1, description="Page size in points per series (json/columnar formats, at most HISTORICAL_PAGE_MAX_LIMIT); the response carries `next_cursor` while more data remains"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page; repeat the same installation and time range")
 ):
     """Fetches historical electrical measurements within a time range."""
     if start_time >= end_time:
         raise HTTPException(status_code=400, detail="End time must be after start time")
-    data = await get_historical_electrical_data(installation_id, start_time, end_time)
+    window = parse_resolution(resolution)
+    check_page_limit(limit)
+    page_cursor = parse_page_cursor(cursor, "electrical", installation_id, start_time, end_time)
+    response_format = resolve_historical_format(request, format)
+    # Rangos cerrados: inmutables si ya no pueden cambiar, si no caché corta. El stream
+    # NDJSON siempre lee el bucket crudo; los demás formatos agregados pueden ir a rollups
+    aggregated = response_format != HistoricalFormat.NDJSON and (max_points is not None or resolution is not None)
+    cache_headers = closed_range_headers(end_time, include_severity, aggregated)
+    if response_format == HistoricalFormat.NDJSON:
+        if limit is not None or page_cursor is not None:
+            raise HTTPException(status_code=400, detail="Pagination is not available for the ndjson format")
+        chunks = stream_historical_electrical_data(installation_id, start_time, end_time, max_points, window, aggregate)
+        return with_headers(StreamingResponse(ndjson_lines(chunks), media_type=NDJSON_MEDIA_TYPE), response, cache_headers)
+    if response_format == HistoricalFormat.COLUMNAR:
+        # Se construye como dict plano (esquema ColumnarHistoricalData) sin validación por punto
+        columnar = await cancel_on_disconnect(request, get_historical_electrical_columnar(
+            installation_id, start_time, end_time, max_points, window, aggregate, include_severity, limit, page_cursor
+        ))
+        if columnar is None:
+            raise HTTPException(status_code=404, detail="Electrical historical data not found for the specified criteria")
+        return with_headers(json_response(columnar), response, cache_headers)
+    if get_settings().FAST_JSON_RESPONSES:
+        # Mismo JSON que el response_model, sin modelo por punto ni segunda validación
+        content = await cancel_on_disconnect(request, get_historical_electrical_json(
+            installation_id, start_time, end_time, max_points, window, aggregate, include_severity, limit, page_cursor
+        ))
+        if content is None:
+            raise HTTPException(status_code=404, detail="Electrical historical data not found for the specified criteria")
+        return with_headers(json_response(content), response, cache_headers)
+    data = await cancel_on_disconnect(request, get_historical_electrical_data(
+        installation_id, start_time, end_time, max_points, window, aggregate, include_severity, limit, page_cursor
+    ))
     if data is None or not data.data :
          raise HTTPException(status_code=404, detail="Electrical historical data not found for the specified criteria")
-    return data
+    return with_headers(data, response, cache_headers)
+
+@router.get(
+    "/stats",
+    response_model=InstallationStatistics,
+    response_model_exclude_none=True,
+    summary="Get Electrical Statistics"
+)
+async def read_electrical_statistics(
+    response: Response,
+    installation_id: str = Path(..., description="Unique ID of the installation"),
+    start_time: datetime = Query(..., description="Start timestamp ISO 8601"),
+    end_time: datetime = Query(..., description="End timestamp ISO 8601"),
+    window: StatsWindow = Query(StatsWindow.DAY, description="Window: 'hour', 'day' or 'week' (UTC; weeks start on Monday)"),
+    aggregates: str = Query(DEFAULT_STATS_AGGREGATES, description="Comma-separated statistics: min, max, mean, stddev, p95, p99, consumption (energy used per window)")
+):
+    """Per-window statistics (e.g. daily peaks, average power factor, kWh consumed per day) computed in InfluxDB."""
+    check_stats_range(start_time, end_time, window)
+    requested = parse_stats_aggregates(aggregates)
+    data = await get_electrical_statistics(installation_id, start_time, end_time, window, requested)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Electrical statistics not found for the specified criteria")
+    return with_headers(data, response, closed_range_headers(end_time))
@@ -0,0 +1,66 @@
+# routers/fleet.py
+from fastapi import APIRouter, HTTPException, Query, Path, Request, Response
+from fastapi.responses import JSONResponse
+from typing import List, Union
+
+from ..core.config import get_settings
+from ..core.metrics import TimedRoute
+from ..models.fleet import FleetRealtimeData, FleetRealtimeRequest, RealtimeSnapshotData
+from ..services.data_provider import get_fleet_realtime_data, get_realtime_snapshot
+from ..services.serialization import model_json
+from .common import json_response, realtime_response
+
+# Máximo de instalaciones por petición (el conjunto viaja en una sola consulta Flux)
+MAX_FLEET_IDS = 1000
+
+router = APIRouter(
+    prefix="/installations",
+    tags=["Fleet Data"],
+    route_class=TimedRoute
+)
+
+async def _fleet_response(ids: List[str]) -> Union[FleetRealtimeData, JSONResponse]:
+    # Quitar vacíos y duplicados manteniendo el orden
+    unique_ids = list(dict.fromkeys(i.strip() for i in ids if i.strip()))
+    if not unique_ids:
+        raise HTTPException(status_code=400, detail="At least one installation ID is required")
+    if len(unique_ids) > MAX_FLEET_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_FLEET_IDS} installation IDs per request")
+    installations = await get_fleet_realtime_data(unique_ids)
+    data = FleetRealtimeData(
+        installations=installations,
+        missing=[i for i in unique_ids if i not in installations]
+    )
+    if get_settings().FAST_JSON_RESPONSES:
+        return json_response(model_json(data))
+    return data
+
+@router.get("/realtime", response_model=FleetRealtimeData, summary="Get Real-time Data for Many Installations")
+async def read_fleet_realtime(ids: str = Query(..., description="Comma-separated installation IDs")):
+    """Fetches the most recent electrical and physical data of several installations in one query."""
+    return await _fleet_response(ids.split(","))
+
+@router.post("/realtime", response_model=FleetRealtimeData, summary="Get Real-time Data for Many Installations (POST)")
+async def read_fleet_realtime_post(body: FleetRealtimeRequest):
+    """Same as the GET form, for ID lists too long for a query string."""
+    return await _fleet_response(body.ids)
+
+@router.get("/{installation_id}/realtime", response_model=RealtimeSnapshotData, tags=["Snapshot"], summary="Get Real-time Snapshot")
+async def read_realtime_snapshot(
+    request: Request,
+    response: Response,
+    installation_id: str = Path(..., description="Unique ID of the installation")
+):
+    """
+    Fetches the latest electrical and physical measurements in a single query, with the age of each value.
+    Supports If-None-Match (304 while no series has a newer value; ages are not revalidated).
+    """
+    data = await get_realtime_snapshot(installation_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Realtime snapshot data not found")
+    # ETag débil: generated_at y las antigüedades cambian en cada llamada, los datos no
+    series_times = {}
+    for part in (data.electrical, data.physical):
+        if part is not None:
+            series_times.update(part.series_times())
+    return realtime_response(request, response, data, series_times)
@@ -0,0 +1,148 @@
+# routers/ingest.py
+import math
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Request, Security
+from fastapi.exceptions import RequestValidationError
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pydantic import ValidationError
+
+from ..core.config import get_settings
+from ..core.metrics import TimedRoute
+from ..models.ingest import IngestResult, MeasurementBatch
+from ..services.gateway_keys import GatewayKey, get_gateway_keys
+from ..services.ingest import (
+    backfill_limit_us,
+    encode_batch,
+    future_limit_us,
+    get_ingest_buffer,
+    late_write_hook,
+    newest_sample_us,
+    oldest_sample_us,
+)
+
+router = APIRouter(
+    prefix="/installations",
+    tags=["Ingestion"],
+    route_class=TimedRoute
+)
+
+_bearer = HTTPBearer(auto_error=False, description="Gateway ingestion key (Authorization: Bearer <key>)")
+
+async def require_gateway_key(
+    installation_id: str = Path(..., description="Unique ID of the installation"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(_bearer)
+) -> GatewayKey:
+    """Comprueba que la clave del gateway existe (401) y cubre la instalación de la ruta (403)."""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Missing gateway key", headers={"WWW-Authenticate": "Bearer"})
+    gateway = get_gateway_keys().lookup(credentials.credentials)
+    if gateway is None:
+        raise HTTPException(status_code=401, detail="Invalid gateway key", headers={"WWW-Authenticate": "Bearer"})
+    if not gateway.allows(installation_id):
+        raise HTTPException(status_code=403, detail="Gateway key is not allowed to write to this installation")
+    return gateway
+
+def _inline_defs(schema: Any, defs: Dict[str, Any]) -> Any:
+    """Sustituye las referencias a `$defs` por el esquema referido (no hay modelos recursivos)."""
+    if isinstance(schema, dict):
+        ref = schema.get("$ref", "")
+        if ref.startswith("#/$defs/"):
+            return _inline_defs(defs[ref[len("#/$defs/"):]], defs)
+        return {key: _inline_defs(value, defs) for key, value in schema.items()}
+    if isinstance(schema, list):
+        return [_inline_defs(item, defs) for item in schema]
+    return schema
+
+def _batch_request_body() -> Dict[str, Any]:
+    """requestBody de OpenAPI para el lote, que el endpoint lee a mano y FastAPI no ve."""
+    schema = MeasurementBatch.model_json_schema()
+    defs = schema.pop("$defs", {})
+    return {
+        "required": True,
+        "content": {"application/json": {"schema": _inline_defs(schema, defs)}},
+    }
+
+async def _read_batch(request: Request) -> MeasurementBatch:
+    """
+    Lee y valida el lote una vez autenticado el gateway.
+
+    FastAPI lee y valida los cuerpos declarados antes de resolver las dependencias;
+    aquí se lee a mano, después de require_gateway_key, y con el tamaño acotado:
+    por Content-Length antes de leer nada y, sin él (chunked), mientras se lee.
+    """
+    settings = get_settings()
+    too_large = HTTPException(status_code=413, detail=f"Request body larger than {settings.INGEST_MAX_BODY_BYTES} bytes")
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > settings.INGEST_MAX_BODY_BYTES:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > settings.INGEST_MAX_BODY_BYTES:
+            raise too_large
+    try:
+        return MeasurementBatch.model_validate_json(bytes(body))
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+
+@router.post(
+    "/{installation_id}/measurements",
+    response_model=IngestResult,
+    status_code=202,
+    responses={
+        401: {"description": "Missing or unknown gateway key"},
+        403: {"description": "Gateway key not allowed for this installation"},
+        413: {"description": "Request body or batch too large"},
+        422: {"description": "Invalid batch, installation ID or samples outside the accepted time range"},
+        429: {"description": "Write buffer full, retry later"}
+    },
+    dependencies=[Depends(require_gateway_key)],
+    openapi_extra={"requestBody": _batch_request_body()},
+    summary="Ingest Measurement Batch"
+)
+async def ingest_measurements(
+    request: Request,
+    installation_id: str = Path(..., description="Unique ID of the installation")
+):
+    """
+    Accepts a batch of electrical and/or physical samples for one installation
+    (JSON body: `{"electrical": [...], "physical": [...]}`).
+    Requires `Authorization: Bearer <key>` with a gateway key allowed for the installation;
+    the body is only read once the key is accepted, and bodies over INGEST_MAX_BODY_BYTES
+    are rejected with 413.
+
+    Samples are queued and written to InfluxDB in the background, coalesced with other
+    batches; 202 means accepted, not yet persisted. When the buffer is full the whole
+    batch is rejected with 429 and a Retry-After header. Samples older than
+    INGEST_MAX_BACKFILL_SECONDS, or more than INGEST_MAX_FUTURE_SKEW_SECONDS in the
+    future, are rejected with 422.
+    """
+    settings = get_settings()
+    batch = await _read_batch(request)
+    samples = len(batch.electrical) + len(batch.physical)
+    if samples > settings.INGEST_MAX_BATCH_SAMPLES:
+        raise HTTPException(status_code=413, detail=f"At most {settings.INGEST_MAX_BATCH_SAMPLES} samples per batch")
+    oldest_us = oldest_sample_us(batch)
+    if oldest_us < backfill_limit_us():
+        raise HTTPException(
+            status_code=422, detail=f"Samples older than {settings.INGEST_MAX_BACKFILL_SECONDS} seconds are not accepted"
+        )
+    if newest_sample_us(batch) > future_limit_us():
+        raise HTTPException(
+            status_code=422,
+            detail=f"Samples more than {settings.INGEST_MAX_FUTURE_SKEW_SECONDS} seconds in the future are not accepted"
+        )
+    try:
+        lines = encode_batch(installation_id, batch)
+    except ValueError as e:
+        # Un installation_id que no se puede escribir como tag (p.ej. con saltos de línea)
+        raise HTTPException(status_code=422, detail=str(e))
+    if not get_ingest_buffer().offer(lines, on_written=late_write_hook(installation_id, oldest_us)):
+        raise HTTPException(
+            status_code=429, detail="Ingestion buffer is full",
+            headers={"Retry-After": str(max(1, math.ceil(settings.INGEST_FLUSH_INTERVAL_SECONDS)))}
+        )
+    return IngestResult(samples=samples, points=len(lines))
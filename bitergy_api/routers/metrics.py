@@ -0,0 +1,12 @@
+# routers/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from ..core.metrics import PROMETHEUS_CONTENT_TYPE, render_metrics
+
+router = APIRouter(tags=["Metrics"])
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """Métricas del servicio en formato de texto de Prometheus."""
+    return Response(content=render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
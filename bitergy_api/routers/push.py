@@ -0,0 +1,93 @@
+# routers/push.py
+import asyncio
+import json
+from typing import AsyncIterator, List
+
+from fastapi import APIRouter, HTTPException, Path, Query, Request, WebSocket
+from fastapi.responses import StreamingResponse
+
+from ..core.metrics import TimedRoute
+from ..services.realtime_push import get_realtime_hub
+from .fleet import MAX_FLEET_IDS
+
+SSE_MEDIA_TYPE = "text/event-stream"
+# Comentario SSE enviado si no hay cambios, para mantener viva la conexión
+SSE_KEEPALIVE_SECONDS = 15.0
+
+router = APIRouter(
+    prefix="/installations",
+    tags=["Realtime Push"],
+    route_class=TimedRoute
+)
+
+def _parse_ids(ids: str) -> List[str]:
+    unique_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if not unique_ids:
+        raise HTTPException(status_code=400, detail="At least one installation ID is required")
+    if len(unique_ids) > MAX_FLEET_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_FLEET_IDS} installation IDs per request")
+    return unique_ids
+
+async def _sse_events(request: Request, installation_ids: List[str]) -> AsyncIterator[bytes]:
+    # La suscripción vive dentro del generador para liberarse siempre al cerrar el stream
+    hub = get_realtime_hub()
+    subscriber = hub.subscribe(installation_ids)
+    try:
+        while not await request.is_disconnected():
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield f"event: {message['type']}\ndata: {json.dumps(message, ensure_ascii=False)}\n\n".encode("utf-8")
+    finally:
+        hub.unsubscribe(subscriber)
+
+async def _websocket_session(websocket: WebSocket, installation_ids: List[str]) -> None:
+    await websocket.accept()
+    hub = get_realtime_hub()
+    subscriber = hub.subscribe(installation_ids)
+
+    async def wait_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    reader = asyncio.create_task(wait_disconnect())
+    try:
+        while True:
+            getter = asyncio.ensure_future(subscriber.queue.get())
+            done, _ = await asyncio.wait({getter, reader}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                break
+            await websocket.send_json(getter.result())
+    except Exception as e:
+        print(f"WARN: Realtime websocket closed for {installation_ids}: {e}")
+    finally:
+        reader.cancel()
+        hub.unsubscribe(subscriber)
+
+@router.get("/realtime/events", summary="Stream Real-time Data for Many Installations (SSE)")
+async def stream_fleet_events(request: Request, ids: str = Query(..., description="Comma-separated installation IDs")):
+    """Server-Sent Events: a full snapshot per installation, then only changed fields."""
+    return StreamingResponse(_sse_events(request, _parse_ids(ids)), media_type=SSE_MEDIA_TYPE)
+
+@router.get("/{installation_id}/realtime/events", summary="Stream Real-time Data (SSE)")
+async def stream_installation_events(request: Request, installation_id: str = Path(..., description="Unique ID of the installation")):
+    """Server-Sent Events: a full snapshot, then only changed fields."""
+    return StreamingResponse(_sse_events(request, [installation_id]), media_type=SSE_MEDIA_TYPE)
+
+@router.websocket("/realtime/ws")
+async def websocket_fleet(websocket: WebSocket, ids: str = Query(...)):
+    """WebSocket push for several installations (comma-separated `ids`)."""
+    try:
+        installation_ids = _parse_ids(ids)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await _websocket_session(websocket, installation_ids)
+
+@router.websocket("/{installation_id}/realtime/ws")
+async def websocket_installation(websocket: WebSocket, installation_id: str):
+    """WebSocket push for one installation."""
+    await _websocket_session(websocket, [installation_id])
@@ -0,0 +1,288 @@
+# services/alerts.py
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache, partial
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ..core.config import get_settings
+from ..core.db_client import get_query_api
+from ..core.enums import QueryLane, SeverityLevel
+from ..core.metrics import SKIPPED_RECORDS, StatsCollector
+from ..models.common import InstallationThresholds
+from .fanout import gather_bounded
+from .flux_csv import iter_csv_rows, rfc3339_to_epoch_us
+from .flux_queries import installations_query, latest_query
+from .serialization import format_epoch_us
+from .severity import CompiledThresholds, classify_value
+from .thresholds import ThresholdIndex, get_threshold_store
+
+# Solo se consultan los measurements que pueden tener umbrales
+ALERT_MEASUREMENTS = list(InstallationThresholds.model_fields)
+_LATEST_CSV_COLUMNS = ("installation_id", "_measurement", "_field", "_time", "_value")
+
+# Posición de cada nivel: negativa por debajo de Normal, positiva por encima
+_RANK = {
+    SeverityLevel.CRITICAL_LOW: -2, SeverityLevel.LOW: -1, SeverityLevel.NORMAL: 0,
+    SeverityLevel.HIGH: 1, SeverityLevel.CRITICAL_HIGH: 2,
+}
+
+def _with_hysteresis(value: float, level: SeverityLevel, current: SeverityLevel, compiled: CompiledThresholds, hysteresis: float) -> SeverityLevel:
+    """
+    Hacia un nivel menos severo que `current` solo se pasa si el valor sigue ahí
+    desplazado un `hysteresis` (fracción del valor) hacia el lado de `current`;
+    subir de severidad no tiene margen.
+    """
+    current_rank = _RANK.get(current)
+    if current_rank is None or level == current:
+        return level
+    margin = abs(value) * hysteresis
+    if current_rank > 0 and _RANK[level] < current_rank:
+        relaxed = classify_value(value + margin, compiled)
+        return relaxed if _RANK[relaxed] < current_rank else current
+    if current_rank < 0 and _RANK[level] > current_rank:
+        relaxed = classify_value(value - margin, compiled)
+        return relaxed if _RANK[relaxed] > current_rank else current
+    return level
+
+class _VariableState:
+    """Estado de alerta de una variable de una instalación."""
+    __slots__ = ("level", "since_us", "value", "value_us", "pending", "pending_us", "compiled")
+
+    def __init__(self, value: float, value_us: int, compiled: CompiledThresholds):
+        self.level = SeverityLevel.UNKNOWN
+        self.since_us = value_us
+        self.value = value
+        self.value_us = value_us
+        self.pending: Optional[SeverityLevel] = None
+        self.pending_us = value_us
+        self.compiled = compiled
+
+class AlertEngine:
+    """
+    Evalúa en segundo plano los últimos valores de todas las instalaciones con umbrales.
+
+    Cada pasada lee los últimos valores con una consulta por lote de instalaciones
+    y solo reevalúa las variables con un dato nuevo (o umbrales recargados). Un
+    nivel nuevo se confirma cuando se mantiene `min_duration_seconds` en tiempo de
+    los datos, y para volver hacia Normal el valor debe rebasar el borde con el
+    margen de histéresis. Los endpoints leen el estado en memoria: nunca consultan
+    InfluxDB.
+    """
+
+    def __init__(
+        self, interval_seconds: float, batch_size: int, parallelism: int, hysteresis_percent: float,
+        min_duration_seconds: float, feed_size: int, discovery_interval_seconds: float, discovery_lookback_seconds: int
+    ):
+        self.interval_seconds = interval_seconds
+        self.batch_size = max(1, batch_size)
+        self.parallelism = parallelism
+        self.hysteresis = hysteresis_percent / 100
+        self.min_duration_us = int(min_duration_seconds * 1_000_000)
+        self.discovery_interval_seconds = discovery_interval_seconds
+        self.discovery_lookback = timedelta(seconds=discovery_lookback_seconds)
+        self._states: Dict[str, Dict[str, _VariableState]] = {}
+        self._active: Dict[Tuple[str, str], _VariableState] = {}
+        self._active_view: Optional[List[dict]] = None # Se reconstruye como mucho una vez por pasada
+        self._feed: Deque[dict] = deque(maxlen=feed_size)
+        self._seq = 0
+        self._discovered: List[str] = []
+        self._discovered_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self.evaluated_at: Optional[str] = None
+        self.runs = 0
+        self.errors = 0
+        self.queries = 0
+        self.evaluations = 0
+        self.transitions = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"ERROR: Alert evaluation failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def run_once(self) -> int:
+        """Una pasada sobre todas las instalaciones. Devuelve las transiciones confirmadas."""
+        index = get_threshold_store().index
+        installation_ids = await self._installation_ids(index)
+        batches = [installation_ids[i:i + self.batch_size] for i in range(0, len(installation_ids), self.batch_size)]
+        results = await gather_bounded([partial(self._query_latest, batch) for batch in batches], self.parallelism)
+        before = self.transitions
+        for rows in results:
+            self._apply(rows, index)
+        # Instalaciones que ya no tienen umbrales dejan de tener estado
+        for installation_id in set(self._states).difference(installation_ids):
+            for variable in self._states.pop(installation_id):
+                self._active.pop((installation_id, variable), None)
+        self._active_view = None
+        self.runs += 1
+        self.evaluated_at = datetime.now(timezone.utc).isoformat()
+        return self.transitions - before
+
+    async def _installation_ids(self, index: ThresholdIndex) -> List[str]:
+        """Las instalaciones del fichero de umbrales y, si hay `defaults`, las que tienen datos recientes."""
+        installation_ids = index.installation_ids()
+        if index.default is None:
+            return installation_ids
+        now = time.monotonic()
+        if self._discovered_at is None or now - self._discovered_at >= self.discovery_interval_seconds:
+            query_api = await get_query_api(QueryLane.BACKGROUND, "alerts_discovery")
+            flux_query, params = installations_query(self.discovery_lookback)
+            text = await query_api.query_raw(query=flux_query, org=get_settings().INFLUXDB_ORG, params=params)
+            self._discovered = [value for (value,) in iter_csv_rows(text, ("_value",)) if value]
+            self._discovered_at = now
+        return list(dict.fromkeys(installation_ids + self._discovered))
+
+    async def _query_latest(self, installation_ids: List[str]) -> List[Tuple[str, str, str, int, float]]:
+        """Últimos valores de un lote: (installation_id, measurement, field, epoch-µs, valor)."""
+        query_api = await get_query_api(QueryLane.BACKGROUND, "alerts")
+        flux_query, params = latest_query(installation_ids, ALERT_MEASUREMENTS)
+        text = await query_api.query_raw(query=flux_query, org=get_settings().INFLUXDB_ORG, params=params)
+        self.queries += 1
+        rows = []
+        for installation_id, measurement, field, time_text, value_text in iter_csv_rows(text, _LATEST_CSV_COLUMNS):
+            if not value_text:
+                continue
+            try:
+                rows.append((installation_id, measurement, field, rfc3339_to_epoch_us(time_text), float(value_text)))
+            except (ValueError, IndexError) as e:
+                SKIPPED_RECORDS.inc("alerts")
+                print(f"WARN: Skipping row due to parsing error in alerts: {e} - Row: {installation_id},{measurement},{field},{time_text},{value_text}")
+        query_api.record_rows(len(rows))
+        return rows
+
+    def _apply(self, rows: List[Tuple[str, str, str, int, float]], index: ThresholdIndex) -> None:
+        for installation_id, measurement, field, value_us, value in rows:
+            compiled = index.compiled(installation_id, measurement)
+            if compiled is None:
+                continue # Variable sin umbrales para esta instalación
+            variables = self._states.get(installation_id)
+            if variables is None:
+                variables = self._states[installation_id] = {}
+            variable = f"{measurement}.{field}"
+            state = variables.get(variable)
+            if state is None:
+                state = variables[variable] = _VariableState(value, value_us, compiled)
+            elif value_us == state.value_us and compiled is state.compiled:
+                continue # Ni dato nuevo ni umbrales nuevos
+            self._evaluate(installation_id, variable, state, value, value_us, compiled)
+
+    def _evaluate(
+        self, installation_id: str, variable: str, state: _VariableState,
+        value: float, value_us: int, compiled: CompiledThresholds
+    ) -> None:
+        self.evaluations += 1
+        level = _with_hysteresis(value, classify_value(value, compiled), state.level, compiled, self.hysteresis)
+        state.value, state.value_us, state.compiled = value, value_us, compiled
+        if level == state.level:
+            state.pending = None
+            return
+        # Un cambio hacia el mismo lado (p.ej. High -> Critical High) conserva el inicio de la excursión
+        if state.pending is None or (level != state.pending and _RANK[level] * _RANK[state.pending] <= 0):
+            state.pending_us = value_us
+        state.pending = level
+        if state.level != SeverityLevel.UNKNOWN and value_us - state.pending_us < self.min_duration_us:
+            return
+        # Sin nivel previo (arranque) el primero se confirma directamente
+        previous = state.level
+        state.level, state.since_us, state.pending = level, state.pending_us, None
+        if level == SeverityLevel.NORMAL:
+            self._active.pop((installation_id, variable), None)
+        else:
+            self._active[(installation_id, variable)] = state
+        if previous == SeverityLevel.UNKNOWN and level == SeverityLevel.NORMAL:
+            return # Arranque normal: no es una transición que interese
+        self._seq += 1
+        self.transitions += 1
+        self._feed.append({
+            "seq": self._seq,
+            "asset_id": installation_id,
+            "variable": variable,
+            "from_severity": previous.value,
+            "to_severity": level.value,
+            "value": value,
+            "time": format_epoch_us(state.since_us),
+        })
+
+    @staticmethod
+    def _state_view(installation_id: str, variable: str, state: _VariableState) -> dict:
+        return {
+            "asset_id": installation_id,
+            "variable": variable,
+            "severity": state.level.value,
+            "value": state.value,
+            "value_time": format_epoch_us(state.value_us),
+            "since": format_epoch_us(state.since_us),
+            "pending_severity": state.pending.value if state.pending is not None else None,
+        }
+
+    def active_alerts(self) -> Dict[str, Any]:
+        """Variables fuera de Normal, las más severas primero."""
+        if self._active_view is None:
+            ordered = sorted(self._active.items(), key=lambda item: (-abs(_RANK[item[1].level]), item[0]))
+            self._active_view = [self._state_view(installation_id, variable, state) for (installation_id, variable), state in ordered]
+        return {"evaluated_at": self.evaluated_at, "alerts": self._active_view}
+
+    def installation_alerts(self, installation_id: str) -> Optional[Dict[str, Any]]:
+        variables = self._states.get(installation_id)
+        if variables is None:
+            return None
+        return {
+            "asset_id": installation_id,
+            "evaluated_at": self.evaluated_at,
+            "variables": [self._state_view(installation_id, variable, state) for variable, state in variables.items()],
+        }
+
+    def transitions_after(self, after: int, limit: int) -> Dict[str, Any]:
+        """Transiciones con `seq` > `after` que siguen en el feed (las más antiguas se descartan)."""
+        if after > self._seq:
+            after = 0 # El motor se reinició: se empieza de nuevo
+        start = after - self._feed[0]["seq"] + 1 if self._feed else 0
+        transitions = list(islice(self._feed, max(0, start), max(0, start) + limit))
+        return {"transitions": transitions, "last_seq": transitions[-1]["seq"] if transitions else self._seq}
+
+    def stats(self) -> Dict[str, Any]:
+        active: Dict[str, int] = {}
+        for state in self._active.values():
+            active[state.level.value] = active.get(state.level.value, 0) + 1
+        return {
+            "running": self._task is not None,
+            "installations": len(self._states),
+            "active": active,
+            "runs": self.runs,
+            "errors": self.errors,
+            "queries": self.queries,
+            "evaluations": self.evaluations,
+            "transitions": self.transitions,
+            "evaluated_at": self.evaluated_at,
+        }
+
+@lru_cache(maxsize=None)
+def get_alert_engine() -> AlertEngine:
+    settings = get_settings()
+    return AlertEngine(
+        settings.ALERTS_INTERVAL_SECONDS, settings.ALERTS_BATCH_SIZE, settings.ALERTS_QUERY_PARALLELISM,
+        settings.ALERTS_HYSTERESIS_PERCENT, settings.ALERTS_MIN_DURATION_SECONDS, settings.ALERTS_FEED_SIZE,
+        settings.ALERTS_DISCOVERY_INTERVAL_SECONDS, settings.ALERTS_DISCOVERY_LOOKBACK_SECONDS
+    )
+
+StatsCollector(
+    "bitergy_alerts", "Background alert engine.", {"": lambda: get_alert_engine().stats()},
+    counters={"runs", "errors", "queries", "evaluations", "transitions"}, nested_label="severity"
+)
@@ -0,0 +1,76 @@
+# services/cache.py
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+class TTLCache:
+    """
+    Caché en proceso con TTL corto, desalojo LRU acotado y coalescencia de fallos.
+
+    Varias peticiones concurrentes que fallan sobre la misma clave comparten una
+    única carga en curso (single-flight) en lugar de lanzar cada una su consulta.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Devuelve el valor cacheado o lo carga con `loader`, compartiendo la carga en curso."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield: si este cliente se cancela, la carga compartida sigue para los demás
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.ensure_future(loader())
+        self._inflight[key] = future
+        future.add_done_callback(lambda f, key=key: self._on_loaded(key, f))
+        return await asyncio.shield(future)
+
+    def _on_loaded(self, key: Hashable, future: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, future.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -1,12 +1,39 @@
 # services/data_provider.py
+import asyncio
 import os
-from datetime import datetime
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache, partial
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 # Importar cliente y configuración
 from ..core.db_client import get_query_api
-from ..core.config import settings
-from ..core.enums import SeverityLevel
+from ..core.metrics import SKIPPED_RECORDS, StatsCollector, timed, timed_phase
+from ..core.config import get_settings
+from ..core.enums import AggregateFunction, QueryLane, SeverityLevel, StatsAggregate, StatsWindow
+
+from .cache import TTLCache
+from .fanout import gather_bounded, split_range
+from .flux_csv import iter_csv_rows, iter_pivoted_rows, rfc3339_to_epoch_us
+from .flux_queries import PIVOT_META_COLUMNS, historical_query, latest_query, stats_query
+from .historical_cache import (
+    HistoricalColumns,
+    SeriesColumns,
+    SegmentCache,
+    contiguous_runs,
+    segment_size_us,
+    split_by_segment
+)
+from .pagination import PageCursor, encode_cursor, next_page
+from .rollups import RollupWorker, default_rollup_tiers
+from .serialization import grouped_historical_json, severity_summary_json
+from .severity import classify_series, summarize_severity
+from .thresholds import get_threshold_store
+from .downsampling import (
+    LTTB_OVERSAMPLING,
+    choose_aggregate_window,
+    flux_aggregate_fn,
+    lttb_indices
+)
 
 # Importar modelos comunes
 from ..models.common import (
@@ -21,6 +48,8 @@ from ..models.electrical import (
     ElectricalVariableValue,
     GroupedHistoricalElectricalData # <-- Importar desde aquí
 )
+from ..models.fleet import InstallationRealtimeData, RealtimeSnapshotData
+from ..models.stats import InstallationStatistics, StatisticsWindow, VariableStatistics
 # Importar modelos específicos físicos
 from ..models.physical import (
     RealtimePhysicalData,
@@ -46,18 +75,8 @@ def get_unit_for_measurement(measurement: str, field: Optional[str] = None) -> s
     return units.get(measurement, "unknown_unit") # Devuelve 'unknown_unit' si no se encuentra
 
 def _get_thresholds_for_installation(installation_id: str) -> Optional[InstallationThresholds]:
-    """Simula la obtención de umbrales para una instalación."""
-    # En una aplicación real, obtendrías esto de Firebase, un archivo de config, etc.
-    if installation_id == "siteA-mainpanel":
-        return InstallationThresholds(
-            voltage=Thresholds(critical_low=207, low=218.5, high=241.5, critical_high=253),
-            current=Thresholds(high=80, critical_high=95), # Asume 100A max
-            frequency=Thresholds(critical_low=48, low=49.5, high=50.5, critical_high=52), # Asume 50Hz nominal
-            temperature=Thresholds(low=5, high=40, critical_high=50),
-            humidity=Thresholds(high=85, critical_high=95)
-        )
-    # Devuelve None si no se encuentran umbrales para la instalación
-    return None
+    """Umbrales efectivos de una instalación desde el índice de umbrales (O(1), sin construir modelos)."""
+    return get_threshold_store().get(installation_id)
 
 def _calculate_severity(value: Optional[float], thresholds: Optional[Thresholds]) -> SeverityLevel:
     """Calcula el nivel de severidad basado en el valor y los umbrales."""
@@ -80,83 +99,168 @@ def _calculate_severity(value: Optional[float], thresholds: Optional[Thresholds]
 
 # --- Funciones de recuperación de datos ---
 
+@lru_cache(maxsize=None)
+def get_realtime_cache() -> TTLCache:
+    """Caché compartida de realtime, clave (tipo de dato, installation_id)."""
+    settings = get_settings()
+    return TTLCache(settings.REALTIME_CACHE_TTL_SECONDS, settings.REALTIME_CACHE_MAX_ENTRIES)
+
 async def get_realtime_electrical_data(installation_id: str) -> Optional[RealtimeElectricalData]:
+    """Datos eléctricos más recientes, servidos desde la caché de realtime cuando es posible."""
+    return await get_realtime_cache().get_or_load(
+        ("electrical", installation_id), lambda: _query_realtime_electrical_data(installation_id)
+    )
+
+async def get_realtime_physical_data(installation_id: str) -> Optional[RealtimePhysicalData]:
+    """Datos físicos más recientes, servidos desde la caché de realtime cuando es posible."""
+    return await get_realtime_cache().get_or_load(
+        ("physical", installation_id), lambda: _query_realtime_physical_data(installation_id)
+    )
+
+REALTIME_ELECTRICAL_MEASUREMENTS = [
+    "voltage", "current", "active_power", "apparent_power",
+    "reactive_power", "power_factor", "frequency", "energy"
+]
+REALTIME_PHYSICAL_MEASUREMENTS = ["temperature", "humidity", "level"] # Ajusta según tus measurements
+
+def _phase_data(values: Dict[str, ElectricalVariableValue]) -> PhaseData:
+    return PhaseData(a=values.get("phase_a"), b=values.get("phase_b"), c=values.get("phase_c"))
+
+@timed("build")
+def _build_realtime_electrical(
+    installation_id: str, records, threshold_config: Optional[InstallationThresholds]
+) -> Optional[RealtimeElectricalData]:
+    """Mapea los últimos registros eléctricos de una instalación al modelo, calculando severidades."""
+    latest_data: Dict[str, Dict[str, ElectricalVariableValue]] = {}
+    latest_timestamp: Optional[datetime] = None
+    series_times: Dict[str, datetime] = {}
+
+    for record in records:
+        try:
+            measurement = record.get_measurement()
+            field = record.get_field()
+            value = record.get_value()
+            time = record.get_time()
+
+            if latest_timestamp is None or time > latest_timestamp:
+                latest_timestamp = time
+            series_times[f"{measurement}.{field}"] = time
+
+            if measurement not in latest_data:
+                latest_data[measurement] = {}
+
+            current_thresholds: Optional[Thresholds] = None
+            if threshold_config:
+                if measurement == "voltage": current_thresholds = threshold_config.voltage
+                elif measurement == "current": current_thresholds = threshold_config.current
+                elif measurement == "frequency": current_thresholds = threshold_config.frequency
+                elif measurement == "power_factor": current_thresholds = threshold_config.power_factor
+                # Añadir lógica para otros (power etc.) si tienen umbrales
+
+            latest_data[measurement][field] = ElectricalVariableValue(
+                value=value,
+                unit=get_unit_for_measurement(measurement, field),
+                severity=_calculate_severity(value, current_thresholds)
+            )
+        except (KeyError, TypeError, AttributeError) as e:
+            SKIPPED_RECORDS.inc("realtime_electrical")
+            print(f"WARN: Skipping record due to parsing error in realtime electrical: {e} - Record: {record.values if record else 'None'}")
+            continue # Saltar al siguiente registro si este tiene problemas
+
+    if not latest_data:
+        return None
+
+    # Mapeo al objeto Pydantic
+    data = RealtimeElectricalData(
+        asset_id=installation_id,
+        timestamp=latest_timestamp or datetime.utcnow(), # Usar la última hora encontrada o la actual
+        voltage=_phase_data(latest_data["voltage"]) if "voltage" in latest_data else None,
+        current=_phase_data(latest_data["current"]) if "current" in latest_data else None,
+        active_power=_phase_data(latest_data["active_power"]) if "active_power" in latest_data else None,
+        apparent_power=_phase_data(latest_data["apparent_power"]) if "apparent_power" in latest_data else None,
+        reactive_power=_phase_data(latest_data["reactive_power"]) if "reactive_power" in latest_data else None,
+        power_factor=_phase_data(latest_data["power_factor"]) if "power_factor" in latest_data else None,
+        frequency=latest_data.get("frequency", {}).get("value"), # Asume un campo 'value'
+        total_energy_kwh=latest_data.get("energy", {}).get("total_kwh"), # Asume un campo 'total_kwh'
+        total_active_power=latest_data.get("active_power", {}).get("total") # Asume un campo 'total'
+    )
+    data._series_times = series_times
+    return data
+
+@timed("build")
+def _build_realtime_physical(
+    installation_id: str, records, threshold_config: Optional[InstallationThresholds]
+) -> Optional[RealtimePhysicalData]:
+    """Mapea los últimos registros físicos de una instalación al modelo, calculando severidades."""
+    latest_data: Dict[str, PhysicalVariableValue] = {}
+    latest_timestamp: Optional[datetime] = None
+    series_times: Dict[str, datetime] = {}
+
+    for record in records:
+        try:
+            measurement = record.get_measurement()
+            field = record.get_field() # Puede ser 'value' u otro
+            value = record.get_value()
+            time = record.get_time()
+
+            if latest_timestamp is None or time > latest_timestamp:
+                latest_timestamp = time
+            series_times[f"{measurement}.{field}"] = time
+
+            current_thresholds: Optional[Thresholds] = None
+            if threshold_config:
+                if measurement == "temperature": current_thresholds = threshold_config.temperature
+                elif measurement == "humidity": current_thresholds = threshold_config.humidity
+                elif measurement == "level": current_thresholds = threshold_config.level
+
+            # Asigna al measurement si el campo es 'value' o si aún no existe entrada
+            # Si tienes múltiples sensores con diferentes fields, necesitarás ajustar el modelo Pydantic
+            if measurement not in latest_data or field == 'value':
+                latest_data[measurement] = PhysicalVariableValue(
+                    value=value,
+                    unit=get_unit_for_measurement(measurement, field),
+                    severity=_calculate_severity(value, current_thresholds),
+                    sensor_location=record.values.get("location") # Ejemplo: si tienes tag 'location'
+                )
+        except (KeyError, TypeError, AttributeError) as e:
+            SKIPPED_RECORDS.inc("realtime_physical")
+            print(f"WARN: Skipping record due to parsing error in realtime physical: {e} - Record: {record.values if record else 'None'}")
+            continue
+
+    if not latest_data:
+        return None
+
+    # Mapear al objeto Pydantic
+    data = RealtimePhysicalData(
+        asset_id=installation_id,
+        timestamp=latest_timestamp or datetime.utcnow(),
+        temperature=latest_data.get("temperature"),
+        humidity=latest_data.get("humidity"),
+        level=latest_data.get("level") # Alias se maneja en Pydantic si lo usaste
+    )
+    data._series_times = series_times
+    return data
+
+async def _query_realtime_electrical_data(installation_id: str) -> Optional[RealtimeElectricalData]:
     """Obtiene los datos eléctricos más recientes y calcula su severidad."""
+    settings = get_settings()
     try:
-        query_api = await get_query_api()
+        query_api = await get_query_api(QueryLane.REALTIME, "realtime")
         threshold_config = _get_thresholds_for_installation(installation_id)
-        measurements = [
-            "voltage", "current", "active_power", "apparent_power",
-            "reactive_power", "power_factor", "frequency", "energy"
-        ]
-
-        flux_query = f'''
-        from(bucket: "{settings.INFLUXDB_BUCKET}")
-          |> range(start: -5m) // Ventana de búsqueda razonable para 'last()'
-          |> filter(fn: (r) => r["_measurement"] == "{'" or r["_measurement"] == "'.join(measurements)}")
-          |> filter(fn: (r) => r["installation_id"] == "{installation_id}")
-          |> group() // Desagrupar para obtener el último absoluto
-          |> last() // Obtener el último registro por cada _field/_measurement
-        '''
-        # print(f"DEBUG: Realtime Electrical Query:\n{flux_query}") # Descomentar para depurar
-        result = await query_api.query(query=flux_query, org=settings.INFLUXDB_ORG)
+        # Último registro por cada _field/_measurement en los últimos 5 minutos
+        flux_query, params = latest_query([installation_id], REALTIME_ELECTRICAL_MEASUREMENTS)
+        # print(f"DEBUG: Realtime Electrical Query:\n{flux_query}\n{params}") # Descomentar para depurar
+        result = await query_api.query(query=flux_query, org=settings.INFLUXDB_ORG, params=params)
 
         if not result:
             print(f"WARN: No realtime electrical data found for installation '{installation_id}' in bucket '{settings.INFLUXDB_BUCKET}'")
             return None
 
-        latest_data: Dict[str, Dict[str, ElectricalVariableValue]] = {}
-        latest_timestamp: Optional[datetime] = None
-
-        for table in result:
-            for record in table.records:
-                try:
-                    measurement = record.get_measurement()
-                    field = record.get_field()
-                    value = record.get_value()
-                    time = record.get_time()
-
-                    if latest_timestamp is None or time > latest_timestamp:
-                        latest_timestamp = time
-
-                    if measurement not in latest_data:
-                        latest_data[measurement] = {}
-
-                    current_thresholds: Optional[Thresholds] = None
-                    if threshold_config:
-                        if measurement == "voltage": current_thresholds = threshold_config.voltage
-                        elif measurement == "current": current_thresholds = threshold_config.current
-                        elif measurement == "frequency": current_thresholds = threshold_config.frequency
-                        elif measurement == "power_factor": current_thresholds = threshold_config.power_factor
-                        # Añadir lógica para otros (power etc.) si tienen umbrales
-
-                    latest_data[measurement][field] = ElectricalVariableValue(
-                        value=value,
-                        unit=get_unit_for_measurement(measurement, field),
-                        severity=_calculate_severity(value, current_thresholds)
-                    )
-                except (KeyError, TypeError, AttributeError) as e:
-                    print(f"WARN: Skipping record due to parsing error in realtime electrical: {e} - Record: {record.values if record else 'None'}")
-                    continue # Saltar al siguiente registro si este tiene problemas
-
-        if not latest_data:
-             print(f"WARN: Processed data is empty for realtime electrical installation '{installation_id}'")
-             return None
-
-        # Mapeo al objeto Pydantic
-        realtime_obj = RealtimeElectricalData(
-            asset_id=installation_id,
-            timestamp=latest_timestamp or datetime.utcnow(), # Usar la última hora encontrada o la actual
-            voltage=PhaseData(a=latest_data.get("voltage", {}).get("phase_a"),b=latest_data.get("voltage", {}).get("phase_b"),c=latest_data.get("voltage", {}).get("phase_c")) if "voltage" in latest_data else None,
-            current=PhaseData(a=latest_data.get("current", {}).get("phase_a"),b=latest_data.get("current", {}).get("phase_b"),c=latest_data.get("current", {}).get("phase_c")) if "current" in latest_data else None,
-            active_power=PhaseData(a=latest_data.get("active_power", {}).get("phase_a"),b=latest_data.get("active_power", {}).get("phase_b"),c=latest_data.get("active_power", {}).get("phase_c")) if "active_power" in latest_data else None,
-            apparent_power=PhaseData(a=latest_data.get("apparent_power", {}).get("phase_a"), b=latest_data.get("apparent_power", {}).get("phase_b"), c=latest_data.get("apparent_power", {}).get("phase_c")) if "apparent_power" in latest_data else None,
-            reactive_power=PhaseData(a=latest_data.get("reactive_power", {}).get("phase_a"), b=latest_data.get("reactive_power", {}).get("phase_b"), c=latest_data.get("reactive_power", {}).get("phase_c")) if "reactive_power" in latest_data else None,
-            power_factor=PhaseData(a=latest_data.get("power_factor", {}).get("phase_a"), b=latest_data.get("power_factor", {}).get("phase_b"), c=latest_data.get("power_factor", {}).get("phase_c")) if "power_factor" in latest_data else None,
-            frequency=latest_data.get("frequency", {}).get("value"), # Asume un campo 'value'
-            total_energy_kwh=latest_data.get("energy", {}).get("total_kwh"), # Asume un campo 'total_kwh'
-            total_active_power=latest_data.get("active_power", {}).get("total") # Asume un campo 'total'
+        realtime_obj = _build_realtime_electrical(
+            installation_id, (record for table in result for record in table.records), threshold_config
         )
+        if realtime_obj is None:
+             print(f"WARN: Processed data is empty for realtime electrical installation '{installation_id}'")
         return realtime_obj
 
     except Exception as e:
@@ -166,191 +270,1064 @@ async def get_realtime_electrical_data(installation_id: str) -> Optional[Realtim
         # traceback.print_exc()
         return None
 
-async def get_realtime_physical_data(installation_id: str) -> Optional[RealtimePhysicalData]:
+async def _query_realtime_physical_data(installation_id: str) -> Optional[RealtimePhysicalData]:
     """Obtiene los datos físicos más recientes y calcula su severidad."""
+    settings = get_settings()
     try:
-        query_api = await get_query_api()
+        query_api = await get_query_api(QueryLane.REALTIME, "realtime")
         threshold_config = _get_thresholds_for_installation(installation_id)
-        measurements = ["temperature", "humidity", "level"] # Ajusta según tus measurements
-
-        flux_query = f'''
-        from(bucket: "{settings.INFLUXDB_BUCKET}")
-          |> range(start: -5m)
-          |> filter(fn: (r) => r["_measurement"] == "{'" or r["_measurement"] == "'.join(measurements)}")
-          |> filter(fn: (r) => r["installation_id"] == "{installation_id}")
-          |> group() |> last()
-        '''
-        # print(f"DEBUG: Realtime Physical Query:\n{flux_query}")
-        result = await query_api.query(query=flux_query, org=settings.INFLUXDB_ORG)
+        flux_query, params = latest_query([installation_id], REALTIME_PHYSICAL_MEASUREMENTS)
+        # print(f"DEBUG: Realtime Physical Query:\n{flux_query}\n{params}")
+        result = await query_api.query(query=flux_query, org=settings.INFLUXDB_ORG, params=params)
 
         if not result:
             print(f"WARN: No realtime physical data found for installation '{installation_id}' in bucket '{settings.INFLUXDB_BUCKET}'")
             return None
 
-        latest_data: Dict[str, PhysicalVariableValue] = {}
-        latest_timestamp: Optional[datetime] = None
+        realtime_obj = _build_realtime_physical(
+            installation_id, (record for table in result for record in table.records), threshold_config
+        )
+        if realtime_obj is None:
+             print(f"WARN: Processed data is empty for realtime physical installation '{installation_id}'")
+        return realtime_obj
 
-        for table in result:
-            for record in table.records:
-                try:
-                    measurement = record.get_measurement()
-                    field = record.get_field() # Puede ser 'value' u otro
-                    value = record.get_value()
-                    time = record.get_time()
-
-                    if latest_timestamp is None or time > latest_timestamp:
-                        latest_timestamp = time
-
-                    current_thresholds: Optional[Thresholds] = None
-                    if threshold_config:
-                        if measurement == "temperature": current_thresholds = threshold_config.temperature
-                        elif measurement == "humidity": current_thresholds = threshold_config.humidity
-                        elif measurement == "level": current_thresholds = threshold_config.level
-
-                    # Asigna al measurement si el campo es 'value' o si aún no existe entrada
-                    # Si tienes múltiples sensores con diferentes fields, necesitarás ajustar el modelo Pydantic
-                    if measurement not in latest_data or field == 'value':
-                        latest_data[measurement] = PhysicalVariableValue(
-                            value=value,
-                            unit=get_unit_for_measurement(measurement, field),
-                            severity=_calculate_severity(value, current_thresholds),
-                            sensor_location=record.values.get("location") # Ejemplo: si tienes tag 'location'
-                        )
-                except (KeyError, TypeError, AttributeError) as e:
-                    print(f"WARN: Skipping record due to parsing error in realtime physical: {e} - Record: {record.values if record else 'None'}")
-                    continue
+    except Exception as e:
+        print(f"ERROR: Unexpected error in get_realtime_physical_data for '{installation_id}': {e}")
+        return None
 
-        if not latest_data:
-             print(f"WARN: Processed data is empty for realtime physical installation '{installation_id}'")
-             return None
+# --- Tiempo real por lotes (flota) y snapshot combinado ---
+async def get_fleet_realtime_data(installation_ids: List[str]) -> Dict[str, InstallationRealtimeData]:
+    """
+    Últimos datos eléctricos y físicos de varias instalaciones con una sola consulta Flux.
 
-        # Mapear al objeto Pydantic
-        realtime_obj = RealtimePhysicalData(
-            asset_id=installation_id,
-            timestamp=latest_timestamp or datetime.utcnow(),
-            temperature=latest_data.get("temperature"),
-            humidity=latest_data.get("humidity"),
-            level=latest_data.get("level") # Alias se maneja en Pydantic si lo usaste
+    Filtra con `contains(set: ...)` sobre installation_id, agrupa por serie y
+    reparte los registros por instalación antes de mapearlos a los modelos.
+    Las instalaciones sin datos no aparecen en el resultado.
+    """
+    try:
+        query_api = await get_query_api(QueryLane.REALTIME, "fleet")
+        flux_query, params = latest_query(
+            installation_ids, REALTIME_ELECTRICAL_MEASUREMENTS + REALTIME_PHYSICAL_MEASUREMENTS
         )
-        return realtime_obj
+        records = await query_api.query_stream(query=flux_query, org=get_settings().INFLUXDB_ORG, params=params)
 
+        # Repartir registros por instalación y tipo de medida
+        by_installation: Dict[str, tuple] = {}
+        async for record in records:
+            installation_id = record.values.get("installation_id")
+            if installation_id is None:
+                continue
+            buckets = by_installation.get(installation_id)
+            if buckets is None:
+                buckets = by_installation[installation_id] = ([], [])
+            if record.get_measurement() in REALTIME_PHYSICAL_MEASUREMENTS:
+                buckets[1].append(record)
+            else:
+                buckets[0].append(record)
+
+        fleet: Dict[str, InstallationRealtimeData] = {}
+        for installation_id, (electrical_records, physical_records) in by_installation.items():
+            threshold_config = _get_thresholds_for_installation(installation_id)
+            fleet[installation_id] = InstallationRealtimeData(
+                asset_id=installation_id,
+                electrical=_build_realtime_electrical(installation_id, electrical_records, threshold_config),
+                physical=_build_realtime_physical(installation_id, physical_records, threshold_config)
+            )
+        return fleet
     except Exception as e:
-        print(f"ERROR: Unexpected error in get_realtime_physical_data for '{installation_id}': {e}")
+        print(f"ERROR: Unexpected error in get_fleet_realtime_data for {len(installation_ids)} installations: {e}")
+        return {}
+
+async def _query_realtime_snapshot(installation_id: str) -> Optional[tuple]:
+    """
+    Lee en una sola consulta todas las medidas eléctricas y físicas de una instalación.
+
+    Devuelve (InstallationRealtimeData, {"measurement.field": hora del valor}) o None.
+    """
+    settings = get_settings()
+    try:
+        query_api = await get_query_api(QueryLane.REALTIME, "snapshot")
+        flux_query, params = latest_query(
+            [installation_id], REALTIME_ELECTRICAL_MEASUREMENTS + REALTIME_PHYSICAL_MEASUREMENTS
+        )
+        records = await query_api.query_stream(query=flux_query, org=settings.INFLUXDB_ORG, params=params)
+
+        electrical_records = []
+        physical_records = []
+        value_times: Dict[str, datetime] = {}
+        async for record in records:
+            try:
+                measurement = record.get_measurement()
+                value_times[f"{measurement}.{record.get_field()}"] = record.get_time()
+            except (KeyError, TypeError, AttributeError) as e:
+                SKIPPED_RECORDS.inc("realtime_snapshot")
+                print(f"WARN: Skipping record due to parsing error in realtime snapshot: {e} - Record: {record.values if record else 'None'}")
+                continue
+            if measurement in REALTIME_PHYSICAL_MEASUREMENTS:
+                physical_records.append(record)
+            else:
+                electrical_records.append(record)
+
+        if not value_times:
+            print(f"WARN: No realtime snapshot data found for installation '{installation_id}' in bucket '{settings.INFLUXDB_BUCKET}'")
+            return None
+
+        threshold_config = _get_thresholds_for_installation(installation_id)
+        snapshot = InstallationRealtimeData(
+            asset_id=installation_id,
+            electrical=_build_realtime_electrical(installation_id, electrical_records, threshold_config),
+            physical=_build_realtime_physical(installation_id, physical_records, threshold_config)
+        )
+        return snapshot, value_times
+    except Exception as e:
+        print(f"ERROR: Unexpected error in get_realtime_snapshot for '{installation_id}': {e}")
+        return None
+
+async def get_realtime_snapshot(installation_id: str) -> Optional[RealtimeSnapshotData]:
+    """Snapshot eléctrico + físico de una instalación, con la antigüedad de cada valor."""
+    cached = await get_realtime_cache().get_or_load(
+        ("snapshot", installation_id), lambda: _query_realtime_snapshot(installation_id)
+    )
+    if cached is None:
         return None
+    snapshot, value_times = cached
+    # La antigüedad se calcula en cada respuesta, no al cachear
+    now = datetime.now(timezone.utc)
+    return RealtimeSnapshotData(
+        asset_id=installation_id,
+        electrical=snapshot.electrical,
+        physical=snapshot.physical,
+        generated_at=now,
+        value_age_seconds={key: round((now - time).total_seconds(), 3) for key, time in value_times.items()}
+    )
+
+# --- Funciones Históricas ---
+HISTORICAL_ELECTRICAL_MEASUREMENTS = ["voltage", "current", "active_power", "energy", "frequency", "power_factor"]
+HISTORICAL_PHYSICAL_MEASUREMENTS = ["temperature", "humidity", "level"] # Ajusta a tus measurements
+
+# Número de puntos por serie que se acumulan antes de emitir un bloque en modo streaming
+STREAM_CHUNK_SIZE = 500
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _to_epoch_us(time: datetime) -> int:
+    """Microsegundos desde epoch; las fechas sin zona se interpretan como UTC."""
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    return (time - _EPOCH) // timedelta(microseconds=1)
+
+def _from_epoch_us(us: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=us)
+
+def _to_iso(time: datetime) -> str:
+    """ISO 8601 con sufijo 'Z' para UTC, igual que la serialización de Pydantic."""
+    iso = time.isoformat()
+    return iso[:-6] + "Z" if iso.endswith("+00:00") else iso
+
+def _historical_window(
+    start: datetime, end: datetime, max_points: Optional[int],
+    resolution: Optional[timedelta], aggregate: AggregateFunction
+) -> Optional[timedelta]:
+    """Intervalo de agregación a usar; con LTTB se sobremuestrea para que el reductor tenga margen."""
+    if aggregate == AggregateFunction.LTTB and max_points and resolution is None:
+        return choose_aggregate_window(start, end, max_points * LTTB_OVERSAMPLING)
+    return choose_aggregate_window(start, end, max_points, resolution)
+
+def _electrical_variable_name(measurement: str, field: str, value=None) -> str:
+    """Nombre de variable histórica eléctrica (p.ej., "Voltage Phase A")."""
+    # Variables sin 'phase' usan solo el nombre de la medida
+    if measurement in ["frequency", "energy"]:
+        return f"{measurement.replace('_', ' ').title()}"
+    return f"{measurement.replace('_', ' ').title()} {field.replace('_', ' ').title()}"
+
+def _physical_variable_name(measurement: str, field: str, value) -> str:
+    """Nombre de variable histórica física, añadiendo el 'field' si no es el genérico 'value'."""
+    variable_name = f"{measurement.replace('_', ' ').title()}"
+    if field != 'value' and value is not None:
+        variable_name += f" {field.replace('_', ' ').title()}"
+        # Opcional: Añadir tag de localización si existe
+        # location = record.values.get("location")
+        # if location: variable_name += f" ({location})"
+    return variable_name
+
+# Columnas del CSV anotado que usa la ruta rápida (el resto se ignora sin parsear)
+_LEAN_CSV_COLUMNS = ("_measurement", "_field", "_time", "_value")
+_PIVOT_KEY_COLUMNS = ("_measurement", "_time")
+
+def _record_fields(record, pivot: bool):
+    """Pares (campo, valor) de un FluxRecord, en formato largo o pivotado (una columna por campo)."""
+    if not pivot:
+        return ((record.get_field(), record.get_value()),)
+    return [(name, value) for name, value in record.values.items() if name not in PIVOT_META_COLUMNS]
+
+def _series_for(
+    columns: HistoricalColumns, series_by_key: Dict[tuple, SeriesColumns],
+    measurement: str, field: str, value, variable_name_fn
+) -> SeriesColumns:
+    """Serie de destino de (measurement, field); nombre y unidad se resuelven una vez por serie."""
+    series = series_by_key.get((measurement, field))
+    if series is None:
+        variable_name = variable_name_fn(measurement, field, value)
+        series = columns.get(variable_name)
+        if series is None:
+            series = columns[variable_name] = (get_unit_for_measurement(measurement, field), [], [])
+        series_by_key[(measurement, field)] = series
+    return series
+
+@lru_cache(maxsize=None)
+def get_rollup_worker() -> RollupWorker:
+    """Consolidación en segundo plano (1m/1h/1d); se arranca en el lifespan si ROLLUP_ENABLED."""
+    settings = get_settings()
+    return RollupWorker(
+        default_rollup_tiers(), HISTORICAL_ELECTRICAL_MEASUREMENTS + HISTORICAL_PHYSICAL_MEASUREMENTS,
+        settings.ROLLUP_INTERVAL_SECONDS, settings.ROLLUP_LAG_SECONDS,
+        settings.ROLLUP_BACKFILL_DAYS, settings.ROLLUP_MAX_WINDOWS_PER_RUN
+    )
+
+StatsCollector(
+    "bitergy_rollup", "Background rollup worker.", {"": lambda: get_rollup_worker().stats()},
+    counters={"runs", "points_written", "errors"}
+)
+
+def warm_query_templates() -> int:
+    """
+    Genera en el arranque las plantillas Flux de realtime e históricos (quedan en la
+    caché de flux_queries), para que la primera petición de cada tipo no las construya.
+    Devuelve el número de combinaciones preparadas.
+    """
+    settings = get_settings()
+    now = datetime.now(timezone.utc)
+    combined = REALTIME_ELECTRICAL_MEASUREMENTS + REALTIME_PHYSICAL_MEASUREMENTS
+    for installation_ids, measurements in (
+        (["_"], REALTIME_ELECTRICAL_MEASUREMENTS), (["_"], REALTIME_PHYSICAL_MEASUREMENTS),
+        (["_"], combined), (["_", "_"], combined)
+    ):
+        latest_query(installation_ids, measurements)
+    warmed = 4
+    rollup_buckets = (None, "_") if settings.ROLLUP_ENABLED else (None,)
+    for measurements in (HISTORICAL_ELECTRICAL_MEASUREMENTS, HISTORICAL_PHYSICAL_MEASUREMENTS):
+        for fn in {flux_aggregate_fn(aggregate) for aggregate in AggregateFunction}:
+            for window in (None, timedelta(minutes=1)):
+                for rollup_bucket in rollup_buckets if window is not None else (None,):
+                    historical_query("_", now, now, measurements, window, fn, settings.HISTORICAL_PIVOT, rollup_bucket)
+                    historical_query("_", now, now, measurements, window, fn, False, rollup_bucket, limit=1) # Páginas
+                    warmed += 2
+    return warmed
+
+async def _query_historical_columns(
+    installation_id: str, start: datetime, end: datetime,
+    measurements: List[str], variable_name_fn, kind: str,
+    window: Optional[timedelta], fn: str
+) -> HistoricalColumns:
+    """
+    Consulta un rango y lo acumula por serie en listas planas (epoch-µs, valor), sin un modelo por punto.
+
+    Con agregación, la parte del rango ya consolidada se lee del nivel de rollup más
+    grueso que sirve para `window`; el resto, del bucket crudo. Los tramos largos se
+    parten según los puntos que InfluxDB tiene que leer y se consultan en paralelo (como mucho
+    HISTORICAL_FANOUT_PARALLELISM a la vez); si uno falla se cancelan los demás.
+    """
+    settings = get_settings()
+    start_us, end_us = _to_epoch_us(start), _to_epoch_us(end)
+    raw_step_us = int(settings.HISTORICAL_RAW_INTERVAL_SECONDS * 1_000_000)
+    # Tramos en orden: crudo antes del nivel, nivel de rollup, crudo después; con la
+    # distancia entre los puntos que lee InfluxDB en cada uno
+    parts: List[Tuple[int, int, Optional[str], int]] = [(start_us, end_us, None, raw_step_us)]
+    window_us = 0
+    if window is not None:
+        window_us = int(window.total_seconds()) * 1_000_000
+        route = get_rollup_worker().route(installation_id, start_us, end_us, window_us)
+        if route is not None:
+            tier, from_us, until_us = route
+            parts = [(start_us, from_us, None, raw_step_us), (from_us, until_us, tier.bucket, tier.every_us)]
+            if from_us == start_us:
+                parts = parts[1:]
+            if until_us < end_us:
+                parts.append((until_us, end_us, None, raw_step_us))
+
+    max_chunks = settings.HISTORICAL_FANOUT_MAX_CHUNKS if settings.HISTORICAL_FANOUT_ENABLED else 1
+    ranges = [
+        (chunk_start, chunk_end, rollup_bucket)
+        for part_start, part_end, rollup_bucket, step_us in parts
+        for chunk_start, chunk_end in split_range(
+            part_start, part_end, step_us, settings.HISTORICAL_FANOUT_CHUNK_POINTS, max_chunks, window_us or None
+        )
+    ]
+    if len(ranges) == 1:
+        return await _query_source_columns(installation_id, start, end, measurements, variable_name_fn, kind, window, fn, ranges[0][2])
+
+    results = await gather_bounded(
+        [
+            partial(
+                _query_source_columns, installation_id, _from_epoch_us(chunk_start), _from_epoch_us(chunk_end),
+                measurements, variable_name_fn, kind, window, fn, rollup_bucket
+            )
+            for chunk_start, chunk_end, rollup_bucket in ranges
+        ],
+        settings.HISTORICAL_FANOUT_PARALLELISM
+    )
+    return _concat_columns(results)
+
+def _concat_columns(results: List[HistoricalColumns], limit: Optional[int] = None) -> HistoricalColumns:
+    """
+    Une los resultados de tramos contiguos y en orden: concatenar mantiene cada
+    serie ordenada por tiempo. Con `limit`, cada serie se corta a esos puntos.
+    """
+    columns: HistoricalColumns = {}
+    for part in results:
+        for variable_name, (unit, timestamps, values) in part.items():
+            series = columns.get(variable_name)
+            if series is None:
+                columns[variable_name] = (unit, timestamps, values)
+            else:
+                series[1].extend(timestamps)
+                series[2].extend(values)
+    if limit is not None:
+        for variable_name, (unit, timestamps, values) in columns.items():
+            if len(timestamps) > limit:
+                columns[variable_name] = (unit, timestamps[:limit], values[:limit])
+    return columns
+
+async def _query_page_columns(
+    installation_id: str, resume_us: int, end_us: int,
+    measurements: List[str], variable_name_fn, kind: str,
+    window: Optional[timedelta], fn: str, limit: int
+) -> HistoricalColumns:
+    """
+    Una página: como mucho `limit` puntos por serie desde `resume_us`, con el fan-out.
+
+    El tramo en el que se esperan `limit` puntos se parte como cualquier rango
+    largo y lo que queda hasta `end_us` va en una última subconsulta (para series
+    más dispersas de lo esperado). Cada tramo lleva limit(); unidos en orden y
+    cortados a `limit`, son exactamente los primeros `limit` puntos del rango.
+    """
+    settings = get_settings()
+    raw_step_us = int(settings.HISTORICAL_RAW_INTERVAL_SECONDS * 1_000_000)
+    window_us = window // timedelta(microseconds=1) if window is not None else 0
+    horizon_us = resume_us + limit * (window_us or raw_step_us)
+    if window_us:
+        horizon_us = -(-horizon_us // window_us) * window_us # Sin partir la ventana del corte
+    horizon_us = min(end_us, horizon_us)
+    max_chunks = settings.HISTORICAL_FANOUT_MAX_CHUNKS if settings.HISTORICAL_FANOUT_ENABLED else 1
+    ranges = split_range(resume_us, horizon_us, raw_step_us, settings.HISTORICAL_FANOUT_CHUNK_POINTS, max_chunks, window_us or None)
+    if len(ranges) == 1:
+        ranges = [(resume_us, end_us)]
+    elif horizon_us < end_us:
+        ranges.append((horizon_us, end_us))
+    results = await gather_bounded(
+        [
+            partial(
+                _query_source_columns, installation_id, _from_epoch_us(chunk_start), _from_epoch_us(chunk_end),
+                measurements, variable_name_fn, kind, window, fn, limit=limit
+            )
+            for chunk_start, chunk_end in ranges
+        ],
+        settings.HISTORICAL_FANOUT_PARALLELISM
+    )
+    return _concat_columns(results, limit)
+
+async def _query_source_columns(
+    installation_id: str, start: datetime, end: datetime,
+    measurements: List[str], variable_name_fn, kind: str,
+    window: Optional[timedelta], fn: str, rollup_bucket: Optional[str] = None, limit: Optional[int] = None
+) -> HistoricalColumns:
+    """
+    Una consulta de rango contra el bucket crudo o, con `rollup_bucket`, contra un nivel de rollup.
+
+    Con `limit` (páginas) no se pivota: cada tabla es una serie y limit() cuenta puntos por serie.
+    """
+    settings = get_settings()
+    query_api = await get_query_api(QueryLane.HISTORICAL, "historical_rollup" if rollup_bucket else "historical")
+    pivot = settings.HISTORICAL_PIVOT and limit is None
+    flux_query, params = historical_query(
+        installation_id, start, end, measurements, window, fn, pivot, rollup_bucket, limit
+    )
+    # print(f"DEBUG: Historical {kind} Query:\n{flux_query}\n{params}")
+    if settings.HISTORICAL_LEAN_CSV:
+        text = await query_api.query_raw(query=flux_query, org=settings.INFLUXDB_ORG, params=params)
+        if pivot:
+            columns = _columns_from_pivoted_csv(text, variable_name_fn, kind)
+        else:
+            columns = _columns_from_csv(text, variable_name_fn, kind)
+        query_api.record_rows(sum(len(timestamps) for _, timestamps, _ in columns.values()))
+        return columns
+    records = await query_api.query_stream(query=flux_query, org=settings.INFLUXDB_ORG, params=params)
+    return await _columns_from_records(records, variable_name_fn, kind, pivot)
+
+@timed("parse")
+def _columns_from_csv(text: str, variable_name_fn, kind: str) -> HistoricalColumns:
+    """
+    Ruta rápida: agrupa directamente desde el CSV anotado de query_raw.
+
+    No se crean FluxRecord ni datetime: solo se leen las columnas necesarias, el
+    tiempo queda como entero epoch-µs y nombre/unidad se resuelven una vez por serie.
+    """
+    columns: HistoricalColumns = {}
+    series_by_key: Dict[tuple, SeriesColumns] = {}
+    for measurement, field, time_text, value_text in iter_csv_rows(text, _LEAN_CSV_COLUMNS):
+        if not value_text:
+            continue
+        try:
+            value = float(value_text)
+            timestamp = rfc3339_to_epoch_us(time_text)
+        except (ValueError, IndexError) as e:
+            SKIPPED_RECORDS.inc(f"historical_{kind}")
+            print(f"WARN: Skipping row due to parsing error in historical {kind}: {e} - Row: {measurement},{field},{time_text},{value_text}")
+            continue
+        series = _series_for(columns, series_by_key, measurement, field, value, variable_name_fn)
+        series[1].append(timestamp)
+        series[2].append(value)
+    return columns
+
+@timed("parse")
+def _columns_from_pivoted_csv(text: str, variable_name_fn, kind: str) -> HistoricalColumns:
+    """
+    Ruta rápida sobre una respuesta pivotada: una fila por (measurement, instante).
+
+    El tiempo se parsea una vez por fila en lugar de una vez por campo, y el CSV
+    trae una fila por instante en vez de una por fase.
+    """
+    columns: HistoricalColumns = {}
+    series_by_key: Dict[tuple, SeriesColumns] = {}
+    for (measurement, time_text), fields in iter_pivoted_rows(text, _PIVOT_KEY_COLUMNS, PIVOT_META_COLUMNS):
+        try:
+            timestamp = rfc3339_to_epoch_us(time_text)
+        except (ValueError, IndexError) as e:
+            SKIPPED_RECORDS.inc(f"historical_{kind}")
+            print(f"WARN: Skipping row due to parsing error in historical {kind}: {e} - Row: {measurement},{time_text}")
+            continue
+        for field, value_text in fields:
+            if not value_text:
+                continue # El campo no tiene valor en este instante
+            try:
+                value = float(value_text)
+            except ValueError as e:
+                SKIPPED_RECORDS.inc(f"historical_{kind}")
+                print(f"WARN: Skipping value due to parsing error in historical {kind}: {e} - Row: {measurement},{field},{time_text},{value_text}")
+                continue
+            series = _series_for(columns, series_by_key, measurement, field, value, variable_name_fn)
+            series[1].append(timestamp)
+            series[2].append(value)
+    return columns
+
+@timed("parse")
+async def _columns_from_records(records, variable_name_fn, kind: str, pivot: bool = False) -> HistoricalColumns:
+    """Agrupa FluxRecord de query_stream en columnas (ruta genérica del cliente)."""
+    columns: HistoricalColumns = {}
+    series_by_key: Dict[tuple, SeriesColumns] = {}
+    async for record in records:
+        try:
+            measurement = record.get_measurement()
+            timestamp = None
+            for field, value in _record_fields(record, pivot):
+                if value is None:
+                    continue
+                if timestamp is None:
+                    timestamp = _to_epoch_us(record.get_time())
+                series = _series_for(columns, series_by_key, measurement, field, value, variable_name_fn)
+                series[1].append(timestamp)
+                series[2].append(float(value))
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            SKIPPED_RECORDS.inc(f"historical_{kind}")
+            print(f"WARN: Skipping record due to parsing error in historical {kind}: {e} - Record: {record.values if record else 'None'}")
+            continue
+    return columns
+
+@lru_cache(maxsize=None)
+def get_historical_cache() -> SegmentCache:
+    """Caché de segmentos históricos cerrados (inmutables)."""
+    return SegmentCache(get_settings().HISTORICAL_CACHE_MAX_BYTES)
+
+StatsCollector(
+    "bitergy_cache", "In-process cache statistics.",
+    {"realtime": lambda: get_realtime_cache().stats(), "historical": lambda: get_historical_cache().stats()},
+    label="cache", counters={"hits", "misses", "coalesced", "evictions"}
+)
+
+def forget_history_since(installation_id: str, since_us: int) -> int:
+    """
+    Se han escrito datos atrasados (anteriores al margen de asentamiento) desde
+    `since_us`: se descartan los segmentos cacheados afectados y los niveles de
+    rollup vuelven a consolidar desde ahí. Devuelve los segmentos descartados.
+    """
+    # Clave: (kind, installation_id, window_key, fn, segment_us, idx)
+    dropped = get_historical_cache().discard(lambda key: key[1] == installation_id and (key[5] + 1) * key[4] > since_us)
+    if get_settings().ROLLUP_ENABLED:
+        get_rollup_worker().rewind(installation_id, since_us)
+    return dropped
+
+async def _fill_historical_segments(
+    installation_id: str, missing: List[int], segment_us: int, closed_before_us: int,
+    measurements: List[str], variable_name_fn, kind: str,
+    window: Optional[timedelta], fn: str
+) -> Dict[int, HistoricalColumns]:
+    """
+    Consulta los segmentos `missing`, agrupados en tramos contiguos que se lanzan en
+    paralelo (como mucho HISTORICAL_FANOUT_PARALLELISM a la vez), y cachea los cerrados.
+    """
+    cache = get_historical_cache()
+    generation = cache.generation
+    window_key = int(window.total_seconds()) if window is not None else 0
+    runs = contiguous_runs(missing)
+    results = await gather_bounded(
+        [
+            partial(
+                _query_historical_columns, installation_id, _from_epoch_us(run_first * segment_us),
+                _from_epoch_us((run_last + 1) * segment_us), measurements, variable_name_fn, kind, window, fn
+            )
+            for run_first, run_last in runs
+        ],
+        get_settings().HISTORICAL_FANOUT_PARALLELISM
+    )
+    segments: Dict[int, HistoricalColumns] = {}
+    for (run_first, run_last), run_columns in zip(runs, results):
+        parts = split_by_segment(run_columns, segment_us, aggregated=window is not None)
+        for idx in range(run_first, run_last + 1):
+            segments[idx] = parts.get(idx, {})
+            if (idx + 1) * segment_us <= closed_before_us:
+                cache.put((kind, installation_id, window_key, fn, segment_us, idx), segments[idx], generation)
+    return segments
+
+async def _fetch_historical_columns(
+    installation_id: str, start: datetime, end: datetime,
+    measurements: List[str], variable_name_fn, kind: str,
+    window: Optional[timedelta], fn: str
+) -> HistoricalColumns:
+    """
+    Columnas del rango [start, end), pasando por la caché de segmentos.
+
+    El rango se divide en segmentos alineados a epoch; los cerrados se sirven
+    desde caché y solo los que faltan o siguen abiertos se consultan a InfluxDB,
+    agrupados en tramos contiguos. Un segmento que otra petición ya está
+    consultando no se repite: se espera esa carga. El resultado se une y se
+    recorta al rango pedido.
+    """
+    settings = get_settings()
+    segment_us = segment_size_us(settings.HISTORICAL_CACHE_SEGMENT_SECONDS, window)
+    start_us, end_us = _to_epoch_us(start), _to_epoch_us(end)
+    first, last = start_us // segment_us, (end_us - 1) // segment_us
+    if not settings.HISTORICAL_CACHE_ENABLED or last - first + 1 > settings.HISTORICAL_CACHE_MAX_SEGMENTS:
+        return await _query_historical_columns(installation_id, start, end, measurements, variable_name_fn, kind, window, fn)
+
+    cache = get_historical_cache()
+    window_key = int(window.total_seconds()) if window is not None else 0
+    closed_before_us = _to_epoch_us(datetime.now(timezone.utc)) - settings.HISTORICAL_CACHE_SETTLE_SECONDS * 1_000_000
+    segments: Dict[int, HistoricalColumns] = {}
+    loads: Dict[int, asyncio.Future] = {}
+    missing: List[int] = []
+    for idx in range(first, last + 1):
+        key = (kind, installation_id, window_key, fn, segment_us, idx)
+        cached = None
+        if (idx + 1) * segment_us <= closed_before_us:
+            cached = cache.get(key)
+        if cached is not None:
+            segments[idx] = cached
+            continue
+        load = cache.loading(key)
+        if load is None:
+            missing.append(idx)
+        else:
+            loads[idx] = load
+
+    if missing:
+        load = asyncio.ensure_future(_fill_historical_segments(
+            installation_id, missing, segment_us, closed_before_us, measurements, variable_name_fn, kind, window, fn
+        ))
+        cache.track([(kind, installation_id, window_key, fn, segment_us, idx) for idx in missing], load)
+        loads.update(dict.fromkeys(missing, load))
+    for idx, load in loads.items():
+        # shield: si esta petición se cancela, la carga sigue para las demás que la esperan
+        segments[idx] = (await asyncio.shield(load))[idx]
+
+    # Unir segmentos en orden y recortar al rango pedido
+    if window is None:
+        keep = lambda t: start_us <= t < end_us
+    else:
+        # Ventanas marcadas con su _stop: se conservan las que solapan [start, end)
+        window_us = int(window.total_seconds()) * 1_000_000
+        keep = lambda t: start_us < t and t - window_us < end_us
+    columns: HistoricalColumns = {}
+    for idx in range(first, last + 1):
+        for variable_name, (unit, timestamps, values) in segments[idx].items():
+            series = columns.get(variable_name)
+            if series is None:
+                series = columns[variable_name] = (unit, [], [])
+            for t, v in zip(timestamps, values):
+                if keep(t):
+                    series[1].append(t)
+                    series[2].append(v)
+    return {name: series for name, series in columns.items() if series[1]}
+
+async def _load_historical_columns(
+    installation_id: str, start: datetime, end: datetime,
+    measurements: List[str], variable_name_fn, kind: str,
+    max_points: Optional[int], resolution: Optional[timedelta], aggregate: AggregateFunction
+) -> HistoricalColumns:
+    """Columnas históricas ya agregadas y, con LTTB, reducidas a `max_points` por serie."""
+    window = _historical_window(start, end, max_points, resolution, aggregate)
+    columns = await _fetch_historical_columns(
+        installation_id, start, end, measurements, variable_name_fn, kind, window, flux_aggregate_fn(aggregate)
+    )
+    if aggregate == AggregateFunction.LTTB and max_points:
+        for variable_name, (unit, timestamps, values) in columns.items():
+            indices = lttb_indices(timestamps, values, max_points)
+            columns[variable_name] = (unit, [timestamps[i] for i in indices], [values[i] for i in indices])
+    return columns
+
+async def _load_historical(
+    installation_id: str, start: datetime, end: datetime,
+    measurements: List[str], variable_name_fn, kind: str,
+    max_points: Optional[int], resolution: Optional[timedelta], aggregate: AggregateFunction,
+    limit: Optional[int] = None, cursor: Optional[PageCursor] = None
+) -> Tuple[HistoricalColumns, Optional[str]]:
+    """
+    Columnas de la consulta completa o de una página, y el cursor de la siguiente.
+
+    Sin `limit` ni `cursor` el rango se lee entero (caché, rollups, LTTB) y el
+    cursor es None: solo pagina quien lo pide. Si no, se lee una página de como
+    mucho `limit` puntos por serie desde el bucket crudo, con range(start: cursor)
+    y limit() en Flux; LTTB necesita la serie completa, así que por páginas se
+    agrega con 'mean'.
+    """
+    if cursor is None and limit is None:
+        columns = await _load_historical_columns(
+            installation_id, start, end, measurements, variable_name_fn, kind, max_points, resolution, aggregate
+        )
+        return columns, None
+    if cursor is None:
+        window = choose_aggregate_window(start, end, max_points, resolution)
+        window_us = window // timedelta(microseconds=1) if window is not None else 0
+        cursor = PageCursor(
+            kind, installation_id, _to_epoch_us(start), _to_epoch_us(end), window_us, flux_aggregate_fn(aggregate), limit, {}
+        )
+    elif limit is not None:
+        cursor = cursor._replace(limit=limit)
+    # El cursor fija el tamaño de página, pero nunca por encima del máximo del endpoint
+    cursor = cursor._replace(limit=min(cursor.limit, get_settings().HISTORICAL_PAGE_MAX_LIMIT))
+
+    window = timedelta(microseconds=cursor.window_us) if cursor.window_us else None
+    columns = await _query_page_columns(
+        installation_id, cursor.resume_us(), _to_epoch_us(end), measurements, variable_name_fn, kind,
+        window, cursor.fn, cursor.limit
+    )
+    page, following = next_page(columns, cursor)
+    if following is None or following.resume_us() >= following.end_us:
+        return page, None
+    return page, encode_cursor(following)
+
+def _measurement_for_variable(variable_name: str, measurements: List[str]) -> Optional[str]:
+    """Measurement de origen de una variable histórica ("Power Factor Phase A" -> "power_factor")."""
+    best: Optional[str] = None
+    for measurement in measurements:
+        title = measurement.replace('_', ' ').title()
+        if variable_name == title or variable_name.startswith(title + " "):
+            if best is None or len(measurement) > len(best):
+                best = measurement
+    return best
+
+@timed("build")
+def _classify_columns(
+    installation_id: str, columns: HistoricalColumns, measurements: List[str]
+) -> Dict[str, List[SeverityLevel]]:
+    """Severidad de cada punto, serie a serie, con los umbrales precompilados del índice."""
+    index = get_threshold_store().index
+    severities: Dict[str, List[SeverityLevel]] = {}
+    for variable_name, (unit, timestamps, values) in columns.items():
+        measurement = _measurement_for_variable(variable_name, measurements)
+        compiled = index.compiled(installation_id, measurement) if measurement else None
+        severities[variable_name] = classify_series(values, compiled)
+    return severities
+
+def _severity_summaries(columns: HistoricalColumns, severities: Dict[str, List[SeverityLevel]]) -> Dict[str, dict]:
+    return {
+        variable_name: summarize_severity(columns[variable_name][1], levels)
+        for variable_name, levels in severities.items()
+    }
+
+@timed("build")
+def _grouped_points(
+    columns: HistoricalColumns, severities: Optional[Dict[str, List[SeverityLevel]]] = None
+) -> Dict[str, List[HistoricalDataPoint]]:
+    """Puntos por serie; los valores ya tienen su tipo final, así que se construyen sin revalidar."""
+    construct = HistoricalDataPoint.model_construct
+    if severities is None:
+        return {
+            variable_name: [
+                construct(timestamp=_from_epoch_us(t), value=v, unit=unit)
+                for t, v in zip(timestamps, values)
+            ]
+            for variable_name, (unit, timestamps, values) in columns.items()
+        }
+    return {
+        variable_name: [
+            construct(timestamp=_from_epoch_us(t), value=v, unit=unit, severity=level)
+            for t, v, level in zip(timestamps, values, severities[variable_name])
+        ]
+        for variable_name, (unit, timestamps, values) in columns.items()
+    }
 
-# --- Funciones Históricas (Sin cambios significativos respecto a la versión anterior, solo corrección de import) ---
 async def get_historical_electrical_data(
-    installation_id: str, start: datetime, end: datetime
+    installation_id: str, start: datetime, end: datetime,
+    max_points: Optional[int] = None, resolution: Optional[timedelta] = None,
+    aggregate: AggregateFunction = AggregateFunction.MEAN, include_severity: bool = False,
+    limit: Optional[int] = None, cursor: Optional[PageCursor] = None
 ) -> Optional[GroupedHistoricalElectricalData]:
-    """Obtiene datos históricos eléctricos."""
+    """Obtiene datos históricos eléctricos, opcionalmente reducidos a `max_points` por serie."""
     try:
-        query_api = await get_query_api()
-        start_str = start.isoformat(timespec='microseconds') + "Z"
-        end_str = end.isoformat(timespec='microseconds') + "Z"
-        measurements = ["voltage", "current", "active_power", "energy", "frequency", "power_factor"]
-
-        flux_query = f'''
-        from(bucket: "{settings.INFLUXDB_BUCKET}")
-          |> range(start: {start_str}, stop: {end_str})
-          |> filter(fn: (r) => r["_measurement"] == "{'" or r["_measurement"] == "'.join(measurements)}")
-          |> filter(fn: (r) => r["installation_id"] == "{installation_id}")
-          // Opcional: Agregación si el rango es muy grande
-          // |> aggregateWindow(every: 1m, fn: mean, createEmpty: false)
-          |> yield(name: "results")
-        '''
-        # print(f"DEBUG: Historical Electrical Query:\n{flux_query}")
-        result = await query_api.query(query=flux_query, org=settings.INFLUXDB_ORG)
-
-        if not result: return None
-
-        grouped_data: Dict[str, List[HistoricalDataPoint]] = {}
-        for table in result:
-            for record in table.records:
-                try:
-                    measurement = record.get_measurement()
-                    field = record.get_field()
-                    value = record.get_value()
-                    time = record.get_time()
-                    unit = get_unit_for_measurement(measurement, field)
-                    # Crear nombre de variable (p.ej., "Voltage Phase A")
-                    variable_name = f"{measurement.replace('_', ' ').title()} {field.replace('_', ' ').title()}"
-                    # Corregir para variables sin 'phase'
-                    if measurement in ["frequency", "energy"]:
-                        variable_name = f"{measurement.replace('_', ' ').title()}"
-                    # Asegurar que la clave existe antes de añadir
-                    if variable_name not in grouped_data:
-                        grouped_data[variable_name] = []
-                    grouped_data[variable_name].append(
-                        HistoricalDataPoint(timestamp=time, value=value, unit=unit)
-                    )
-                except (KeyError, TypeError, AttributeError, ValueError) as e: # Captura más errores posibles
-                    print(f"WARN: Skipping record due to parsing error in historical electrical: {e} - Record: {record.values if record else 'None'}")
-                    continue
-
-        if not grouped_data: return None
+        columns, next_cursor = await _load_historical(
+            installation_id, start, end, HISTORICAL_ELECTRICAL_MEASUREMENTS, _electrical_variable_name, "electrical",
+            max_points, resolution, aggregate, limit, cursor
+        )
+        if not columns: return None
 
+        if not include_severity:
+            return GroupedHistoricalElectricalData(
+                asset_id=installation_id, start_time=start, end_time=end, data=_grouped_points(columns),
+                next_cursor=next_cursor
+            )
+        severities = _classify_columns(installation_id, columns, HISTORICAL_ELECTRICAL_MEASUREMENTS)
         return GroupedHistoricalElectricalData(
-            asset_id=installation_id, start_time=start, end_time=end, data=grouped_data
+            asset_id=installation_id, start_time=start, end_time=end,
+            data=_grouped_points(columns, severities),
+            severity_summary=_severity_summaries(columns, severities),
+            next_cursor=next_cursor
         )
     except Exception as e:
         print(f"ERROR: Unexpected error in get_historical_electrical_data for '{installation_id}': {e}")
         return None
 
 async def get_historical_physical_data(
-    installation_id: str, start: datetime, end: datetime
+    installation_id: str, start: datetime, end: datetime,
+    max_points: Optional[int] = None, resolution: Optional[timedelta] = None,
+    aggregate: AggregateFunction = AggregateFunction.MEAN, include_severity: bool = False,
+    limit: Optional[int] = None, cursor: Optional[PageCursor] = None
 ) -> Optional[GroupedHistoricalPhysicalData]:
-    """Obtiene datos históricos físicos."""
+    """Obtiene datos históricos físicos, opcionalmente reducidos a `max_points` por serie."""
     try:
-        query_api = await get_query_api()
-        start_str = start.isoformat(timespec='microseconds') + "Z"
-        end_str = end.isoformat(timespec='microseconds') + "Z"
-        measurements = ["temperature", "humidity", "level"] # Ajusta a tus measurements
-
-        flux_query = f'''
-        from(bucket: "{settings.INFLUXDB_BUCKET}")
-          |> range(start: {start_str}, stop: {end_str})
-          |> filter(fn: (r) => r["_measurement"] == "{'" or r["_measurement"] == "'.join(measurements)}")
-          |> filter(fn: (r) => r["installation_id"] == "{installation_id}")
-          // |> aggregateWindow(every: 1m, fn: mean, createEmpty: false) // Opcional
-          |> yield(name: "results")
-        '''
-        # print(f"DEBUG: Historical Physical Query:\n{flux_query}")
-        result = await query_api.query(query=flux_query, org=settings.INFLUXDB_ORG)
-
-        if not result: return None
-
-        grouped_data: Dict[str, List[HistoricalDataPoint]] = {}
-        for table in result:
-            for record in table.records:
-                try:
-                    measurement = record.get_measurement()
-                    field = record.get_field()
-                    value = record.get_value()
-                    time = record.get_time()
-                    unit = get_unit_for_measurement(measurement, field)
-                    # Crear nombre de variable, considerando el 'field' si es relevante
-                    variable_name = f"{measurement.replace('_', ' ').title()}"
-                    # Añadir nombre del campo si no es el genérico 'value' y hay datos
-                    if field != 'value' and value is not None:
-                         variable_name += f" {field.replace('_', ' ').title()}"
-                         # Opcional: Añadir tag de localización si existe
-                         # location = record.values.get("location")
-                         # if location: variable_name += f" ({location})"
-
-                    if variable_name not in grouped_data:
-                        grouped_data[variable_name] = []
-                    grouped_data[variable_name].append(
-                        HistoricalDataPoint(timestamp=time, value=value, unit=unit)
-                    )
-                except (KeyError, TypeError, AttributeError, ValueError) as e:
-                    print(f"WARN: Skipping record due to parsing error in historical physical: {e} - Record: {record.values if record else 'None'}")
-                    continue
-
-        if not grouped_data: return None
+        columns, next_cursor = await _load_historical(
+            installation_id, start, end, HISTORICAL_PHYSICAL_MEASUREMENTS, _physical_variable_name, "physical",
+            max_points, resolution, aggregate, limit, cursor
+        )
+        if not columns: return None
 
+        if not include_severity:
+            return GroupedHistoricalPhysicalData(
+                asset_id=installation_id, start_time=start, end_time=end, data=_grouped_points(columns),
+                next_cursor=next_cursor
+            )
+        severities = _classify_columns(installation_id, columns, HISTORICAL_PHYSICAL_MEASUREMENTS)
         return GroupedHistoricalPhysicalData(
-            asset_id=installation_id, start_time=start, end_time=end, data=grouped_data
+            asset_id=installation_id, start_time=start, end_time=end,
+            data=_grouped_points(columns, severities),
+            severity_summary=_severity_summaries(columns, severities),
+            next_cursor=next_cursor
         )
     except Exception as e:
         print(f"ERROR: Unexpected error in get_historical_physical_data for '{installation_id}': {e}")
         return None
+
+# --- Ruta rápida de serialización (FAST_JSON_RESPONSES) ---
+async def _get_historical_grouped_json(
+    installation_id: str, start: datetime, end: datetime,
+    measurements: List[str], variable_name_fn, kind: str,
+    max_points: Optional[int], resolution: Optional[timedelta], aggregate: AggregateFunction,
+    include_severity: bool = False, limit: Optional[int] = None, cursor: Optional[PageCursor] = None
+) -> Optional[dict]:
+    """Mismo contenido que get_historical_*_data, ya como dict JSON: sin modelos ni segunda validación."""
+    try:
+        columns, next_cursor = await _load_historical(
+            installation_id, start, end, measurements, variable_name_fn, kind,
+            max_points, resolution, aggregate, limit, cursor
+        )
+        if not columns: return None
+
+        if not include_severity:
+            return grouped_historical_json(installation_id, start, end, columns, next_cursor=next_cursor)
+        severities = _classify_columns(installation_id, columns, measurements)
+        return grouped_historical_json(
+            installation_id, start, end, columns, severities, _severity_summaries(columns, severities), next_cursor
+        )
+    except Exception as e:
+        print(f"ERROR: Unexpected error in historical {kind} json for '{installation_id}': {e}")
+        return None
+
+async def get_historical_electrical_json(
+    installation_id: str, start: datetime, end: datetime,
+    max_points: Optional[int] = None, resolution: Optional[timedelta] = None,
+    aggregate: AggregateFunction = AggregateFunction.MEAN, include_severity: bool = False,
+    limit: Optional[int] = None, cursor: Optional[PageCursor] = None
+) -> Optional[dict]:
+    """Datos históricos eléctricos como dict con esquema GroupedHistoricalElectricalData."""
+    return await _get_historical_grouped_json(
+        installation_id, start, end, HISTORICAL_ELECTRICAL_MEASUREMENTS,
+        _electrical_variable_name, "electrical",
+        max_points, resolution, aggregate, include_severity, limit, cursor
+    )
+
+async def get_historical_physical_json(
+    installation_id: str, start: datetime, end: datetime,
+    max_points: Optional[int] = None, resolution: Optional[timedelta] = None,
+    aggregate: AggregateFunction = AggregateFunction.MEAN, include_severity: bool = False,
+    limit: Optional[int] = None, cursor: Optional[PageCursor] = None
+) -> Optional[dict]:
+    """Datos históricos físicos como dict con esquema GroupedHistoricalPhysicalData."""
+    return await _get_historical_grouped_json(
+        installation_id, start, end, HISTORICAL_PHYSICAL_MEASUREMENTS, _physical_variable_name, "physical",
+        max_points, resolution, aggregate, include_severity, limit, cursor
+    )
+
+# --- Streaming histórico (NDJSON) ---
+async def _stream_historical_data(
+    installation_id: str, start: datetime, end: datetime,
+    measurements: List[str], variable_name_fn, kind: str,
+    window: Optional[timedelta] = None, fn: str = "mean"
+) -> AsyncIterator[dict]:
+    """
+    Emite bloques de series a medida que llegan los registros de InfluxDB.
+
+    Usa `query_stream` en lugar de `query`, de modo que nunca se materializa el
+    TableList completo: cada serie acumula como máximo STREAM_CHUNK_SIZE puntos
+    antes de emitirse, y la memoria queda acotada por (nº de series x tamaño de bloque).
+    LTTB necesita la serie completa, así que en streaming se degrada a ventanas con 'mean'.
+    """
+    settings = get_settings()
+    yield {
+        "type": "meta", "asset_id": installation_id,
+        "start_time": _to_iso(start), "end_time": _to_iso(end),
+    }
+    total_points = 0
+    records = None
+    try:
+        query_api = await get_query_api(QueryLane.HISTORICAL, "historical_stream")
+        pivot = settings.HISTORICAL_PIVOT
+        flux_query, params = historical_query(installation_id, start, end, measurements, window, fn, pivot)
+        records = await query_api.query_stream(query=flux_query, org=settings.INFLUXDB_ORG, params=params)
+
+        buffers: Dict[str, List[dict]] = {}
+        units: Dict[str, str] = {}
+        async for record in records:
+            full: List[str] = []
+            try:
+                measurement = record.get_measurement()
+                timestamp = None
+                for field, value in _record_fields(record, pivot):
+                    if value is None:
+                        continue
+                    if timestamp is None:
+                        timestamp = _to_iso(record.get_time())
+                    variable_name = variable_name_fn(measurement, field, value)
+                    points = buffers.get(variable_name)
+                    if points is None:
+                        points = buffers[variable_name] = []
+                        units[variable_name] = get_unit_for_measurement(measurement, field)
+                    points.append({"timestamp": timestamp, "value": float(value)})
+                    if len(points) == STREAM_CHUNK_SIZE:
+                        full.append(variable_name)
+            except (KeyError, TypeError, AttributeError, ValueError) as e:
+                SKIPPED_RECORDS.inc(f"historical_{kind}_stream")
+                print(f"WARN: Skipping record due to parsing error in historical {kind} stream: {e} - Record: {record.values if record else 'None'}")
+
+            for variable_name in full:
+                points = buffers[variable_name]
+                total_points += len(points)
+                yield {"type": "series", "variable": variable_name, "unit": units[variable_name], "points": points}
+                buffers[variable_name] = []
+
+        for variable_name, points in buffers.items():
+            if points:
+                total_points += len(points)
+                yield {"type": "series", "variable": variable_name, "unit": units[variable_name], "points": points}
+    except Exception as e:
+        print(f"ERROR: Unexpected error in historical {kind} stream for '{installation_id}': {e}")
+        yield {"type": "error", "detail": f"Historical {kind} stream interrupted"}
+        return
+    finally:
+        # Cierre explícito: si el cliente se va a mitad, la plaza del limitador se
+        # libera ya y no cuando el recolector finalice el generador
+        if records is not None:
+            await records.aclose()
+
+    yield {"type": "end", "points": total_points}
+
+def stream_historical_electrical_data(
+    installation_id: str, start: datetime, end: datetime,
+    max_points: Optional[int] = None, resolution: Optional[timedelta] = None,
+    aggregate: AggregateFunction = AggregateFunction.MEAN
+) -> AsyncIterator[dict]:
+    """Versión streaming de get_historical_electrical_data (bloques de series como dicts)."""
+    return _stream_historical_data(
+        installation_id, start, end, HISTORICAL_ELECTRICAL_MEASUREMENTS,
+        _electrical_variable_name, "electrical",
+        choose_aggregate_window(start, end, max_points, resolution), flux_aggregate_fn(aggregate)
+    )
+
+def stream_historical_physical_data(
+    installation_id: str, start: datetime, end: datetime,
+    max_points: Optional[int] = None, resolution: Optional[timedelta] = None,
+    aggregate: AggregateFunction = AggregateFunction.MEAN
+) -> AsyncIterator[dict]:
+    """Versión streaming de get_historical_physical_data (bloques de series como dicts)."""
+    return _stream_historical_data(
+        installation_id, start, end, HISTORICAL_PHYSICAL_MEASUREMENTS, _physical_variable_name, "physical",
+        choose_aggregate_window(start, end, max_points, resolution), flux_aggregate_fn(aggregate)
+    )
+
+# --- Formato columnar ---
+def _columnar_series(unit: str, timestamps: List[int], values: List[float]) -> dict:
+    """Serie columnar; si el paso entre muestras es constante se codifica como start + step."""
+    series = {"unit": unit}
+    if len(timestamps) > 2:
+        step = timestamps[1] - timestamps[0]
+        if step > 0 and all(b - a == step for a, b in zip(timestamps, timestamps[1:])):
+            series["start"] = timestamps[0]
+            series["step"] = step
+            series["values"] = values
+            return series
+    series["timestamps"] = timestamps
+    series["values"] = values
+    return series
+
+async def _get_historical_columnar(
+    installation_id: str, start: datetime, end: datetime,
+    measurements: List[str], variable_name_fn, kind: str,
+    max_points: Optional[int], resolution: Optional[timedelta], aggregate: AggregateFunction,
+    include_severity: bool = False, limit: Optional[int] = None, cursor: Optional[PageCursor] = None
+) -> Optional[dict]:
+    """Respuesta columnar (esquema ColumnarHistoricalData) construida desde las columnas, en epoch-ms."""
+    try:
+        columns, next_cursor = await _load_historical(
+            installation_id, start, end, measurements, variable_name_fn, kind,
+            max_points, resolution, aggregate, limit, cursor
+        )
+        if not columns: return None
+
+        severities = _classify_columns(installation_id, columns, measurements) if include_severity else None
+        with timed_phase("build"):
+            response = {
+                "asset_id": installation_id,
+                "start_time": _to_iso(start),
+                "end_time": _to_iso(end),
+                "series": {
+                    variable_name: _columnar_series(unit, [t // 1000 for t in timestamps], values)
+                    for variable_name, (unit, timestamps, values) in columns.items()
+                },
+            }
+            if severities is not None:
+                for variable_name, levels in severities.items():
+                    response["series"][variable_name]["severity"] = [level.value for level in levels]
+                response["severity_summary"] = {
+                    variable_name: severity_summary_json(summary)
+                    for variable_name, summary in _severity_summaries(columns, severities).items()
+                }
+            if next_cursor is not None:
+                response["next_cursor"] = next_cursor
+        return response
+    except Exception as e:
+        print(f"ERROR: Unexpected error in historical {kind} columnar for '{installation_id}': {e}")
+        return None
+
+async def get_historical_electrical_columnar(
+    installation_id: str, start: datetime, end: datetime,
+    max_points: Optional[int] = None, resolution: Optional[timedelta] = None,
+    aggregate: AggregateFunction = AggregateFunction.MEAN, include_severity: bool = False,
+    limit: Optional[int] = None, cursor: Optional[PageCursor] = None
+) -> Optional[dict]:
+    """Datos históricos eléctricos en formato columnar (dict con esquema ColumnarHistoricalData)."""
+    return await _get_historical_columnar(
+        installation_id, start, end, HISTORICAL_ELECTRICAL_MEASUREMENTS,
+        _electrical_variable_name, "electrical",
+        max_points, resolution, aggregate, include_severity, limit, cursor
+    )
+
+async def get_historical_physical_columnar(
+    installation_id: str, start: datetime, end: datetime,
+    max_points: Optional[int] = None, resolution: Optional[timedelta] = None,
+    aggregate: AggregateFunction = AggregateFunction.MEAN, include_severity: bool = False,
+    limit: Optional[int] = None, cursor: Optional[PageCursor] = None
+) -> Optional[dict]:
+    """Datos históricos físicos en formato columnar (dict con esquema ColumnarHistoricalData)."""
+    return await _get_historical_columnar(
+        installation_id, start, end, HISTORICAL_PHYSICAL_MEASUREMENTS, _physical_variable_name, "physical",
+        max_points, resolution, aggregate, include_severity, limit, cursor
+    )
+
+# --- Estadísticas por ventana ---
+# El nombre del resultado (yield) indica el estadístico de cada fila
+_STATS_CSV_COLUMNS = ("result", "_measurement", "_field", "_time", "_value")
+
+async def _get_statistics(
+    installation_id: str, start: datetime, end: datetime,
+    measurements: List[str], variable_name_fn, kind: str,
+    window: StatsWindow, aggregates: List[StatsAggregate]
+) -> Optional[InstallationStatistics]:
+    """Estadísticos por ventana calculados en InfluxDB; aquí solo se reparten por variable y ventana."""
+    try:
+        query = stats_query(installation_id, start, end, measurements, window, aggregates)
+        if query is None:
+            return None
+        flux_query, params = query
+        # print(f"DEBUG: {kind} Stats Query:\n{flux_query}\n{params}")
+        query_api = await get_query_api(QueryLane.HISTORICAL, "stats")
+        text = await query_api.query_raw(query=flux_query, org=get_settings().INFLUXDB_ORG, params=params)
+
+        windows_by_variable: Dict[str, Dict[int, Dict[str, float]]] = {}
+        units: Dict[str, str] = {}
+        rows = 0
+        with timed_phase("parse"):
+            for result, measurement, field, time_text, value_text in iter_csv_rows(text, _STATS_CSV_COLUMNS):
+                if not value_text:
+                    continue
+                try:
+                    value = float(value_text)
+                    window_start = rfc3339_to_epoch_us(time_text)
+                except (ValueError, IndexError) as e:
+                    SKIPPED_RECORDS.inc(f"{kind}_stats")
+                    print(f"WARN: Skipping row due to parsing error in {kind} stats: {e} - Row: {result},{measurement},{field},{time_text},{value_text}")
+                    continue
+                rows += 1
+                variable_name = variable_name_fn(measurement, field, value)
+                windows = windows_by_variable.get(variable_name)
+                if windows is None:
+                    windows = windows_by_variable[variable_name] = {}
+                    units[variable_name] = get_unit_for_measurement(measurement, field)
+                windows.setdefault(window_start, {})[result] = value
+        query_api.record_rows(rows)
+
+        if not windows_by_variable:
+            return None
+        with timed_phase("build"):
+            return InstallationStatistics(
+                asset_id=installation_id, start_time=start, end_time=end, window=window, aggregates=aggregates,
+                data={
+                    variable_name: VariableStatistics(
+                        unit=units[variable_name],
+                        windows=[
+                            StatisticsWindow(start=_from_epoch_us(t), **values) for t, values in sorted(windows.items())
+                        ]
+                    )
+                    for variable_name, windows in windows_by_variable.items()
+                }
+            )
+    except Exception as e:
+        print(f"ERROR: Unexpected error in {kind} stats for '{installation_id}': {e}")
+        return None
+
+async def get_electrical_statistics(
+    installation_id: str, start: datetime, end: datetime,
+    window: StatsWindow, aggregates: List[StatsAggregate]
+) -> Optional[InstallationStatistics]:
+    """Estadísticos eléctricos por ventana; 'consumption' es la energía consumida (spread de energy)."""
+    return await _get_statistics(
+        installation_id, start, end, HISTORICAL_ELECTRICAL_MEASUREMENTS, _electrical_variable_name, "electrical",
+        window, aggregates
+    )
+
+async def get_physical_statistics(
+    installation_id: str, start: datetime, end: datetime,
+    window: StatsWindow, aggregates: List[StatsAggregate]
+) -> Optional[InstallationStatistics]:
+    """Estadísticos físicos por ventana."""
+    return await _get_statistics(
+        installation_id, start, end, HISTORICAL_PHYSICAL_MEASUREMENTS, _physical_variable_name, "physical",
+        window, aggregates
+    )
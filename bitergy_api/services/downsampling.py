@@ -0,0 +1,107 @@
+# services/downsampling.py
+import math
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+
+from ..core.enums import AggregateFunction
+
+# Intervalos "redondos" candidatos para aggregateWindow, de menor a mayor
+_NICE_WINDOWS = [
+    timedelta(seconds=s) for s in (
+        1, 2, 5, 10, 15, 30,
+        60, 2 * 60, 5 * 60, 10 * 60, 15 * 60, 30 * 60,
+        3600, 2 * 3600, 3 * 3600, 6 * 3600, 12 * 3600,
+        86400, 2 * 86400, 7 * 86400, 30 * 86400,
+    )
+]
+
+# Con LTTB se piden más ventanas de las necesarias para que el reductor tenga forma que preservar
+LTTB_OVERSAMPLING = 4
+
+# Measurements acumulativos: agregar con 'mean' falsearía el contador
+CUMULATIVE_MEASUREMENTS = ["energy"]
+
+_DURATION_RE = re.compile(r"^(\d+)(s|m|h|d|w)$")
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+# Ninguna ventana útil pasa de esto (y timedelta desborda mucho antes que el regex)
+MAX_DURATION = timedelta(days=100 * 366)
+
+def parse_duration(text: str) -> timedelta:
+    """Convierte una duración estilo Flux ("30s", "5m", "1h", "1d", "1w") en timedelta."""
+    match = _DURATION_RE.match(text.strip())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid duration '{text}'. Use <n>s, <n>m, <n>h, <n>d or <n>w")
+    seconds = int(match.group(1)) * _DURATION_UNITS[match.group(2)]
+    if seconds > MAX_DURATION.total_seconds():
+        raise ValueError(f"Duration '{text}' is longer than {MAX_DURATION.days} days")
+    return timedelta(seconds=seconds)
+
+def choose_aggregate_window(
+    start: datetime, end: datetime,
+    max_points: Optional[int] = None, resolution: Optional[timedelta] = None
+) -> Optional[timedelta]:
+    """
+    Elige el intervalo de aggregateWindow para un rango.
+
+    Una `resolution` explícita tiene prioridad; con `max_points` se toma el menor
+    intervalo redondo que deja como mucho `max_points` ventanas en el rango.
+    Devuelve None cuando no hace falta agregar (datos crudos).
+    """
+    if resolution is not None:
+        return resolution
+    if not max_points:
+        return None
+    target = (end - start) / max_points
+    if target <= _NICE_WINDOWS[0]:
+        return None
+    for window in _NICE_WINDOWS:
+        if window >= target:
+            return window
+    # Rangos enormes: múltiplo entero de días
+    return timedelta(days=math.ceil(target / timedelta(days=1)))
+
+def flux_aggregate_fn(aggregate: AggregateFunction) -> str:
+    """Función Flux para aggregateWindow; LTTB pre-agrega con 'mean' y reduce después."""
+    if aggregate == AggregateFunction.LTTB:
+        return "mean"
+    return aggregate.value
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets: índices de los puntos que mejor conservan la forma.
+
+    Siempre conserva el primer y el último punto. Si la serie ya cabe en
+    `threshold`, devuelve todos los índices.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    selected = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Promedio del bucket siguiente (punto "C" del triángulo)
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        # Punto del bucket actual que forma el triángulo de mayor área con A y C
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = xs[a], ys[a]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        selected.append(best)
+        a = best
+
+    selected.append(n - 1)
+    return selected
@@ -0,0 +1,59 @@
+# services/fanout.py
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+def split_range(
+    start_us: int, end_us: int, step_us: int, chunk_points: int, max_chunks: int, align_us: Optional[int] = None
+) -> List[Tuple[int, int]]:
+    """
+    Divide [start_us, end_us) en tramos de unos `chunk_points` puntos leídos por serie.
+
+    `step_us` es la distancia entre los puntos que InfluxDB tiene que leer (la
+    cadencia de los datos crudos o la resolución del nivel de rollup), no la de los
+    que devuelve: agregar un mes en ventanas de 1h sigue leyendo todo el crudo.
+    Los cortes caen en múltiplos de `align_us` (por defecto `step_us`) desde epoch:
+    con agregación, alineados a la ventana, cada ventana de aggregateWindow queda
+    entera en un tramo y el resultado unido es el mismo que el de la consulta completa.
+    """
+    align_us = max(1, align_us or step_us)
+    expected_points = (end_us - start_us) // max(1, step_us)
+    chunks = min(max_chunks, -(-expected_points // max(1, chunk_points)))
+    if chunks <= 1:
+        return [(start_us, end_us)]
+    span = -(-(end_us - start_us) // chunks)
+    bounds = [start_us]
+    for i in range(1, chunks):
+        cut = -(-(start_us + i * span) // align_us) * align_us
+        if bounds[-1] < cut < end_us:
+            bounds.append(cut)
+    bounds.append(end_us)
+    return list(zip(bounds, bounds[1:]))
+
+async def gather_bounded(calls: Sequence[Callable[[], Awaitable[T]]], parallelism: int) -> List[T]:
+    """
+    Ejecuta las llamadas con como mucho `parallelism` a la vez; resultados en el orden de `calls`.
+
+    Si una falla se cancelan las que siguen en curso o en cola y se propaga su
+    error; si quien espera es cancelado (p.ej. el cliente se desconecta), también.
+    """
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+
+    async def run(call: Callable[[], Awaitable[T]]) -> T:
+        async with semaphore:
+            return await call()
+
+    tasks = [asyncio.ensure_future(run(call)) for call in calls]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,100 @@
+# services/flux_csv.py
+import csv
+import io
+from datetime import date
+from typing import AbstractSet, Dict, Iterator, List, Sequence, Tuple
+
+# Caché de "YYYY-MM-DD" -> segundos epoch del inicio del día (pocas fechas distintas por consulta)
+_DAY_SECONDS: Dict[str, int] = {}
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+class FluxCsvError(ValueError):
+    """Error devuelto por InfluxDB dentro de la respuesta CSV."""
+
+def rfc3339_to_epoch_us(text: str) -> int:
+    """
+    Convierte un tiempo RFC3339 UTC de InfluxDB ("2024-01-01T00:00:00.123456789Z") a epoch-µs.
+
+    Evita datetime: la parte de fecha se memoriza y la hora se suma aritméticamente;
+    la fracción se trunca a microsegundos.
+    """
+    day = text[:10]
+    base = _DAY_SECONDS.get(day)
+    if base is None:
+        base = (date(int(day[:4]), int(day[5:7]), int(day[8:10])).toordinal() - _EPOCH_ORDINAL) * 86400
+        if len(_DAY_SECONDS) > 4096:
+            _DAY_SECONDS.clear()
+        _DAY_SECONDS[day] = base
+    seconds = base + int(text[11:13]) * 3600 + int(text[14:16]) * 60 + int(text[17:19])
+    micros = 0
+    if len(text) > 20 and text[19] == ".":
+        fraction = text[20:-1] # sin la 'Z' final
+        micros = int((fraction + "000000")[:6])
+    return seconds * 1_000_000 + micros
+
+def iter_csv_rows(text: str, columns: Sequence[str]) -> Iterator[List[str]]:
+    """
+    Recorre una respuesta CSV anotada de Flux devolviendo solo las columnas pedidas.
+
+    Cada tabla empieza (tras sus anotaciones '#...') con una fila de cabecera; las
+    tablas se separan con una línea en blanco. Las columnas que falten en una tabla
+    se devuelven como cadena vacía.
+    """
+    reader = csv.reader(io.StringIO(text))
+    indices: List[int] = []
+    expect_header = True
+    for row in reader:
+        if not row:
+            expect_header = True
+            continue
+        first = row[0]
+        if first and first[0] == "#":
+            expect_header = True
+            continue
+        if expect_header:
+            expect_header = False
+            _raise_if_error(row, reader)
+            positions = {name: i for i, name in enumerate(row)}
+            indices = [positions.get(name, -1) for name in columns]
+            continue
+        yield [row[i] if i >= 0 else "" for i in indices]
+
+def iter_pivoted_rows(
+    text: str, key_columns: Sequence[str], meta_columns: AbstractSet[str]
+) -> Iterator[Tuple[List[str], List[Tuple[str, str]]]]:
+    """
+    Recorre una respuesta pivotada (una columna por _field) devolviendo
+    (valores de `key_columns`, [(campo, valor), ...]).
+
+    Son campos todas las columnas que no están en `key_columns` ni en `meta_columns`;
+    como cada tabla trae su cabecera, cada measurement puede tener campos distintos.
+    """
+    reader = csv.reader(io.StringIO(text))
+    key_indices: List[int] = []
+    field_indices: List[Tuple[int, str]] = []
+    expect_header = True
+    for row in reader:
+        if not row:
+            expect_header = True
+            continue
+        first = row[0]
+        if first and first[0] == "#":
+            expect_header = True
+            continue
+        if expect_header:
+            expect_header = False
+            _raise_if_error(row, reader)
+            positions = {name: i for i, name in enumerate(row)}
+            key_indices = [positions.get(name, -1) for name in key_columns]
+            field_indices = [
+                (i, name) for i, name in enumerate(row) if name not in meta_columns and name not in key_columns
+            ]
+            continue
+        yield [row[i] if i >= 0 else "" for i in key_indices], [(name, row[i]) for i, name in field_indices]
+
+def _raise_if_error(header: List[str], reader) -> None:
+    """Las respuestas de error de Flux son una tabla con columnas 'error' y 'reference'."""
+    if "error" in header and "reference" in header:
+        error_row = next(reader, None)
+        message = error_row[header.index("error")] if error_row else "unknown error"
+        raise FluxCsvError(f"InfluxDB query error: {message}")
@@ -0,0 +1,275 @@
+# services/flux_queries.py
+import json
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from ..core.config import get_settings
+from ..core.enums import AggregateFunction, StatsAggregate, StatsWindow
+from .downsampling import CUMULATIVE_MEASUREMENTS, flux_aggregate_fn
+
+# Consulta Flux lista para enviar: (texto de la plantilla, parámetros)
+FluxQuery = Tuple[str, Dict[str, Any]]
+
+# Columnas que no son campos en una fila pivotada (el resto son los _field originales)
+PIVOT_META_COLUMNS = frozenset({"", "result", "table", "_time", "_measurement"})
+
+# Ventanas de estadísticas: (every, offset). aggregateWindow alinea a epoch (jueves),
+# así que las semanas se desplazan 4 días para empezar en lunes.
+STATS_WINDOWS: Dict[StatsWindow, Tuple[timedelta, timedelta]] = {
+    StatsWindow.HOUR: (timedelta(hours=1), timedelta(0)),
+    StatsWindow.DAY: (timedelta(days=1), timedelta(0)),
+    StatsWindow.WEEK: (timedelta(weeks=1), timedelta(days=4)),
+}
+
+# Función Flux de cada estadístico para aggregateWindow
+_STATS_FUNCTIONS: Dict[StatsAggregate, str] = {
+    StatsAggregate.MIN: "min",
+    StatsAggregate.MAX: "max",
+    StatsAggregate.MEAN: "mean",
+    StatsAggregate.STDDEV: "stddev",
+    StatsAggregate.P95: "(column, tables=<-) => tables |> quantile(q: 0.95, column: column)",
+    StatsAggregate.P99: "(column, tables=<-) => tables |> quantile(q: 0.99, column: column)",
+    StatsAggregate.CONSUMPTION: "spread", # max - min de un contador monótono
+}
+
+# Estadísticos que guarda cada nivel de rollup (tag "stat")
+ROLLUP_STATS = ("min", "mean", "max", "last")
+
+# Funciones que admite historical_query(fn=...): se escriben en el texto de la plantilla
+AGGREGATE_FUNCTIONS = frozenset(flux_aggregate_fn(aggregate) for aggregate in AggregateFunction)
+
+_MEASUREMENT_NAME_RE = re.compile(r"\w+")
+
+def measurement_filter(measurements: Iterable[str]) -> str:
+    """
+    Predicado Flux que acepta cualquiera de los measurements dados.
+
+    Los measurements son constantes del servicio, no entrada del usuario; se
+    escriben como literales para que InfluxDB pueda empujar el filtro al storage.
+    Aun así solo se admiten identificadores: nada que pueda cerrar el literal.
+    """
+    measurements = list(measurements)
+    for m in measurements:
+        if not _MEASUREMENT_NAME_RE.fullmatch(m):
+            raise ValueError(f"Invalid measurement name: {m!r}")
+    return " or ".join(f'r["_measurement"] == {json.dumps(m)}' for m in measurements)
+
+def _pivot_stage(pivot: bool) -> str:
+    """Reduce cada fila a lo imprescindible y, con `pivot`, junta todos los campos de un instante en una fila."""
+    stage = '''
+          |> keep(columns: ["_time", "_measurement", "_field", "_value"])'''
+    if pivot:
+        stage += '''
+          |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")'''
+    return stage
+
+def _limit_stage(limit: bool) -> str:
+    """Como mucho `_limit` filas por tabla (una tabla por serie sin pivot): páginas de trabajo acotado."""
+    if not limit:
+        return ""
+    return '''
+          |> limit(n: _limit)'''
+
+# --- Plantillas (se construyen una vez por combinación y se reutilizan) ---
+
+@lru_cache(maxsize=None)
+def _latest_template(measurements: Tuple[str, ...], many: bool) -> str:
+    installation_filter = (
+        'contains(value: r["installation_id"], set: _installation_ids)' if many
+        else 'r["installation_id"] == _installation_id'
+    )
+    return f'''
+        from(bucket: _bucket)
+          |> range(start: -5m)
+          |> filter(fn: (r) => {measurement_filter(measurements)})
+          |> filter(fn: (r) => {installation_filter})
+          |> group(columns: ["installation_id", "_measurement", "_field"])
+          |> last()
+        '''
+
+def _stat_filter(stat: Optional[str]) -> str:
+    """En buckets de rollup cada estadístico es una serie aparte (tag "stat")."""
+    if stat is None:
+        return ""
+    return f'''
+          |> filter(fn: (r) => r["stat"] == "{stat}")'''
+
+@lru_cache(maxsize=None)
+def _historical_template(
+    measurements: Tuple[str, ...], aggregated: bool, fn: str, pivot: bool, rollup: bool = False, limit: bool = False
+) -> str:
+    source = f'''
+        from(bucket: _bucket)
+          |> range(start: _start, stop: _stop)
+          |> filter(fn: (r) => {measurement_filter(measurements)})
+          |> filter(fn: (r) => r["installation_id"] == _installation_id)'''
+    if not aggregated:
+        return source + _pivot_stage(pivot) + _limit_stage(limit) + '''
+          |> yield(name: "results")
+        '''
+
+    regular = [m for m in measurements if m not in CUMULATIVE_MEASUREMENTS]
+    cumulative = [m for m in measurements if m in CUMULATIVE_MEASUREMENTS]
+    flux_query = f"data = {source.lstrip()}\n"
+    if regular:
+        flux_query += f'''
+        data
+          |> filter(fn: (r) => {measurement_filter(regular)}){_stat_filter(fn if rollup else None)}
+          |> aggregateWindow(every: _every, fn: {fn}, createEmpty: false){_pivot_stage(pivot)}{_limit_stage(limit)}
+          |> yield(name: "results")
+        '''
+    if cumulative:
+        # Un contador acumulado nunca se promedia: siempre 'last'
+        flux_query += f'''
+        data
+          |> filter(fn: (r) => {measurement_filter(cumulative)}){_stat_filter("last" if rollup else None)}
+          |> aggregateWindow(every: _every, fn: last, createEmpty: false){_pivot_stage(pivot)}{_limit_stage(limit)}
+          |> yield(name: "cumulative")
+        '''
+    return flux_query
+
+@lru_cache(maxsize=None)
+def _stats_template(measurements: Tuple[str, ...], aggregates: Tuple[StatsAggregate, ...]) -> Optional[str]:
+    regular = [m for m in measurements if m not in CUMULATIVE_MEASUREMENTS]
+    cumulative = [m for m in measurements if m in CUMULATIVE_MEASUREMENTS]
+    branches = ""
+    for aggregate in aggregates:
+        # 'consumption' solo tiene sentido en contadores; el resto, solo en medidas instantáneas
+        targets = cumulative if aggregate == StatsAggregate.CONSUMPTION else regular
+        if not targets:
+            continue
+        branches += f'''
+        data
+          |> filter(fn: (r) => {measurement_filter(targets)})
+          |> aggregateWindow(every: _every, offset: _offset, fn: {_STATS_FUNCTIONS[aggregate]}, timeSrc: "_start", createEmpty: false)
+          |> keep(columns: ["_time", "_measurement", "_field", "_value"])
+          |> yield(name: "{aggregate.value}")
+        '''
+    if not branches:
+        return None
+    return f'''data = from(bucket: _bucket)
+          |> range(start: _start, stop: _stop)
+          |> filter(fn: (r) => {measurement_filter(measurements)})
+          |> filter(fn: (r) => r["installation_id"] == _installation_id)
+        ''' + branches
+
+@lru_cache(maxsize=None)
+def _rollup_template(measurements: Tuple[str, ...], from_rollup: bool) -> str:
+    """Un nivel de rollup: cada estadístico por ventana, pivotado (una fila por measurement e instante)."""
+    flux_query = f'''data = from(bucket: _bucket)
+          |> range(start: _start, stop: _stop)
+          |> filter(fn: (r) => {measurement_filter(measurements)})
+          |> filter(fn: (r) => r["installation_id"] == _installation_id)
+        '''
+    for stat in ROLLUP_STATS:
+        # Desde un nivel inferior: min de mínimos, max de máximos, media de medias, último de últimos
+        flux_query += f'''
+        data{_stat_filter(stat if from_rollup else None)}
+          |> aggregateWindow(every: _every, fn: {stat}, timeSrc: "_start", createEmpty: false){_pivot_stage(True)}
+          |> yield(name: "{stat}")
+        '''
+    return flux_query
+
+_ROLLUP_COVERAGE_TEMPLATE = '''data = from(bucket: _bucket)
+          |> range(start: 0)
+          |> filter(fn: (r) => r["installation_id"] == _installation_id)
+          |> filter(fn: (r) => r["stat"] == "last")
+          |> keep(columns: ["_time"])
+          |> group()
+
+        data |> first(column: "_time") |> yield(name: "first")
+        data |> last(column: "_time") |> yield(name: "last")
+        '''
+
+_INSTALLATIONS_TEMPLATE = '''
+        import "influxdata/influxdb/schema"
+
+        schema.tagValues(bucket: _bucket, tag: "installation_id", start: _since)
+        '''
+
+# --- Constructores públicos: plantilla + parámetros ---
+
+def latest_query(installation_ids: Sequence[str], measurements: Sequence[str]) -> FluxQuery:
+    """Último valor de cada serie (instalación, measurement, field) en los últimos 5 minutos."""
+    params: Dict[str, Any] = {"_bucket": get_settings().INFLUXDB_BUCKET}
+    if len(installation_ids) == 1:
+        # Igualdad simple: a diferencia de contains(), se empuja al storage
+        params["_installation_id"] = installation_ids[0]
+    else:
+        params["_installation_ids"] = list(installation_ids)
+    return _latest_template(tuple(measurements), len(installation_ids) != 1), params
+
+def historical_query(
+    installation_id: str, start: datetime, end: datetime, measurements: Sequence[str],
+    window: Optional[timedelta] = None, fn: str = "mean", pivot: bool = False,
+    rollup_bucket: Optional[str] = None, limit: Optional[int] = None
+) -> FluxQuery:
+    """
+    Consulta de rango histórico para un conjunto de measurements.
+
+    Con `window` se agrega con aggregateWindow. Con `pivot` cada instante llega
+    como una sola fila con una columna por campo (p.ej. phase_a, phase_b, phase_c).
+    Con `rollup_bucket` (requiere `window`) se lee el estadístico `fn` de ese nivel de rollup.
+    Con `limit` cada tabla devuelve como mucho ese número de filas (páginas).
+    """
+    if fn not in AGGREGATE_FUNCTIONS:
+        raise ValueError(f"Invalid aggregate function: {fn!r}")
+    params: Dict[str, Any] = {
+        "_bucket": rollup_bucket or get_settings().INFLUXDB_BUCKET,
+        "_installation_id": installation_id,
+        "_start": start,
+        "_stop": end,
+    }
+    if window is not None:
+        params["_every"] = window
+    if limit is not None:
+        params["_limit"] = limit
+    rollup = rollup_bucket is not None and window is not None
+    return _historical_template(tuple(measurements), window is not None, fn, pivot, rollup, limit is not None), params
+
+def stats_query(
+    installation_id: str, start: datetime, end: datetime, measurements: Sequence[str],
+    window: StatsWindow, aggregates: Sequence[StatsAggregate]
+) -> Optional[FluxQuery]:
+    """
+    Estadísticos por ventana, uno por `yield` (el nombre del resultado es el estadístico).
+
+    Cada fila es (ventana, measurement, field, valor): la respuesta tiene unos pocos
+    números por ventana en lugar de todos los puntos. None si ningún estadístico
+    aplica a los measurements pedidos.
+    """
+    template = _stats_template(tuple(measurements), tuple(aggregates))
+    if template is None:
+        return None
+    every, offset = STATS_WINDOWS[window]
+    return template, {
+        "_bucket": get_settings().INFLUXDB_BUCKET,
+        "_installation_id": installation_id,
+        "_start": start,
+        "_stop": end,
+        "_every": every,
+        "_offset": offset,
+    }
+
+def rollup_query(
+    installation_id: str, source_bucket: str, start: datetime, end: datetime,
+    every: timedelta, measurements: Sequence[str], from_rollup: bool
+) -> FluxQuery:
+    """Estadísticos ROLLUP_STATS por ventana `every` desde el bucket crudo o desde el nivel inferior."""
+    return _rollup_template(tuple(measurements), from_rollup), {
+        "_bucket": source_bucket,
+        "_installation_id": installation_id,
+        "_start": start,
+        "_stop": end,
+        "_every": every,
+    }
+
+def rollup_coverage_query(bucket: str, installation_id: str) -> FluxQuery:
+    """Primera y última ventana ya escritas de una instalación en un nivel de rollup."""
+    return _ROLLUP_COVERAGE_TEMPLATE, {"_bucket": bucket, "_installation_id": installation_id}
+
+def installations_query(since: timedelta) -> FluxQuery:
+    """Instalaciones con datos en el bucket crudo durante el último `since`."""
+    return _INSTALLATIONS_TEMPLATE, {"_bucket": get_settings().INFLUXDB_BUCKET, "_since": -since}
@@ -0,0 +1,93 @@
+# services/gateway_keys.py
+import hashlib
+import os
+from functools import lru_cache
+from time import monotonic
+from typing import Dict, FrozenSet, NamedTuple, Optional
+
+from ..core.config import get_settings, read_config_file
+
+class GatewayKey(NamedTuple):
+    gateway: str
+    installations: FrozenSet[str] # "*" = cualquier instalación
+
+    def allows(self, installation_id: str) -> bool:
+        return installation_id in self.installations or "*" in self.installations
+
+def hash_key(key: str) -> str:
+    """SHA-256 (hex) de una clave; es lo único que se guarda en el fichero."""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def _build_index(config: Dict) -> Dict[str, GatewayKey]:
+    index: Dict[str, GatewayKey] = {}
+    for gateway, entry in (config.get("gateways") or {}).items():
+        entry = entry or {}
+        digest = str(entry.get("key_sha256") or "").strip().lower()
+        if len(digest) != 64:
+            raise ValueError(f"Gateway '{gateway}' needs a 64-character hex 'key_sha256'")
+        if digest in index:
+            raise ValueError(f"Gateways '{index[digest].gateway}' and '{gateway}' share the same key")
+        installations = entry.get("installations") or []
+        if isinstance(installations, str):
+            installations = [installations]
+        index[digest] = GatewayKey(str(gateway), frozenset(str(i) for i in installations))
+    return index
+
+class GatewayKeyStore:
+    """
+    Claves de los gateways que escriben por la API de ingesta, desde INGEST_KEYS_FILE (YAML o JSON):
+
+        gateways:
+          gw-north:
+            key_sha256: "<sha256 hex de la clave>"
+            installations: ["site-001", "site-002"] # o ["*"]
+
+    Solo se guarda el hash de cada clave (`printf %s "$KEY" | sha256sum`). El fichero
+    se relee al cambiar su mtime, que se comprueba en las búsquedas como mucho una vez
+    cada `reload_seconds`; si el nuevo es inválido se conservan las claves anteriores.
+    Sin fichero no hay claves y toda escritura se rechaza.
+    """
+
+    def __init__(self, path: Optional[str], reload_seconds: float = 5.0):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._keys: Dict[str, GatewayKey] = {}
+        if path:
+            self._reload_if_changed()
+
+    def _reload_if_changed(self) -> None:
+        self._next_check = monotonic() + self.reload_seconds
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            if self._mtime is None:
+                print(f"ERROR: Could not read gateway keys from '{self.path}': {e}")
+                self._mtime = -1.0
+            return
+        if mtime == self._mtime:
+            return
+        # Se anota antes de cargar para no reintentar en bucle un fichero inválido
+        self._mtime = mtime
+        try:
+            keys = _build_index(read_config_file(self.path))
+        except Exception as e:
+            print(f"ERROR: Could not load gateway keys from '{self.path}': {e}")
+            return
+        self._keys = keys
+        print(f"Loaded {len(keys)} gateway keys from '{self.path}'")
+
+    def lookup(self, key: str) -> Optional[GatewayKey]:
+        """Gateway dueño de `key`, o None si la clave no existe."""
+        if self.path and monotonic() >= self._next_check:
+            self._reload_if_changed()
+        return self._keys.get(hash_key(key))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+@lru_cache(maxsize=None)
+def get_gateway_keys() -> GatewayKeyStore:
+    settings = get_settings()
+    return GatewayKeyStore(settings.INGEST_KEYS_FILE, settings.INGEST_KEYS_RELOAD_SECONDS)
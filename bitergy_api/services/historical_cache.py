@@ -0,0 +1,160 @@
+# services/historical_cache.py
+import asyncio
+import math
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# Columnas de una serie: (unidad, tiempos en epoch-µs, valores)
+SeriesColumns = Tuple[str, List[int], List[float]]
+HistoricalColumns = Dict[str, SeriesColumns]
+
+# Estimación de memoria por punto cacheado (slot de lista + int + float)
+_BYTES_PER_POINT = 72
+_BYTES_PER_SERIES = 256
+
+def estimate_size(columns: HistoricalColumns) -> int:
+    """Tamaño aproximado en bytes de un segmento cacheado."""
+    return sum(_BYTES_PER_SERIES + len(timestamps) * _BYTES_PER_POINT for _, timestamps, _ in columns.values())
+
+def segment_size_us(base_seconds: int, window: Optional[timedelta]) -> int:
+    """
+    Tamaño de segmento en µs; con agregación es múltiplo de la ventana.
+
+    aggregateWindow alinea sus ventanas a epoch, así que segmentos alineados a
+    epoch y múltiplos de la ventana dan el mismo resultado que la consulta entera.
+    """
+    base_us = base_seconds * 1_000_000
+    if window is None:
+        return base_us
+    window_us = int(window.total_seconds()) * 1_000_000
+    return window_us * max(1, math.ceil(base_us / window_us))
+
+def contiguous_runs(indices: Iterable[int]) -> List[Tuple[int, int]]:
+    """Agrupa índices ordenados en tramos consecutivos [(primero, último), ...]."""
+    runs: List[Tuple[int, int]] = []
+    for idx in indices:
+        if runs and runs[-1][1] == idx - 1:
+            runs[-1] = (runs[-1][0], idx)
+        else:
+            runs.append((idx, idx))
+    return runs
+
+def split_by_segment(columns: HistoricalColumns, segment_us: int, aggregated: bool) -> Dict[int, HistoricalColumns]:
+    """
+    Reparte columnas por índice de segmento.
+
+    aggregateWindow marca cada ventana con su _stop, de modo que una ventana que
+    termina justo en el borde pertenece al segmento anterior.
+    """
+    offset = 1 if aggregated else 0
+    segments: Dict[int, HistoricalColumns] = {}
+    for variable_name, (unit, timestamps, values) in columns.items():
+        for t, v in zip(timestamps, values):
+            part = segments.setdefault((t - offset) // segment_us, {})
+            series = part.get(variable_name)
+            if series is None:
+                series = part[variable_name] = (unit, [], [])
+            series[1].append(t)
+            series[2].append(v)
+    return segments
+
+class SegmentCache:
+    """
+    Caché LRU de segmentos históricos cerrados, limitada por un presupuesto en bytes.
+
+    Los segmentos completamente en el pasado no caducan: solo salen por presión
+    de memoria o con `discard()` cuando la ingesta escribe datos atrasados.
+
+    Las cargas en curso se registran por segmento (`track`): una petición que
+    necesita un segmento que otra ya está consultando espera esa carga
+    (`loading`) en lugar de repetir la consulta.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[HistoricalColumns, int]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # Sube con cada discard(): una carga empezada antes no debe cachear lo que leyó
+        self.generation = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[HistoricalColumns]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, columns: HistoricalColumns, generation: Optional[int] = None) -> None:
+        """Guarda un segmento; con `generation`, solo si no ha habido un discard() desde entonces."""
+        if generation is not None and generation != self.generation:
+            return
+        size = estimate_size(columns)
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous[1]
+        self._entries[key] = (columns, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def loading(self, key: Hashable) -> Optional[asyncio.Future]:
+        """Carga en curso que incluye el segmento `key`, si la hay."""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        return future
+
+    def track(self, keys: Iterable[Hashable], future: asyncio.Future) -> None:
+        """Registra `future` como la carga en curso de `keys` hasta que termine."""
+        keys = tuple(keys)
+        for key in keys:
+            self._inflight[key] = future
+        future.add_done_callback(lambda f, keys=keys: self._on_loaded(keys, f))
+
+    def _on_loaded(self, keys: Tuple[Hashable, ...], future: asyncio.Future) -> None:
+        for key in keys:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        # Marca el error como recogido aunque todas las peticiones que esperaban se hayan ido
+        if not future.cancelled():
+            future.exception()
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Elimina las entradas cuya clave cumple `predicate`; devuelve cuántas."""
+        self.generation += 1
+        for key in [key for key in self._inflight if predicate(key)]:
+            del self._inflight[key] # Las peticiones nuevas no deben esperar una carga ya obsoleta
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            self.bytes -= self._entries.pop(key)[1]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "segments": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,135 @@
+# services/ingest.py
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache, partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..core.config import get_settings
+from ..core.db_client import get_influxdb_client
+from ..core.metrics import StatsCollector
+from ..models.ingest import ElectricalSample, MeasurementBatch, PhysicalSample
+from .data_provider import forget_history_since
+from .line_protocol import line_prefix
+from .write_buffer import WriteBuffer
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Mismo esquema que leen las consultas: measurement por magnitud, una columna por fase
+_PHASE_MEASUREMENTS = ("voltage", "current", "active_power", "apparent_power", "reactive_power", "power_factor")
+_PHASE_FIELDS = (("a", "phase_a"), ("b", "phase_b"), ("c", "phase_c"))
+_PHYSICAL_MEASUREMENTS = ("temperature", "humidity", "level")
+
+def _time_ns(time: datetime) -> int:
+    """Nanosegundos desde epoch; las fechas sin zona se interpretan como UTC."""
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    return (time - _EPOCH) // timedelta(microseconds=1) * 1000
+
+def _electrical_lines(sample: ElectricalSample, prefixes: Dict[str, str]) -> List[str]:
+    suffix = f" {_time_ns(sample.timestamp)}"
+    lines: List[str] = []
+    for measurement in _PHASE_MEASUREMENTS:
+        phases = getattr(sample, measurement)
+        fields = []
+        if phases is not None:
+            for attr, field in _PHASE_FIELDS:
+                value = getattr(phases, attr)
+                if value is not None:
+                    fields.append(f"{field}={value!r}")
+        if measurement == "active_power" and sample.total_active_power is not None:
+            fields.append(f"total={sample.total_active_power!r}")
+        if fields:
+            lines.append(prefixes[measurement] + " " + ",".join(fields) + suffix)
+    if sample.frequency is not None:
+        lines.append(f"{prefixes['frequency']} value={sample.frequency!r}{suffix}")
+    if sample.total_energy_kwh is not None:
+        lines.append(f"{prefixes['energy']} total_kwh={sample.total_energy_kwh!r}{suffix}")
+    return lines
+
+def _physical_lines(sample: PhysicalSample, prefixes: Dict[Tuple[str, Optional[str]], str], installation_id: str) -> List[str]:
+    suffix = f" {_time_ns(sample.timestamp)}"
+    lines: List[str] = []
+    for measurement in _PHYSICAL_MEASUREMENTS:
+        value = getattr(sample, measurement)
+        if value is None:
+            continue
+        key = (measurement, sample.sensor_location)
+        prefix = prefixes.get(key)
+        if prefix is None:
+            tags = {"installation_id": installation_id}
+            if sample.sensor_location:
+                tags["location"] = sample.sensor_location
+            prefix = prefixes[key] = line_prefix(measurement, tags)
+        lines.append(f"{prefix} value={value!r}{suffix}")
+    return lines
+
+def encode_batch(installation_id: str, batch: MeasurementBatch) -> List[str]:
+    """
+    Líneas de line protocol de un lote validado.
+
+    Measurement y tags se escapan una vez por lote (el prefijo es igual para todas
+    las muestras de una serie) y los valores ya son float, así que cada línea es
+    una concatenación de texto.
+    """
+    tags = {"installation_id": installation_id}
+    electrical_prefixes = {
+        measurement: line_prefix(measurement, tags) for measurement in _PHASE_MEASUREMENTS + ("frequency", "energy")
+    }
+    physical_prefixes: Dict[Tuple[str, Optional[str]], str] = {}
+    lines: List[str] = []
+    for sample in batch.electrical:
+        lines.extend(_electrical_lines(sample, electrical_prefixes))
+    for sample in batch.physical:
+        lines.extend(_physical_lines(sample, physical_prefixes, installation_id))
+    return lines
+
+def _now_us() -> int:
+    return (datetime.now(timezone.utc) - _EPOCH) // timedelta(microseconds=1)
+
+def backfill_limit_us() -> int:
+    """Muestras anteriores a esto (epoch-µs) se rechazan: INGEST_MAX_BACKFILL_SECONDS."""
+    return _now_us() - get_settings().INGEST_MAX_BACKFILL_SECONDS * 1_000_000
+
+def future_limit_us() -> int:
+    """Muestras posteriores a esto (epoch-µs) se rechazan: INGEST_MAX_FUTURE_SKEW_SECONDS."""
+    return _now_us() + get_settings().INGEST_MAX_FUTURE_SKEW_SECONDS * 1_000_000
+
+def newest_sample_us(batch: MeasurementBatch) -> int:
+    """Hora (epoch-µs) de la muestra más reciente del lote."""
+    return max(_time_ns(sample.timestamp) for sample in batch.electrical + batch.physical) // 1000
+
+def oldest_sample_us(batch: MeasurementBatch) -> int:
+    """Hora (epoch-µs) de la muestra más antigua del lote."""
+    return min(_time_ns(sample.timestamp) for sample in batch.electrical + batch.physical) // 1000
+
+def late_write_hook(installation_id: str, oldest_us: int) -> Optional[Callable[[], None]]:
+    """
+    Callback para cuando el lote esté escrito, si trae datos más antiguos que lo que
+    la caché histórica o los rollups ya dan por cerrado; None en el caso normal.
+    """
+    settings = get_settings()
+    settled_seconds = min(settings.HISTORICAL_CACHE_SETTLE_SECONDS, settings.ROLLUP_LAG_SECONDS)
+    if oldest_us >= _now_us() - settled_seconds * 1_000_000:
+        return None
+    return partial(forget_history_since, installation_id, oldest_us)
+
+async def _write_lines(lines: List[str]) -> None:
+    """Una escritura con WriteApiAsync; el cuerpo ya va en line protocol."""
+    settings = get_settings()
+    await get_influxdb_client().write_api().write(
+        bucket=settings.INFLUXDB_BUCKET, org=settings.INFLUXDB_ORG, record="\n".join(lines)
+    )
+
+@lru_cache(maxsize=None)
+def get_ingest_buffer() -> WriteBuffer:
+    """Buffer de ingesta; el escritor se arranca en el lifespan si INGEST_ENABLED."""
+    settings = get_settings()
+    return WriteBuffer(
+        _write_lines, settings.INGEST_BUFFER_MAX_LINES, settings.INGEST_FLUSH_LINES,
+        settings.INGEST_FLUSH_INTERVAL_SECONDS, settings.INGEST_MAX_RETRIES,
+        settings.INGEST_RETRY_BASE_SECONDS, settings.INGEST_RETRY_MAX_SECONDS
+    )
+
+StatsCollector(
+    "bitergy_ingest", "Measurement ingestion write buffer.", {"": lambda: get_ingest_buffer().stats()},
+    counters={"accepted_lines", "rejected_batches", "rejected_lines", "writes", "written_lines", "retries", "dropped_lines"}
+)
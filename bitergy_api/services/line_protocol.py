@@ -0,0 +1,49 @@
+# services/line_protocol.py
+import re
+from typing import Iterable, Mapping, Optional, Tuple, Union
+
+FieldValue = Union[float, int, bool, str]
+
+_MEASUREMENT_ESCAPES = str.maketrans({",": r"\,", " ": r"\ "})
+_KEY_ESCAPES = str.maketrans({",": r"\,", "=": r"\=", " ": r"\ "})
+# Sin escape posible: un salto de línea parte la línea y una "\" final se come el separador
+_UNSAFE = re.compile(r"[\x00-\x1f\x7f\\]")
+
+def _check(text: str, what: str) -> str:
+    if not text or _UNSAFE.search(text):
+        raise ValueError(f"Invalid {what} {text!r}: must be non-empty, without control characters or backslashes")
+    return text
+
+def escape_measurement(name: str) -> str:
+    return _check(name, "measurement").translate(_MEASUREMENT_ESCAPES)
+
+def escape_key(text: str) -> str:
+    """Escapa claves y valores de tag y claves de campo; ValueError si no se pueden representar."""
+    return _check(text, "tag or field").translate(_KEY_ESCAPES)
+
+def format_field_value(value: FieldValue) -> str:
+    # bool antes que int: bool es subclase de int
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value)
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def line_prefix(measurement: str, tags: Mapping[str, str]) -> str:
+    """Measurement y tags escapados (tags ordenados por clave, como recomienda InfluxDB); reutilizable por serie."""
+    prefix = escape_measurement(measurement)
+    for key in sorted(tags):
+        prefix += f",{escape_key(key)}={escape_key(tags[key])}"
+    return prefix
+
+def encode_line(
+    measurement: str, tags: Mapping[str, str], fields: Iterable[Tuple[str, FieldValue]], time_ns: Optional[int] = None
+) -> str:
+    """Una línea de line protocol de InfluxDB."""
+    line = line_prefix(measurement, tags)
+    line += " " + ",".join(f"{escape_key(key)}={format_field_value(value)}" for key, value in fields)
+    if time_ns is not None:
+        line += f" {time_ns}"
+    return line
@@ -0,0 +1,140 @@
+# services/pagination.py
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from ..core.config import get_settings
+from .flux_queries import AGGREGATE_FUNCTIONS
+from .historical_cache import HistoricalColumns
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _epoch_us(time: datetime) -> int:
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    return (time - _EPOCH) // timedelta(microseconds=1)
+
+class PageCursor(NamedTuple):
+    """
+    Estado de una lectura histórica paginada; viaja al cliente como token opaco.
+
+    Guarda el último `_time` devuelto de cada serie y qué series llenaron su
+    página (puede quedar más). La ventana y la función de agregación se fijan en
+    la primera página para que todas las páginas sean coherentes entre sí.
+    """
+    kind: str
+    installation_id: str
+    start_us: int
+    end_us: int
+    window_us: int  # 0 = datos crudos
+    fn: str
+    limit: int
+    last_us: Dict[str, int]
+    pending: Tuple[str, ...] = ()
+
+    def resume_us(self) -> int:
+        """
+        Inicio del range() de la siguiente página: la serie pendiente más atrasada.
+
+        En crudo se salta el punto ya devuelto; agregado, `_time` es el fin de la
+        última ventana, que es justo el inicio (alineado) de la siguiente.
+        """
+        if not self.pending:
+            return self.start_us
+        earliest = min(self.last_us[name] for name in self.pending)
+        return earliest if self.window_us else earliest + 1
+
+    def matches(self, kind: str, installation_id: str, start: datetime, end: datetime) -> bool:
+        """El cursor pertenece a esta misma consulta (tipo, instalación y rango)."""
+        return (
+            self.kind == kind and self.installation_id == installation_id
+            and self.start_us == _epoch_us(start) and self.end_us == _epoch_us(end)
+        )
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+@lru_cache(maxsize=None)
+def _cursor_key() -> bytes:
+    """Clave HMAC de los cursores; sin secreto configurado se genera una por proceso."""
+    secret = get_settings().HISTORICAL_CURSOR_SECRET
+    return secret.encode("utf-8") if secret else secrets.token_bytes(32)
+
+def _signature(payload: bytes) -> bytes:
+    return hmac.new(_cursor_key(), payload, hashlib.sha256).digest()
+
+def encode_cursor(cursor: PageCursor) -> str:
+    """Token "<payload>.<firma>": el cliente lo ve pero no puede alterarlo."""
+    payload = json.dumps(
+        [cursor.kind, cursor.installation_id, cursor.start_us, cursor.end_us, cursor.window_us,
+         cursor.fn, cursor.limit, cursor.last_us, list(cursor.pending)],
+        separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+    return f"{_b64encode(payload)}.{_b64encode(_signature(payload))}"
+
+def decode_cursor(token: str) -> PageCursor:
+    """
+    Reconstruye un cursor de encode_cursor; ValueError si el token no es válido.
+
+    La firma se comprueba antes de leer nada, y aun así se validan los campos que
+    llegan a la consulta Flux (`fn`, `window_us`) por si la clave se filtra.
+    """
+    try:
+        encoded_payload, encoded_signature = token.split(".")
+        payload_bytes = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not hmac.compare_digest(signature, _signature(payload_bytes)):
+        raise ValueError("Invalid cursor: bad signature")
+    try:
+        payload = json.loads(payload_bytes)
+        kind, installation_id, start_us, end_us, window_us, fn, limit, last_us, pending = payload
+        cursor = PageCursor(
+            str(kind), str(installation_id), int(start_us), int(end_us), int(window_us), str(fn), int(limit),
+            {str(name): int(t) for name, t in last_us.items()}, tuple(str(name) for name in pending)
+        )
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if cursor.limit < 1 or any(name not in cursor.last_us for name in cursor.pending):
+        raise ValueError("Invalid cursor: inconsistent state")
+    if cursor.fn not in AGGREGATE_FUNCTIONS:
+        raise ValueError("Invalid cursor: unknown aggregate function")
+    # Ventanas de aggregateWindow: segundos enteros (choose_aggregate_window nunca da otra cosa)
+    if cursor.window_us < 0 or cursor.window_us % 1_000_000:
+        raise ValueError("Invalid cursor: window must be a whole number of seconds")
+    return cursor
+
+def next_page(columns: HistoricalColumns, cursor: PageCursor) -> Tuple[HistoricalColumns, Optional[PageCursor]]:
+    """
+    Recorta a lo nuevo las columnas leídas con limit() desde `cursor.resume_us()`.
+
+    El range() empieza en la serie más atrasada, así que las demás pueden repetir
+    puntos ya enviados: se descartan con el último `_time` de cada una. Una serie
+    que llega a `limit` filas (contando repetidas) puede tener más; si ninguna
+    llega, el rango está completo y no hay cursor siguiente.
+    """
+    last_us = dict(cursor.last_us)
+    pending = []
+    page: HistoricalColumns = {}
+    for variable_name, (unit, timestamps, values) in columns.items():
+        if len(timestamps) >= cursor.limit:
+            pending.append(variable_name)
+        after = last_us.get(variable_name)
+        if after is not None:
+            kept = [(t, v) for t, v in zip(timestamps, values) if t > after]
+            timestamps, values = [t for t, _ in kept], [v for _, v in kept]
+        if timestamps:
+            page[variable_name] = (unit, timestamps, values)
+            last_us[variable_name] = max(timestamps)
+    if not pending:
+        return page, None
+    return page, cursor._replace(last_us=last_us, pending=tuple(pending))
@@ -0,0 +1,147 @@
+# services/realtime_push.py
+import asyncio
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from ..core.config import get_settings
+from ..core.metrics import StatsCollector
+from .data_provider import get_realtime_snapshot
+
+# Campos del snapshot que cambian en cada sondeo y no se envían como delta
+_VOLATILE_KEYS = ("generated_at", "value_age_seconds")
+_MISSING = object()
+
+def _flatten(data: Any, prefix: str = "") -> Dict[str, Any]:
+    """Aplana un dict anidado a rutas con puntos ("electrical.voltage.Phase A.value")."""
+    flat: Dict[str, Any] = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            path = f"{prefix}.{key}" if prefix else key
+            if isinstance(value, dict):
+                flat.update(_flatten(value, path))
+            else:
+                flat[path] = value
+    return flat
+
+class Subscriber:
+    """Cliente push: cola acotada y conjunto de instalaciones a las que debe un snapshot completo."""
+
+    def __init__(self, installation_ids: Iterable[str], queue_size: int):
+        self.installation_ids: List[str] = list(installation_ids)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.needs_snapshot: Set[str] = set(self.installation_ids)
+        self.dropped = 0
+
+    def offer(self, message: dict) -> None:
+        """Encola sin bloquear; si el cliente va atrasado se vacía la cola y se fuerza resincronización."""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            # Los deltas perdidos se sustituyen por un snapshot completo en el próximo sondeo
+            self.needs_snapshot.update(self.installation_ids)
+
+class _InstallationPoller:
+    """Tarea de fondo que consulta una instalación y reparte el resultado a sus suscriptores."""
+
+    def __init__(self, installation_id: str, interval: float):
+        self.installation_id = installation_id
+        self.interval = interval
+        self.subscribers: Set[Subscriber] = set()
+        self.state: Optional[Dict[str, Any]] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                snapshot = await get_realtime_snapshot(self.installation_id)
+                if snapshot is not None:
+                    data = snapshot.model_dump(mode="json", by_alias=True, exclude=set(_VOLATILE_KEYS))
+                    self._publish(_flatten(data))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"ERROR: Realtime push poller failed for '{self.installation_id}': {e}")
+            await asyncio.sleep(self.interval)
+
+    def _publish(self, state: Dict[str, Any]) -> None:
+        previous = self.state
+        self.state = state
+        delta: Optional[dict] = None
+        if previous is not None:
+            changes = {k: v for k, v in state.items() if previous.get(k, _MISSING) != v}
+            removed = [k for k in previous if k not in state]
+            if changes or removed:
+                delta = {"type": "delta", "asset_id": self.installation_id, "changes": changes, "removed": removed}
+
+        for subscriber in list(self.subscribers):
+            if self.installation_id in subscriber.needs_snapshot:
+                subscriber.needs_snapshot.discard(self.installation_id)
+                subscriber.offer(self.snapshot_message())
+            elif delta is not None:
+                subscriber.offer(delta)
+
+    def snapshot_message(self) -> dict:
+        return {"type": "snapshot", "asset_id": self.installation_id, "data": self.state}
+
+class RealtimeHub:
+    """
+    Reparte datos realtime a clientes WebSocket/SSE.
+
+    Hay una sola tarea de sondeo por instalación suscrita, sin importar cuántos
+    clientes la escuchen; la tarea se detiene cuando se va el último suscriptor.
+    """
+
+    def __init__(self, interval: float, queue_size: int):
+        self.interval = interval
+        self.queue_size = queue_size
+        self._pollers: Dict[str, _InstallationPoller] = {}
+
+    def subscribe(self, installation_ids: Iterable[str]) -> Subscriber:
+        subscriber = Subscriber(installation_ids, self.queue_size)
+        for installation_id in subscriber.installation_ids:
+            poller = self._pollers.get(installation_id)
+            if poller is None:
+                poller = self._pollers[installation_id] = _InstallationPoller(installation_id, self.interval)
+                poller.start()
+            poller.subscribers.add(subscriber)
+            # Si ya hay estado conocido, el cliente recibe el snapshot sin esperar al próximo sondeo
+            if poller.state is not None:
+                subscriber.needs_snapshot.discard(installation_id)
+                subscriber.offer(poller.snapshot_message())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        for installation_id in subscriber.installation_ids:
+            poller = self._pollers.get(installation_id)
+            if poller is None:
+                continue
+            poller.subscribers.discard(subscriber)
+            if not poller.subscribers:
+                poller.task.cancel()
+                del self._pollers[installation_id]
+
+    async def close(self) -> None:
+        for poller in self._pollers.values():
+            poller.task.cancel()
+        await asyncio.gather(*(p.task for p in self._pollers.values()), return_exceptions=True)
+        self._pollers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pollers": len(self._pollers),
+            "subscribers": len({s for p in self._pollers.values() for s in p.subscribers}),
+            "interval_seconds": self.interval,
+        }
+
+@lru_cache(maxsize=None)
+def get_realtime_hub() -> RealtimeHub:
+    settings = get_settings()
+    return RealtimeHub(settings.PUSH_POLL_INTERVAL_SECONDS, settings.PUSH_CLIENT_QUEUE_SIZE)
+
+StatsCollector("bitergy_push", "Realtime push hub (SSE/WebSocket pollers).", {"": lambda: get_realtime_hub().stats()})
@@ -0,0 +1,234 @@
+# services/rollups.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..core.config import get_settings
+from ..core.db_client import get_influxdb_client, get_query_api
+from ..core.enums import QueryLane
+from ..core.metrics import SKIPPED_RECORDS
+from .flux_csv import iter_csv_rows, iter_pivoted_rows, rfc3339_to_epoch_us
+from .flux_queries import PIVOT_META_COLUMNS, installations_query, rollup_coverage_query, rollup_query
+from .line_protocol import encode_line
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ROLLUP_KEY_COLUMNS = ("result", "_measurement", "_time")
+
+class RollupTier(NamedTuple):
+    name: str       # "1m", "1h", "1d"
+    every_us: int   # Resolución del nivel en µs
+    bucket: str
+
+class Coverage(NamedTuple):
+    """Tramo [first_us, watermark_us) ya consolidado de una instalación en un nivel."""
+    first_us: int
+    watermark_us: int
+
+def default_rollup_tiers() -> List[RollupTier]:
+    settings = get_settings()
+    base = settings.INFLUXDB_BUCKET
+    return [
+        RollupTier("1m", 60 * 1_000_000, settings.ROLLUP_BUCKET_1M or f"{base}_1m"),
+        RollupTier("1h", 3600 * 1_000_000, settings.ROLLUP_BUCKET_1H or f"{base}_1h"),
+        RollupTier("1d", 86400 * 1_000_000, settings.ROLLUP_BUCKET_1D or f"{base}_1d"),
+    ]
+
+def _from_epoch_us(us: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=us)
+
+def _now_us() -> int:
+    return (datetime.now(timezone.utc) - _EPOCH) // timedelta(microseconds=1)
+
+class RollupWorker:
+    """
+    Consolida en segundo plano el bucket crudo en niveles 1m/1h/1d (min/mean/max/last).
+
+    El nivel 1m se calcula desde los datos crudos y cada nivel superior desde el
+    anterior, siempre sobre ventanas cerradas. Cada (nivel, instalación) tiene una
+    marca de agua, de modo que cada pasada solo procesa lo nuevo. Al arrancar, las
+    marcas se recuperan del propio bucket de rollup y un reinicio no recalcula la historia.
+    `rewind()` retrasa las marcas cuando llegan datos atrasados, y esas ventanas se
+    vuelven a consolidar (los puntos nuevos sustituyen a los anteriores).
+    """
+
+    def __init__(
+        self, tiers: Sequence[RollupTier], measurements: Sequence[str], interval_seconds: float,
+        lag_seconds: int, backfill_days: int, max_windows: int
+    ):
+        self.tiers = list(tiers)
+        self.measurements = list(measurements)
+        self.interval_seconds = interval_seconds
+        self.lag_us = lag_seconds * 1_000_000
+        self.backfill = timedelta(days=backfill_days)
+        self.max_windows = max_windows
+        self.coverage: Dict[Tuple[str, str], Coverage] = {}
+        # Retrocesos pendientes por (nivel, instalación): también se aplican a lo que
+        # una pasada en curso anote al terminar
+        self._rewind_to: Dict[Tuple[str, str], int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.points_written = 0
+        self.errors = 0
+        self.last_run_at: Optional[datetime] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"ERROR: Rollup run failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def run_once(self) -> int:
+        """Una pasada completa: todas las instalaciones, nivel a nivel. Devuelve los puntos escritos."""
+        now_us = _now_us()
+        written = 0
+        for installation_id in await self._discover_installations():
+            finer: Optional[RollupTier] = None
+            for tier in self.tiers:
+                try:
+                    written += await self._roll_up(installation_id, tier, finer, now_us)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"ERROR: Rollup {tier.name} failed for '{installation_id}': {e}")
+                    break # Los niveles superiores dependen de este
+                finer = tier
+        self.runs += 1
+        self.points_written += written
+        self.last_run_at = datetime.now(timezone.utc)
+        return written
+
+    async def _discover_installations(self) -> List[str]:
+        query_api = await get_query_api(QueryLane.BACKGROUND, "rollup_discovery")
+        flux_query, params = installations_query(self.backfill)
+        text = await query_api.query_raw(query=flux_query, org=get_settings().INFLUXDB_ORG, params=params)
+        return [value for (value,) in iter_csv_rows(text, ("_value",)) if value]
+
+    async def _recover_coverage(self, tier: RollupTier, installation_id: str) -> Optional[Coverage]:
+        query_api = await get_query_api(QueryLane.BACKGROUND, "rollup_coverage")
+        flux_query, params = rollup_coverage_query(tier.bucket, installation_id)
+        text = await query_api.query_raw(query=flux_query, org=get_settings().INFLUXDB_ORG, params=params)
+        times = {result: rfc3339_to_epoch_us(time_text) for result, time_text in iter_csv_rows(text, ("result", "_time")) if time_text}
+        if "last" not in times:
+            return None
+        # Los puntos llevan el inicio de su ventana y solo se escriben ventanas cerradas
+        return Coverage(times.get("first", times["last"]), times["last"] + tier.every_us)
+
+    async def _roll_up(self, installation_id: str, tier: RollupTier, finer: Optional[RollupTier], now_us: int) -> int:
+        settings = get_settings()
+        every_us = tier.every_us
+        key = (tier.name, installation_id)
+        coverage = self.coverage.get(key)
+        if coverage is None:
+            coverage = await self._recover_coverage(tier, installation_id)
+            if coverage is None:
+                first_us = (now_us - int(self.backfill.total_seconds()) * 1_000_000) // every_us * every_us
+                coverage = Coverage(first_us, first_us)
+        coverage = self._apply_rewind(key, coverage, every_us)
+        self.coverage[key] = coverage
+
+        start_us = coverage.watermark_us
+        stop_us = (now_us - self.lag_us) // every_us * every_us
+        if finer is not None:
+            finer_coverage = self.coverage.get((finer.name, installation_id))
+            if finer_coverage is None:
+                return 0
+            # Solo ventanas que el nivel inferior ya tiene completas
+            stop_us = min(stop_us, finer_coverage.watermark_us // every_us * every_us)
+            if start_us < finer_coverage.first_us:
+                start_us = -(-finer_coverage.first_us // every_us) * every_us
+                if coverage.first_us == coverage.watermark_us:
+                    coverage = Coverage(start_us, start_us)
+        stop_us = min(stop_us, start_us + self.max_windows * every_us)
+        if stop_us <= start_us:
+            return 0
+
+        query_api = await get_query_api(QueryLane.BACKGROUND, "rollup")
+        flux_query, params = rollup_query(
+            installation_id, finer.bucket if finer else settings.INFLUXDB_BUCKET,
+            _from_epoch_us(start_us), _from_epoch_us(stop_us), timedelta(microseconds=every_us),
+            self.measurements, from_rollup=finer is not None
+        )
+        text = await query_api.query_raw(query=flux_query, org=settings.INFLUXDB_ORG, params=params)
+
+        lines: List[str] = []
+        for (stat, measurement, time_text), fields in iter_pivoted_rows(text, _ROLLUP_KEY_COLUMNS, PIVOT_META_COLUMNS):
+            try:
+                values = [(field, float(value_text)) for field, value_text in fields if value_text]
+                time_ns = rfc3339_to_epoch_us(time_text) * 1000
+            except (ValueError, IndexError) as e:
+                SKIPPED_RECORDS.inc(f"rollup_{tier.name}")
+                print(f"WARN: Skipping row due to parsing error in rollup {tier.name}: {e} - Row: {stat},{measurement},{time_text}")
+                continue
+            if values:
+                lines.append(encode_line(measurement, {"installation_id": installation_id, "stat": stat}, values, time_ns))
+        query_api.record_rows(len(lines))
+        if lines:
+            await get_influxdb_client().write_api().write(bucket=tier.bucket, org=settings.INFLUXDB_ORG, record=lines)
+
+        self.coverage[key] = self._apply_rewind(key, Coverage(coverage.first_us, stop_us), every_us)
+        return len(lines)
+
+    def _apply_rewind(self, key: Tuple[str, str], coverage: Coverage, every_us: int) -> Coverage:
+        since_us = self._rewind_to.pop(key, None)
+        if since_us is None:
+            return coverage
+        return Coverage(coverage.first_us, max(coverage.first_us, min(coverage.watermark_us, since_us // every_us * every_us)))
+
+    def rewind(self, installation_id: str, since_us: int) -> None:
+        """Se han escrito datos desde `since_us`: cada nivel vuelve a consolidar desde esa ventana."""
+        for tier in self.tiers:
+            key = (tier.name, installation_id)
+            since_us_tier = min(since_us, self._rewind_to.get(key, since_us))
+            # Queda pendiente para la pasada en curso (si la hay) y para marcas aún sin recuperar
+            self._rewind_to[key] = since_us_tier
+            coverage = self.coverage.get(key)
+            if coverage is not None:
+                # Se aplica ya para que route() no sirva el nivel desactualizado
+                self.coverage[key] = self._apply_rewind(key, coverage, tier.every_us)
+                self._rewind_to[key] = since_us_tier
+
+    def route(self, installation_id: str, start_us: int, end_us: int, window_us: int) -> Optional[Tuple[RollupTier, int, int]]:
+        """
+        Nivel más grueso cuya resolución divide `window_us` y que cubre parte del rango.
+
+        Devuelve (nivel, desde_us, hasta_us): ese tramo se lee del nivel y lo que quede
+        a cada lado, del bucket crudo. Los bordes caen en límites de ventana, así
+        ninguna ventana mezcla ambas fuentes.
+        """
+        first_window_us = -(-start_us // window_us) * window_us
+        for tier in reversed(self.tiers):
+            if window_us % tier.every_us:
+                continue
+            coverage = self.coverage.get((tier.name, installation_id))
+            if coverage is None or first_window_us < coverage.first_us:
+                continue
+            until_us = min(end_us, coverage.watermark_us // window_us * window_us)
+            if until_us > first_window_us:
+                return tier, first_window_us, until_us
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        watermarks: Dict[str, Dict[str, datetime]] = {}
+        for (tier_name, installation_id), coverage in self.coverage.items():
+            watermarks.setdefault(tier_name, {})[installation_id] = _from_epoch_us(coverage.watermark_us)
+        return {
+            "running": self._task is not None,
+            "tiers": {tier.name: tier.bucket for tier in self.tiers},
+            "runs": self.runs,
+            "points_written": self.points_written,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at,
+            "watermarks": watermarks,
+        }
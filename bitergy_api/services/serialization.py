@@ -0,0 +1,87 @@
+# services/serialization.py
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, TypeAdapter
+
+from ..core.enums import SeverityLevel
+from ..core.metrics import timed
+from .historical_cache import HistoricalColumns
+
+# Serializador de Pydantic para fechas sueltas (start_time/end_time), una vez por respuesta
+_DATETIME_ADAPTER = TypeAdapter(datetime)
+_EPOCH_DATE = date(1970, 1, 1)
+# Caché de día desde epoch -> "YYYY-MM-DDT" (pocas fechas distintas por respuesta)
+_DAY_PREFIX: Dict[int, str] = {}
+
+def datetime_json(value: datetime) -> str:
+    """Fecha en el mismo formato que la serialización JSON de Pydantic."""
+    return _DATETIME_ADAPTER.dump_python(value, mode="json")
+
+def format_epoch_us(us: int) -> str:
+    """
+    Epoch-µs UTC como ISO 8601, idéntico a Pydantic para datetimes UTC
+    ("2024-01-01T00:00:00Z", fracción de 6 dígitos solo si no es cero).
+    """
+    seconds, micros = divmod(us, 1_000_000)
+    days, second_of_day = divmod(seconds, 86400)
+    prefix = _DAY_PREFIX.get(days)
+    if prefix is None:
+        prefix = (_EPOCH_DATE + timedelta(days=days)).isoformat() + "T"
+        if len(_DAY_PREFIX) > 4096:
+            _DAY_PREFIX.clear()
+        _DAY_PREFIX[days] = prefix
+    hours, rest = divmod(second_of_day, 3600)
+    minutes, secs = divmod(rest, 60)
+    if micros:
+        return f"{prefix}{hours:02d}:{minutes:02d}:{secs:02d}.{micros:06d}Z"
+    return f"{prefix}{hours:02d}:{minutes:02d}:{secs:02d}Z"
+
+@timed("serialize")
+def model_json(model: BaseModel, exclude_none: bool = False) -> Dict[str, Any]:
+    """Volcado JSON de un modelo ya validado, con los alias aplicados una sola vez."""
+    return model.model_dump(mode="json", by_alias=True, exclude_none=exclude_none)
+
+def severity_summary_json(summary: Dict) -> Dict[str, Any]:
+    """Resumen de severidad (esquema SeveritySummary) con claves de texto."""
+    return {
+        "counts": {level.value: n for level, n in summary["counts"].items()},
+        "seconds": {level.value: t for level, t in summary["seconds"].items()},
+        "out_of_band_percent": summary["out_of_band_percent"],
+    }
+
+@timed("build")
+def grouped_historical_json(
+    asset_id: str, start: datetime, end: datetime, columns: HistoricalColumns,
+    severities: Optional[Dict[str, List[SeverityLevel]]] = None,
+    summaries: Optional[Dict[str, Dict]] = None, next_cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Esquema GroupedHistorical*Data directamente desde columnas, sin un modelo por punto.
+
+    Produce las mismas claves, en el mismo orden y con los mismos valores que el
+    `response_model` con `response_model_exclude_none=True`.
+    """
+    data: Dict[str, List[Dict[str, Any]]] = {}
+    for variable_name, (unit, timestamps, values) in columns.items():
+        if severities is None:
+            data[variable_name] = [
+                {"timestamp": format_epoch_us(t), "value": v, "unit": unit}
+                for t, v in zip(timestamps, values)
+            ]
+        else:
+            data[variable_name] = [
+                {"timestamp": format_epoch_us(t), "value": v, "unit": unit, "severity": level.value}
+                for t, v, level in zip(timestamps, values, severities[variable_name])
+            ]
+    content: Dict[str, Any] = {
+        "asset_id": asset_id,
+        "start_time": datetime_json(start),
+        "end_time": datetime_json(end),
+        "data": data,
+    }
+    if summaries is not None:
+        content["severity_summary"] = {name: severity_summary_json(summary) for name, summary in summaries.items()}
+    if next_cursor is not None:
+        content["next_cursor"] = next_cursor
+    return content
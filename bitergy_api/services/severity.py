@@ -0,0 +1,80 @@
+# services/severity.py
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from ..core.enums import SeverityLevel
+from ..models.common import Thresholds
+
+class CompiledThresholds(NamedTuple):
+    """Umbrales precompilados en bordes ordenados para clasificar con bisect."""
+    lower_edges: List[float]          # [critical_low, low] presentes
+    lower_levels: List[SeverityLevel] # nivel si el valor queda por debajo de cada borde
+    upper_edges: List[float]          # [high, critical_high] presentes
+    upper_levels: List[SeverityLevel] # nivel si el valor queda por encima de cada borde
+
+def compile_thresholds(thresholds: Optional[Thresholds]) -> Optional[CompiledThresholds]:
+    if thresholds is None:
+        return None
+    lower = [(e, l) for e, l in ((thresholds.critical_low, SeverityLevel.CRITICAL_LOW), (thresholds.low, SeverityLevel.LOW)) if e is not None]
+    upper = [(e, l) for e, l in ((thresholds.high, SeverityLevel.HIGH), (thresholds.critical_high, SeverityLevel.CRITICAL_HIGH)) if e is not None]
+    return CompiledThresholds(
+        lower_edges=[e for e, _ in lower], lower_levels=[l for _, l in lower],
+        upper_edges=[e for e, _ in upper], upper_levels=[l for _, l in upper],
+    )
+
+def classify_value(value: float, compiled: Optional[CompiledThresholds]) -> SeverityLevel:
+    """Un solo valor; mismo resultado que `_calculate_severity` con los umbrales sin compilar."""
+    if compiled is None:
+        return SeverityLevel.UNKNOWN
+    lower_edges, lower_levels, upper_edges, upper_levels = compiled
+    i = bisect_right(lower_edges, value)
+    if i < len(lower_edges):
+        return lower_levels[i]
+    i = bisect_left(upper_edges, value)
+    return upper_levels[i - 1] if i else SeverityLevel.NORMAL
+
+def classify_series(values: Sequence[float], compiled: Optional[CompiledThresholds]) -> List[SeverityLevel]:
+    """
+    Clasifica una serie completa, equivalente a `_calculate_severity` punto a punto.
+
+    Por abajo cuenta cuántos bordes son <= valor (bisect_right, comparación estricta
+    `<`); por arriba cuántos son < valor (bisect_left, comparación estricta `>`).
+    """
+    if compiled is None:
+        return [SeverityLevel.UNKNOWN] * len(values)
+    lower_edges, lower_levels, upper_edges, upper_levels = compiled
+    n_lower = len(lower_edges)
+    # Tabla: índice bisect por arriba -> nivel (0 bordes superados = Normal)
+    upper_table = [SeverityLevel.NORMAL] + upper_levels
+    levels: List[SeverityLevel] = []
+    append = levels.append
+    for v in values:
+        i = bisect_right(lower_edges, v)
+        if i < n_lower:
+            append(lower_levels[i])
+        else:
+            append(upper_table[bisect_left(upper_edges, v)])
+    return levels
+
+def summarize_severity(timestamps_us: Sequence[int], levels: Sequence[SeverityLevel]) -> Dict:
+    """
+    Recuento y tiempo por nivel de severidad.
+
+    Cada punto cuenta el tiempo hasta el siguiente; el último no suma tiempo.
+    `out_of_band_percent` es el % de tiempo clasificado fuera de Normal (sin contar Unknown).
+    """
+    counts: Dict[SeverityLevel, int] = {}
+    seconds: Dict[SeverityLevel, float] = {}
+    for level in levels:
+        counts[level] = counts.get(level, 0) + 1
+    for i in range(len(levels) - 1):
+        level = levels[i]
+        seconds[level] = seconds.get(level, 0.0) + (timestamps_us[i + 1] - timestamps_us[i]) / 1_000_000
+
+    known = sum(s for level, s in seconds.items() if level != SeverityLevel.UNKNOWN)
+    out_of_band = sum(s for level, s in seconds.items() if level not in (SeverityLevel.NORMAL, SeverityLevel.UNKNOWN))
+    return {
+        "counts": counts,
+        "seconds": seconds,
+        "out_of_band_percent": round(100 * out_of_band / known, 3) if known else 0.0,
+    }
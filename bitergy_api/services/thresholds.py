@@ -0,0 +1,178 @@
+# services/thresholds.py
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional
+
+from ..core.config import get_settings, read_config_file
+from ..models.common import InstallationThresholds, Thresholds
+from .severity import CompiledThresholds, compile_thresholds
+
+# Umbrales usados cuando no hay THRESHOLDS_FILE configurado
+_BUILTIN_CONFIG: Dict[str, Any] = {
+    "installations": {
+        "siteA-mainpanel": {
+            "thresholds": {
+                "voltage": {"critical_low": 207, "low": 218.5, "high": 241.5, "critical_high": 253},
+                "current": {"high": 80, "critical_high": 95}, # Asume 100A max
+                "frequency": {"critical_low": 48, "low": 49.5, "high": 50.5, "critical_high": 52}, # Asume 50Hz nominal
+                "temperature": {"low": 5, "high": 40, "critical_high": 50},
+                "humidity": {"high": 85, "critical_high": 95},
+            }
+        }
+    }
+}
+
+_VARIABLES = list(InstallationThresholds.model_fields)
+
+class ThresholdIndex:
+    """
+    Índice inmutable de umbrales efectivos, ya resueltos (defaults < grupos < instalación).
+
+    Cada consulta es un acceso O(1) a diccionario; no se construyen modelos por petición.
+    """
+
+    def __init__(self, config: Dict[str, Any], source: str):
+        self.source = source
+        self.loaded_at = datetime.now(timezone.utc)
+        # Huella del contenido: igual en todos los procesos y reinicios con la misma configuración
+        self.version = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+        defaults = config.get("defaults") or {}
+        groups = config.get("groups") or {}
+        installations = config.get("installations") or {}
+
+        resolved_groups: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for name in groups:
+            resolved_groups[name] = self._resolve_group(name, groups, resolved_groups, ())
+
+        entries: Dict[str, InstallationThresholds] = {}
+        entry_groups: Dict[str, Optional[str]] = {}
+        for installation_id, entry in installations.items():
+            entry = entry or {}
+            group = entry.get("group")
+            if group is not None and group not in resolved_groups:
+                raise ValueError(f"Installation '{installation_id}' references unknown group '{group}'")
+            merged = _merge(defaults, resolved_groups.get(group, {}))
+            merged = _merge(merged, entry.get("thresholds") or {})
+            entries[installation_id] = _to_model(merged)
+            entry_groups[installation_id] = group
+
+        self.default: Optional[InstallationThresholds] = _to_model(defaults) if defaults else None
+        self._entries: Mapping[str, InstallationThresholds] = MappingProxyType(entries)
+        self._groups: Mapping[str, Optional[str]] = MappingProxyType(entry_groups)
+        self._compiled: Dict[tuple, Optional[CompiledThresholds]] = {}
+
+    @staticmethod
+    def _resolve_group(name: str, groups: Dict[str, Any], resolved: Dict[str, Any], chain: tuple) -> Dict[str, Dict[str, float]]:
+        if name in resolved:
+            return resolved[name]
+        if name in chain:
+            raise ValueError(f"Threshold group inheritance cycle: {' -> '.join(chain + (name,))}")
+        if name not in groups:
+            raise ValueError(f"Unknown threshold group '{name}'")
+        group = groups[name] or {}
+        parent = group.get("extends")
+        base = ThresholdIndex._resolve_group(parent, groups, resolved, chain + (name,)) if parent else {}
+        resolved[name] = _merge(base, group.get("thresholds") or {})
+        return resolved[name]
+
+    def get(self, installation_id: str) -> Optional[InstallationThresholds]:
+        return self._entries.get(installation_id, self.default)
+
+    def group_of(self, installation_id: str) -> Optional[str]:
+        return self._groups.get(installation_id)
+
+    def installation_ids(self) -> List[str]:
+        """Instalaciones con umbrales explícitos (las demás solo tienen los `defaults`, si los hay)."""
+        return list(self._entries)
+
+    def compiled(self, installation_id: str, variable: str) -> Optional[CompiledThresholds]:
+        """Umbrales precompilados para clasificación por series (se memorizan por índice)."""
+        key = (installation_id if installation_id in self._entries else None, variable)
+        if key not in self._compiled:
+            config = self.get(installation_id)
+            self._compiled[key] = compile_thresholds(getattr(config, variable, None) if config else None)
+        return self._compiled[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+def _merge(base: Dict[str, Dict[str, float]], override: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Fusiona umbrales campo a campo: la capa superior solo reemplaza los límites que define."""
+    merged = {variable: dict(limits) for variable, limits in base.items()}
+    for variable, limits in override.items():
+        if variable not in _VARIABLES:
+            raise ValueError(f"Unknown threshold variable '{variable}'")
+        merged.setdefault(variable, {}).update(limits or {})
+    return merged
+
+def _to_model(config: Dict[str, Dict[str, float]]) -> InstallationThresholds:
+    return InstallationThresholds(**{variable: Thresholds(**limits) for variable, limits in config.items()})
+
+class ThresholdStore:
+    """
+    Almacén de umbrales cargado desde THRESHOLDS_FILE (YAML o JSON).
+
+    Un watcher de fondo revisa el mtime del fichero; al cambiar se construye un
+    índice nuevo completo y se sustituye con una sola asignación, de modo que las
+    peticiones en curso ven siempre un índice coherente. Si el fichero nuevo es
+    inválido se conserva el índice anterior.
+    """
+
+    def __init__(self, path: Optional[str], reload_seconds: float):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self._mtime: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self.index = ThresholdIndex(_BUILTIN_CONFIG, "builtin")
+        if path:
+            self.reload()
+
+    def reload(self) -> bool:
+        """Recarga el fichero; devuelve False (y mantiene el índice actual) si falla."""
+        if not self.path:
+            return False
+        try:
+            mtime = os.path.getmtime(self.path)
+            index = ThresholdIndex(read_config_file(self.path), self.path)
+        except Exception as e:
+            print(f"ERROR: Could not load thresholds from '{self.path}': {e}")
+            return False
+        self.index = index
+        self._mtime = mtime
+        print(f"Loaded thresholds for {len(index)} installations from '{self.path}'")
+        return True
+
+    def get(self, installation_id: str) -> Optional[InstallationThresholds]:
+        return self.index.get(installation_id)
+
+    def start_watching(self) -> None:
+        if self.path and self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop_watching(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                continue
+            if mtime != self._mtime:
+                # Se anota antes de recargar para no reintentar en bucle un fichero inválido
+                self._mtime = mtime
+                self.reload()
+
+@lru_cache(maxsize=None)
+def get_threshold_store() -> ThresholdStore:
+    settings = get_settings()
+    return ThresholdStore(settings.THRESHOLDS_FILE, settings.THRESHOLDS_RELOAD_SECONDS)
@@ -0,0 +1,145 @@
+# services/write_buffer.py
+import asyncio
+import random
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+def _retryable(error: Exception) -> bool:
+    """Los 4xx (salvo 429) son datos inválidos: reintentar no los arregla."""
+    status = getattr(error, "status", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status != 429)
+
+class WriteBuffer:
+    """
+    Buffer acotado de líneas de line protocol que agrupa muchas escrituras pequeñas en pocas grandes.
+
+    `offer()` añade líneas sin esperar a InfluxDB, o devuelve False si no caben
+    (quien llama responde 429). Un único escritor en segundo plano vacía el buffer
+    cuando acumula `flush_lines` líneas o cada `flush_interval` segundos, en
+    escrituras de como mucho `flush_lines` líneas. Los fallos transitorios se
+    reintentan con backoff exponencial; mientras tanto el lote sigue contando
+    contra el límite, de modo que la presión llega a los clientes como 429.
+
+    `offer(lines, on_written)` llama a `on_written` cuando todas esas líneas han
+    salido del buffer (escritas o descartadas); las posiciones se cuentan en
+    líneas desde el arranque, así que no importa cómo se hayan partido en lotes.
+    """
+
+    def __init__(
+        self, write: Callable[[List[str]], Awaitable[Any]], max_lines: int, flush_lines: int,
+        flush_interval: float, max_retries: int, retry_base_seconds: float, retry_max_seconds: float
+    ):
+        self._write = write
+        self.max_lines = max_lines
+        self.flush_lines = max(1, min(flush_lines, max_lines))
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._lines: List[str] = []
+        self._in_flight = 0
+        self._finished = 0 # Líneas que ya han salido del buffer (escritas o descartadas)
+        self._callbacks: Deque[Tuple[int, Callable[[], None]]] = deque() # (posición final, callback)
+        self._wakeup: Optional[asyncio.Event] = None # Se crea en start(), dentro del event loop
+        self._task: Optional[asyncio.Task] = None
+        self.accepted_lines = 0
+        self.rejected_batches = 0
+        self.rejected_lines = 0
+        self.writes = 0
+        self.written_lines = 0
+        self.retries = 0
+        self.dropped_lines = 0
+
+    def offer(self, lines: List[str], on_written: Optional[Callable[[], None]] = None) -> bool:
+        """Encola todas las líneas o ninguna; False si el buffer no tiene sitio."""
+        pending = len(self._lines) + self._in_flight
+        if pending + len(lines) > self.max_lines:
+            self.rejected_batches += 1
+            self.rejected_lines += len(lines)
+            return False
+        if on_written is not None:
+            self._callbacks.append((self._finished + pending + len(lines), on_written))
+        self._lines.extend(lines)
+        self.accepted_lines += len(lines)
+        if len(self._lines) >= self.flush_lines and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._loop(self._wakeup))
+
+    async def stop(self) -> None:
+        """Detiene el escritor y vacía lo pendiente con un único intento por lote."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._lines:
+            await self._flush_batch(max_retries=0)
+
+    async def _loop(self, wakeup: asyncio.Event) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            while self._lines:
+                await self._flush_batch(self.max_retries)
+
+    async def _flush_batch(self, max_retries: int) -> None:
+        batch = self._lines[:self.flush_lines]
+        del self._lines[:self.flush_lines]
+        self._in_flight = len(batch)
+        try:
+            for attempt in range(max_retries + 1):
+                try:
+                    await self._write(batch)
+                    self.writes += 1
+                    self.written_lines += len(batch)
+                    self._finish(len(batch))
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if attempt == max_retries or not _retryable(e):
+                        self.dropped_lines += len(batch)
+                        print(f"ERROR: Dropping {len(batch)} buffered lines after {attempt + 1} write attempts: {e}")
+                        self._finish(len(batch))
+                        return
+                    self.retries += 1
+                    # Backoff exponencial con jitter para no sincronizar reintentos
+                    delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt) * random.uniform(0.5, 1.0)
+                    print(f"WARN: Write of {len(batch)} lines failed ({e}); retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # Parada durante la escritura o el backoff: el lote vuelve a la cabeza del buffer
+            self._lines[:0] = batch
+            raise
+        finally:
+            self._in_flight = 0
+
+    def _finish(self, lines: int) -> None:
+        self._finished += lines
+        while self._callbacks and self._callbacks[0][0] <= self._finished:
+            _, callback = self._callbacks.popleft()
+            try:
+                callback()
+            except Exception as e:
+                print(f"ERROR: Write buffer callback failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "buffered_lines": len(self._lines) + self._in_flight,
+            "max_lines": self.max_lines,
+            "accepted_lines": self.accepted_lines,
+            "rejected_batches": self.rejected_batches,
+            "rejected_lines": self.rejected_lines,
+            "writes": self.writes,
+            "written_lines": self.written_lines,
+            "retries": self.retries,
+            "dropped_lines": self.dropped_lines,
+        }
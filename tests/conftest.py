@@ -0,0 +1,9 @@
+# tests/conftest.py
+import os
+
+# core.config exige la conexión a InfluxDB; los tests no abren ninguna
+for name, value in (
+    ("INFLUXDB_URL", "http://127.0.0.1:8086"), ("INFLUXDB_TOKEN", "test"),
+    ("INFLUXDB_ORG", "test"), ("INFLUXDB_BUCKET", "test"),
+):
+    os.environ.setdefault(name, value)
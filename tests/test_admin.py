@@ -0,0 +1,33 @@
+# tests/test_admin.py
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from bitergy_api.routers import admin
+from bitergy_api.services.gateway_keys import hash_key
+
+KEY = "admin-secret"
+URL = "/admin/thresholds/reload"
+
+class FakeStore:
+    path = None # Sin THRESHOLDS_FILE: el handler responde 400 sin tocar nada
+
+@pytest.fixture
+def client(monkeypatch):
+    store = FakeStore()
+    monkeypatch.setattr(admin, "get_threshold_store", lambda: store)
+    app = FastAPI()
+    app.include_router(admin.router)
+    return TestClient(app)
+
+def test_admin_routes_require_the_configured_key(client, monkeypatch):
+    monkeypatch.setattr(admin.get_settings(), "ADMIN_KEY_SHA256", hash_key(KEY))
+    assert client.post(URL).status_code == 401
+    assert client.post(URL, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/admin/cache", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    # Con la clave buena se llega al handler (400: no hay THRESHOLDS_FILE)
+    assert client.post(URL, headers={"Authorization": f"Bearer {KEY}"}).status_code == 400
+
+def test_admin_routes_are_closed_without_a_configured_key(client, monkeypatch):
+    monkeypatch.setattr(admin.get_settings(), "ADMIN_KEY_SHA256", None)
+    assert client.post(URL, headers={"Authorization": f"Bearer {KEY}"}).status_code == 401
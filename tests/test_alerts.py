@@ -0,0 +1,105 @@
+# tests/test_alerts.py
+from bitergy_api.core.enums import SeverityLevel
+from bitergy_api.services.alerts import AlertEngine
+from bitergy_api.services.thresholds import ThresholdIndex
+
+SECOND = 1_000_000
+INDEX = ThresholdIndex({
+    "installations": {
+        "site-1": {"thresholds": {"voltage": {"critical_low": 200, "low": 210, "high": 240, "critical_high": 250}}},
+    },
+}, "test")
+
+def _engine(hysteresis_percent=2.0, min_duration_seconds=30.0, feed_size=100) -> AlertEngine:
+    return AlertEngine(10, 200, 1, hysteresis_percent, min_duration_seconds, feed_size, 300, 3600)
+
+def _feed(engine, samples):
+    """Aplica muestras (segundos, valor) de voltage.Voltage de site-1, como si llegaran en pasadas sucesivas."""
+    for seconds, value in samples:
+        engine._apply([("site-1", "voltage", "Voltage", seconds * SECOND, value)], INDEX)
+
+def _state(engine):
+    return engine._states["site-1"]["voltage.Voltage"]
+
+def _moves(engine):
+    return [(t["from_severity"], t["to_severity"], t["time"]) for t in engine.transitions_after(0, 1000)["transitions"]]
+
+def test_first_level_is_committed_without_waiting():
+    engine = _engine()
+    _feed(engine, [(0, 245.0)])
+    assert _state(engine).level == SeverityLevel.HIGH
+    assert _moves(engine) == [("Unknown", "High", "1970-01-01T00:00:00Z")]
+    assert engine.active_alerts()["alerts"][0]["severity"] == "High"
+
+def test_starting_normal_is_not_a_transition():
+    engine = _engine()
+    _feed(engine, [(0, 230.0)])
+    assert _state(engine).level == SeverityLevel.NORMAL
+    assert _moves(engine) == []
+    assert engine.active_alerts()["alerts"] == []
+
+def test_new_level_needs_min_duration_in_sample_time():
+    engine = _engine()
+    _feed(engine, [(0, 230.0), (10, 245.0), (39, 246.0)])
+    assert _state(engine).level == SeverityLevel.NORMAL
+    assert _state(engine).pending == SeverityLevel.HIGH
+    _feed(engine, [(40, 246.0)])
+    assert _state(engine).level == SeverityLevel.HIGH
+    # La transición se fecha al inicio de la excursión, no al confirmarse
+    assert _moves(engine) == [("Normal", "High", "1970-01-01T00:00:10Z")]
+
+def test_returning_to_current_level_cancels_pending():
+    engine = _engine()
+    _feed(engine, [(0, 230.0), (10, 245.0), (20, 230.0), (25, 245.0), (50, 245.0)])
+    assert _state(engine).level == SeverityLevel.NORMAL
+    assert _state(engine).pending_us == 25 * SECOND
+    _feed(engine, [(55, 245.0)])
+    assert _moves(engine) == [("Normal", "High", "1970-01-01T00:00:25Z")]
+
+def test_escalation_on_same_side_keeps_excursion_start():
+    engine = _engine()
+    _feed(engine, [(0, 230.0), (10, 245.0), (20, 255.0), (40, 255.0)])
+    assert _moves(engine) == [("Normal", "Critical High", "1970-01-01T00:00:10Z")]
+
+def test_hysteresis_delays_return_towards_normal():
+    engine = _engine()
+    _feed(engine, [(0, 245.0)])
+    # 239 es Normal, pero 239 * 1.02 sigue por encima de 240: no hay cambio pendiente
+    _feed(engine, [(10, 239.0), (100, 239.0)])
+    assert _state(engine).level == SeverityLevel.HIGH
+    assert _state(engine).pending is None
+    # 234 * 1.02 = 238.68 ya está por debajo del borde
+    _feed(engine, [(110, 234.0), (140, 234.0)])
+    assert _state(engine).level == SeverityLevel.NORMAL
+    assert _moves(engine)[-1] == ("High", "Normal", "1970-01-01T00:01:50Z")
+    assert engine.active_alerts()["alerts"] == []
+
+def test_repeated_sample_is_not_reevaluated():
+    engine = _engine()
+    _feed(engine, [(0, 245.0), (0, 245.0), (0, 245.0)])
+    assert engine.evaluations == 1
+
+def test_transitions_after_once_feed_has_wrapped():
+    engine = _engine(hysteresis_percent=0, min_duration_seconds=0, feed_size=3)
+    # Cada muestra cambia de nivel: 5 transiciones, el feed conserva las seq 3..5
+    _feed(engine, [(i, value) for i, value in enumerate((245.0, 230.0, 205.0, 255.0, 195.0))])
+    assert engine.transitions == 5
+
+    def seqs(after, limit=10):
+        page = engine.transitions_after(after, limit)
+        return [t["seq"] for t in page["transitions"]], page["last_seq"]
+
+    # Un cliente que se quedó atrás recibe lo que queda, sin huecos inventados
+    assert seqs(0) == ([3, 4, 5], 5)
+    assert seqs(1) == ([3, 4, 5], 5)
+    assert seqs(3) == ([4, 5], 5)
+    assert seqs(3, limit=1) == ([4], 4)
+    assert seqs(4, limit=1) == ([5], 5)
+    assert seqs(5) == ([], 5)
+    # Un `after` mayor que la última seq significa que el motor se reinició
+    assert seqs(99) == ([3, 4, 5], 5)
+    _feed(engine, [(5, 230.0)])
+    # La seq 3 ya salió del feed: el desplazamiento se calcula desde la primera que queda
+    assert seqs(5) == ([6], 6)
+    assert seqs(0) == ([4, 5, 6], 6)
+    assert seqs(4) == ([5, 6], 6)
@@ -0,0 +1,87 @@
+# tests/test_cache.py
+import asyncio
+
+import pytest
+
+from bitergy_api.services import cache as cache_module
+from bitergy_api.services.cache import TTLCache
+
+def test_concurrent_misses_share_one_load():
+    async def scenario():
+        cache, calls = TTLCache(60, 10), []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(5)))
+        assert results == ["value"] * 5
+        assert await cache.get_or_load("k", loader) == "value"
+        return cache, calls
+
+    cache, calls = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, 4, 1)
+
+def test_cancelled_waiter_does_not_cancel_shared_load():
+    async def scenario():
+        cache, release = TTLCache(60, 10), asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            return 42
+
+        first = asyncio.ensure_future(cache.get_or_load("k", loader))
+        second = asyncio.ensure_future(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == 42
+        assert first.cancelled()
+        assert await cache.get_or_load("k", loader) == 42
+        assert cache.hits == 1
+
+    asyncio.run(scenario())
+
+def test_failures_are_not_cached():
+    async def scenario():
+        cache, calls = TTLCache(60, 10), []
+
+        async def loader():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            return "ok"
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load("k", loader)
+        assert await cache.get_or_load("k", loader) == "ok"
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+def test_entries_expire_and_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+
+    async def scenario():
+        cache = TTLCache(5, 2)
+
+        def loader(value):
+            async def load():
+                return value
+            return load
+
+        await cache.get_or_load("a", loader(1))
+        now[0] += 4
+        assert await cache.get_or_load("a", loader(2)) == 1
+        now[0] += 2
+        assert await cache.get_or_load("a", loader(3)) == 3
+        await cache.get_or_load("b", loader(4))
+        await cache.get_or_load("c", loader(5))
+        assert cache.evictions == 1
+        assert await cache.get_or_load("a", loader(6)) == 6
+
+    asyncio.run(scenario())
@@ -0,0 +1,22 @@
+# tests/test_compression.py
+import pytest
+
+from bitergy_api.core.compression import accepts_gzip
+
+@pytest.mark.parametrize("header, expected", [
+    ("", False),
+    ("gzip", True),
+    ("br, GZIP", True),
+    ("deflate, br", False),
+    ("gzip;q=0", False),
+    ("gzip; q=0.001", True),
+    ("gzip;q=bad", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("*;q=0, gzip", True),
+    ("gzip;q=0, *", False),
+    ("*;q=0.5, gzip;q=0", False),
+    ("br, *;q=0.1", True),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
@@ -0,0 +1,57 @@
+# tests/test_downsampling.py
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from bitergy_api.services.downsampling import choose_aggregate_window, lttb_indices, parse_duration
+
+def _series(n, seed=1):
+    rng = random.Random(seed)
+    return list(range(n)), [math.sin(i / 15) + rng.uniform(-0.1, 0.1) for i in range(n)]
+
+@pytest.mark.parametrize("threshold", [0, 2, 100, 500])
+def test_lttb_keeps_short_series_whole(threshold):
+    xs, ys = _series(100)
+    assert lttb_indices(xs, ys, threshold) == list(range(100))
+
+@pytest.mark.parametrize("n, threshold", [(10, 3), (1000, 50), (1001, 97), (5000, 999)])
+def test_lttb_returns_threshold_sorted_indices_with_endpoints(n, threshold):
+    xs, ys = _series(n)
+    indices = lttb_indices(xs, ys, threshold)
+    assert len(indices) == threshold
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert all(a < b for a, b in zip(indices, indices[1:]))
+
+def test_lttb_picks_one_point_per_bucket():
+    n, threshold = 1000, 52
+    xs, ys = _series(n)
+    bucket_size = (n - 2) / (threshold - 2)
+    for bucket, index in enumerate(lttb_indices(xs, ys, threshold)[1:-1]):
+        assert int(bucket * bucket_size) + 1 <= index < int((bucket + 1) * bucket_size) + 1
+
+def test_lttb_preserves_isolated_spike():
+    xs = list(range(1000))
+    ys = [0.0] * 1000
+    ys[437] = 50.0
+    assert 437 in lttb_indices(xs, ys, 20)
+
+def test_parse_duration():
+    assert parse_duration("90s") == timedelta(seconds=90)
+    assert parse_duration(" 2w ") == timedelta(weeks=2)
+    assert parse_duration("5218w") == timedelta(weeks=5218)
+    # Más allá de MAX_DURATION: ValueError (400), no OverflowError de timedelta (500)
+    for text in ("0m", "1.5h", "5y", "", "5230w", "99999999999999w", "9" * 40 + "s"):
+        with pytest.raises(ValueError):
+            parse_duration(text)
+
+def test_choose_aggregate_window():
+    start = datetime(2024, 1, 1)
+    day = start + timedelta(days=1)
+    assert choose_aggregate_window(start, day) is None
+    assert choose_aggregate_window(start, day, resolution=timedelta(minutes=7)) == timedelta(minutes=7)
+    # 86400 s / 1000 puntos = 86.4 s -> la siguiente ventana redonda es 2 min
+    assert choose_aggregate_window(start, day, max_points=1000) == timedelta(minutes=2)
+    assert choose_aggregate_window(start, day, max_points=100_000) is None
+    assert choose_aggregate_window(start, start + timedelta(days=3650), max_points=10) == timedelta(days=365)
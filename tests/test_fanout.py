@@ -0,0 +1,131 @@
+# tests/test_fanout.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bitergy_api.services import data_provider
+from bitergy_api.services.fanout import gather_bounded, split_range
+
+SECOND = 1_000_000
+DAY = 86400 * SECOND
+START = datetime(2024, 1, 1, 0, 0, 7, tzinfo=timezone.utc)
+
+def test_split_range_aligns_cuts_to_step():
+    chunks = split_range(5, 10_005, 10, 100, 8)
+    assert chunks[0][0] == 5 and chunks[-1][1] == 10_005
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    assert all(end % 10 == 0 for _, end in chunks[:-1])
+    assert len(chunks) == 8
+
+def test_split_range_sizes_by_points_read_and_aligns_to_window():
+    # Tres semanas de crudo cada 10 s agregadas por horas: pocas ventanas, pero muchas filas leídas
+    start_us = 1_704_067_207 * SECOND
+    chunks = split_range(start_us, start_us + 21 * DAY, 10 * SECOND, 25_000, 32, align_us=3600 * SECOND)
+    assert len(chunks) == 8
+    assert all(end % (3600 * SECOND) == 0 for _, end in chunks[:-1])
+
+def test_split_range_small_range_is_single_chunk():
+    assert split_range(0, 1000, 10, 100, 8) == [(0, 1000)]
+    assert split_range(0, 1000, 10, 100, 1) == [(0, 1000)]
+
+def test_gather_bounded_keeps_order_and_limit():
+    running, peak = [0], [0]
+
+    def call(i):
+        async def run():
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.001 * (10 - i))
+            running[0] -= 1
+            return i
+        return run
+
+    assert asyncio.run(gather_bounded([call(i) for i in range(10)], 3)) == list(range(10))
+    assert peak[0] == 3
+
+def test_gather_bounded_cancels_rest_on_failure():
+    cancelled = []
+
+    def slow(i):
+        async def run():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(i)
+                raise
+        return run
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        asyncio.run(gather_bounded([slow(0), fail, slow(2), slow(3)], 3))
+    # slow(3) puede haber ocupado el hueco que dejó el fallo: también se cancela
+    assert sorted(cancelled) in ([0, 2], [0, 2, 3])
+
+def test_gather_bounded_cancelled_by_caller():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def scenario():
+        task = asyncio.ensure_future(gather_bounded([slow, slow], 2))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert cancelled == [1, 1]
+
+def test_long_aggregated_range_is_queried_in_chunks(monkeypatch):
+    queried = []
+
+    async def fake_source(installation_id, start, end, measurements, variable_name_fn, kind, window, fn, rollup_bucket=None, limit=None):
+        queried.append((start, end))
+        return {"v": ("V", [data_provider._to_epoch_us(end)], [1.0])}
+
+    monkeypatch.setattr(data_provider, "_query_source_columns", fake_source)
+    columns = asyncio.run(data_provider._query_historical_columns(
+        "site-1", START, START + timedelta(weeks=3), ["voltage"], None, "electrical", timedelta(hours=1), "mean"
+    ))
+    assert len(queried) == 8
+    assert queried[0][0] == START and queried[-1][1] == START + timedelta(weeks=3)
+    assert all(a[1] == b[0] for a, b in zip(queried, queried[1:]))
+    assert columns["v"][1] == sorted(columns["v"][1]) and len(columns["v"][1]) == 8
+
+def test_paginated_read_is_split_and_matches_single_query(monkeypatch):
+    start_us = data_provider._to_epoch_us(START)
+    series = {
+        "dense": list(range(start_us, start_us + 10 * DAY, 10 * SECOND)),
+        # Empieza después del tramo en el que se esperaba la página: lo recoge el último tramo
+        "sparse": list(range(start_us + 9 * DAY, start_us + 10 * DAY, 3600 * SECOND)),
+    }
+    queried = []
+
+    async def fake_source(installation_id, start, end, measurements, variable_name_fn, kind, window, fn, rollup_bucket=None, limit=None):
+        start_us, end_us = data_provider._to_epoch_us(start), data_provider._to_epoch_us(end)
+        queried.append((start_us, end_us))
+        columns = {}
+        for name, timestamps in series.items():
+            kept = [t for t in timestamps if start_us <= t < end_us][:limit]
+            if kept:
+                columns[name] = ("V", kept, [float(t) for t in kept])
+        return columns
+
+    monkeypatch.setattr(data_provider, "_query_source_columns", fake_source)
+    expected = asyncio.run(fake_source("site-1", START, START + timedelta(days=10), None, None, None, None, None, limit=60_000))
+    queried.clear()
+    page = asyncio.run(data_provider._query_page_columns(
+        "site-1", start_us, start_us + 10 * DAY, ["voltage"], None, "electrical", None, "mean", 60_000
+    ))
+    assert len(queried) == 4
+    assert page == expected
+    assert len(page["dense"][1]) == 60_000 and len(page["sparse"][1]) == 24
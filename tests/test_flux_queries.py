@@ -0,0 +1,68 @@
+# tests/test_flux_queries.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bitergy_api.core.enums import StatsAggregate, StatsWindow
+from bitergy_api.services.flux_queries import (
+    AGGREGATE_FUNCTIONS,
+    historical_query,
+    installations_query,
+    latest_query,
+    measurement_filter,
+    rollup_coverage_query,
+    rollup_query,
+    stats_query,
+)
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+END = datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+# Valores que, pegados en el texto, cerrarían el literal o añadirían etapas a la consulta
+HOSTILE_INSTALLATION = 'site") |> drop(columns: ["_value"]) |> yield(name: "evil_installation") //'
+HOSTILE_INSTALLATION_2 = 'site-${r._value}\n|> yield(name: "evil_interpolation")'
+HOSTILE_BUCKET = 'rollups")\nfrom(bucket: "evil_bucket'
+HOSTILE_VALUES = (HOSTILE_INSTALLATION, HOSTILE_INSTALLATION_2, HOSTILE_BUCKET)
+
+def _queries():
+    yield latest_query([HOSTILE_INSTALLATION], ["voltage"])
+    yield latest_query([HOSTILE_INSTALLATION, HOSTILE_INSTALLATION_2], ["voltage", "temperature"])
+    for fn in sorted(AGGREGATE_FUNCTIONS):
+        for window in (None, timedelta(minutes=5)):
+            for pivot in (False, True):
+                for limit in (None, 10):
+                    yield historical_query(
+                        HOSTILE_INSTALLATION, START, END, ["voltage", "energy"], window, fn, pivot, None, limit
+                    )
+                    yield historical_query(
+                        HOSTILE_INSTALLATION_2, START, END, ["voltage", "energy"], window, fn, pivot, HOSTILE_BUCKET, limit
+                    )
+    yield stats_query(HOSTILE_INSTALLATION, START, END, ["voltage", "energy"], StatsWindow.WEEK, list(StatsAggregate))
+    for from_rollup in (False, True):
+        yield rollup_query(HOSTILE_INSTALLATION, HOSTILE_BUCKET, START, END, timedelta(hours=1), ["voltage"], from_rollup)
+    yield rollup_coverage_query(HOSTILE_BUCKET, HOSTILE_INSTALLATION)
+    yield installations_query(timedelta(days=7))
+
+def test_user_values_only_travel_as_params():
+    for flux_query, _ in _queries():
+        for hostile in HOSTILE_VALUES:
+            assert hostile not in flux_query
+        assert "evil" not in flux_query
+        assert "${" not in flux_query
+
+def test_hostile_values_reach_the_params():
+    _, params = historical_query(HOSTILE_INSTALLATION, START, END, ["voltage"], rollup_bucket=HOSTILE_BUCKET, window=timedelta(hours=1))
+    assert params["_installation_id"] == HOSTILE_INSTALLATION
+    assert params["_bucket"] == HOSTILE_BUCKET
+    _, params = latest_query([HOSTILE_INSTALLATION, HOSTILE_INSTALLATION_2], ["voltage"])
+    assert params["_installation_ids"] == [HOSTILE_INSTALLATION, HOSTILE_INSTALLATION_2]
+
+@pytest.mark.parametrize("measurement", ['voltage" or true or r["x"] == "', "a b", "volt${x}", "", "voltage\n"])
+def test_measurement_names_must_be_identifiers(measurement):
+    with pytest.raises(ValueError):
+        measurement_filter(["voltage", measurement])
+
+@pytest.mark.parametrize("fn", ["mean)\n |> yield(name: \"evil\")\n x=(1", "lttb", "quantile"])
+def test_historical_query_rejects_unknown_functions(fn):
+    with pytest.raises(ValueError):
+        historical_query("site", START, END, ["voltage"], timedelta(minutes=5), fn)
@@ -0,0 +1,103 @@
+# tests/test_historical_cache.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from bitergy_api.services import data_provider
+from bitergy_api.services.historical_cache import SegmentCache, contiguous_runs, split_by_segment
+
+HOUR = 3600 * 1_000_000
+
+def test_contiguous_runs():
+    assert contiguous_runs([]) == []
+    assert contiguous_runs([1, 2, 3, 7, 9, 10]) == [(1, 3), (7, 7), (9, 10)]
+
+def test_split_by_segment_puts_window_stop_in_previous_segment():
+    columns = {"v": ("V", [0, 10, 20, 30], [1.0, 2.0, 3.0, 4.0])}
+    assert split_by_segment(columns, 10, aggregated=False) == {
+        0: {"v": ("V", [0], [1.0])}, 1: {"v": ("V", [10], [2.0])},
+        2: {"v": ("V", [20], [3.0])}, 3: {"v": ("V", [30], [4.0])},
+    }
+    assert split_by_segment(columns, 10, aggregated=True) == {
+        -1: {"v": ("V", [0], [1.0])}, 0: {"v": ("V", [10], [2.0])},
+        1: {"v": ("V", [20], [3.0])}, 2: {"v": ("V", [30], [4.0])},
+    }
+
+def test_discard_blocks_puts_from_loads_started_before_it():
+    cache = SegmentCache(1 << 20)
+    generation = cache.generation
+    cache.put("a", {})
+    assert cache.discard(lambda key: key == "a") == 1
+    cache.put("a", {"v": ("V", [1], [1.0])}, generation)
+    assert cache.get("a") is None
+    cache.put("a", {"v": ("V", [1], [1.0])}, cache.generation)
+    assert cache.get("a") is not None
+
+def test_concurrent_requests_share_segment_loads(monkeypatch):
+    """Dos peticiones que solapan piden cada segmento que falta una sola vez."""
+    queried = []
+
+    async def fake_query(installation_id, start, end, measurements, variable_name_fn, kind, window, fn):
+        queried.append((start, end))
+        await asyncio.sleep(0.01)
+        start_us, end_us = data_provider._to_epoch_us(start), data_provider._to_epoch_us(end)
+        timestamps = list(range(start_us, end_us, HOUR // 4))
+        return {"v": ("V", timestamps, [float(t) for t in timestamps])}
+
+    monkeypatch.setattr(data_provider, "_query_historical_columns", fake_query)
+    cache = SegmentCache(1 << 24)
+    monkeypatch.setattr(data_provider, "get_historical_cache", lambda: cache)
+    monkeypatch.setattr(data_provider.get_settings(), "HISTORICAL_CACHE_ENABLED", True)
+    monkeypatch.setattr(data_provider.get_settings(), "HISTORICAL_CACHE_SEGMENT_SECONDS", 3600)
+    monkeypatch.setattr(data_provider.get_settings(), "HISTORICAL_CACHE_MAX_SEGMENTS", 100)
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def fetch(start_hour, end_hour):
+        return data_provider._fetch_historical_columns(
+            "site-1", base + timedelta(hours=start_hour), base + timedelta(hours=end_hour),
+            ["voltage"], None, "electrical", None, "mean"
+        )
+
+    async def scenario():
+        return await asyncio.gather(fetch(0, 6), fetch(2, 8), fetch(0, 6))
+
+    first, second, third = asyncio.run(scenario())
+    # Horas 0-5 en una consulta; 6-7 en otra: nada se pide dos veces
+    assert sorted((s.hour, e.hour) for s, e in queried) == [(0, 6), (6, 8)]
+    assert first == third
+    assert len(first["v"][1]) == 24 and len(second["v"][1]) == 24
+    assert second["v"][1][0] == data_provider._to_epoch_us(base + timedelta(hours=2))
+    stats = cache.stats()
+    assert stats["inflight"] == 0 and stats["segments"] == 8 and stats["coalesced"] == 10
+
+def test_cancelled_request_does_not_cancel_shared_load(monkeypatch):
+    release = None
+
+    async def fake_query(installation_id, start, end, measurements, variable_name_fn, kind, window, fn):
+        await release.wait()
+        return {"v": ("V", [data_provider._to_epoch_us(start)], [1.0])}
+
+    monkeypatch.setattr(data_provider, "_query_historical_columns", fake_query)
+    cache = SegmentCache(1 << 24)
+    monkeypatch.setattr(data_provider, "get_historical_cache", lambda: cache)
+    monkeypatch.setattr(data_provider.get_settings(), "HISTORICAL_CACHE_ENABLED", True)
+    monkeypatch.setattr(data_provider.get_settings(), "HISTORICAL_CACHE_SEGMENT_SECONDS", 3600)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def fetch():
+        return data_provider._fetch_historical_columns(
+            "site-1", start, start + timedelta(hours=1), ["voltage"], None, "electrical", None, "mean"
+        )
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        owner = asyncio.ensure_future(fetch())
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(fetch())
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await waiter
+
+    assert asyncio.run(scenario())["v"][2] == [1.0]
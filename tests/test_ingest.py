@@ -0,0 +1,98 @@
+# tests/test_ingest.py
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from bitergy_api.routers import ingest
+from bitergy_api.services import gateway_keys as gateway_keys_module
+from bitergy_api.services.gateway_keys import GatewayKeyStore, hash_key
+
+URL = "/installations/site-1/measurements"
+KEY = "gateway-secret"
+AUTH = {"Authorization": f"Bearer {KEY}"}
+
+def _write_keys(path, key):
+    path.write_text(json.dumps({"gateways": {"gw": {"key_sha256": hash_key(key), "installations": ["site-1"]}}}))
+
+class FakeBuffer:
+    def __init__(self):
+        self.lines = []
+
+    def offer(self, lines, on_written=None):
+        self.lines.extend(lines)
+        return True
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    keys_file = tmp_path / "keys.json"
+    _write_keys(keys_file, KEY)
+    store, buffer = GatewayKeyStore(str(keys_file)), FakeBuffer()
+    monkeypatch.setattr(ingest, "get_gateway_keys", lambda: store)
+    monkeypatch.setattr(ingest, "get_ingest_buffer", lambda: buffer)
+    app = FastAPI()
+    app.include_router(ingest.router)
+    return TestClient(app)
+
+def _body(samples=1, offset=timedelta(0)):
+    timestamp = (datetime.now(timezone.utc) + offset).isoformat()
+    return {"physical": [{"timestamp": timestamp, "temperature": 21.5} for _ in range(samples)]}
+
+def test_accepts_batch_from_allowed_gateway(client):
+    response = client.post(URL, json=_body(2), headers=AUTH)
+    assert response.status_code == 202
+    assert response.json() == {"samples": 2, "points": 2}
+
+def test_body_is_not_parsed_before_authentication(client):
+    # Un cuerpo inválido sin clave es 401, no 422: nunca se ha llegado a leer
+    assert client.post(URL, content=b"{not json").status_code == 401
+    assert client.post(URL, content=b"{not json", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.post(URL, content=b"{not json", headers=AUTH)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"][0] == "body"
+
+def test_oversized_body_is_rejected_before_reading(client, monkeypatch):
+    monkeypatch.setattr(ingest.get_settings(), "INGEST_MAX_BODY_BYTES", 64)
+    body = json.dumps(_body(5)).encode("utf-8")
+    assert client.post(URL, content=body, headers={**AUTH, "Content-Type": "application/json"}).status_code == 413
+    # Sin Content-Length (chunked) se corta mientras se lee
+    assert client.post(URL, content=iter([body[:40], body[40:]]), headers=AUTH).status_code == 413
+
+def test_too_many_samples_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(ingest.get_settings(), "INGEST_MAX_BATCH_SAMPLES", 3)
+    response = client.post(URL, json=_body(4), headers=AUTH)
+    assert response.status_code == 413
+
+def test_samples_outside_the_accepted_time_range_are_rejected(client, monkeypatch):
+    monkeypatch.setattr(ingest.get_settings(), "INGEST_MAX_FUTURE_SKEW_SECONDS", 60)
+    assert client.post(URL, json=_body(offset=timedelta(seconds=30)), headers=AUTH).status_code == 202
+    assert client.post(URL, json=_body(offset=timedelta(minutes=10)), headers=AUTH).status_code == 422
+    too_old = timedelta(seconds=-ingest.get_settings().INGEST_MAX_BACKFILL_SECONDS - 60)
+    assert client.post(URL, json=_body(offset=too_old), headers=AUTH).status_code == 422
+
+def test_openapi_documents_the_batch_body(client):
+    operation = client.get("/openapi.json").json()["paths"][URL.replace("site-1", "{installation_id}")]["post"]
+    schema = operation["requestBody"]["content"]["application/json"]["schema"]
+    assert set(schema["properties"]) == {"electrical", "physical"}
+    assert "Active Power (kW)" in schema["properties"]["electrical"]["items"]["properties"]
+    assert "$ref" not in str(schema)
+
+def test_keys_file_is_checked_at_most_once_per_interval(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(gateway_keys_module, "monotonic", lambda: now[0])
+    keys_file = tmp_path / "keys.json"
+    _write_keys(keys_file, "old")
+    store = GatewayKeyStore(str(keys_file), reload_seconds=5.0)
+    assert store.lookup("old") is not None
+
+    _write_keys(keys_file, "new")
+    stat = keys_file.stat()
+    os.utime(keys_file, (stat.st_atime, stat.st_mtime + 10)) # mtime distinto aunque el fs tenga poca resolución
+    now[0] += 1
+    assert store.lookup("new") is None # Aún dentro del intervalo: no se mira el fichero
+    now[0] += 5
+    assert store.lookup("new") is not None
+    assert store.lookup("old") is None
@@ -0,0 +1,56 @@
+# tests/test_line_protocol.py
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from bitergy_api.models.ingest import MeasurementBatch
+from bitergy_api.services.ingest import encode_batch
+from bitergy_api.services.line_protocol import encode_line, escape_key, format_field_value, line_prefix
+
+def test_escapes_separators_in_tags_and_fields():
+    assert escape_key("a b,c=d") == r"a\ b\,c\=d"
+    assert line_prefix("my measure,x", {"z": "1", "a": "x y"}) == r"my\ measure\,x,a=x\ y,z=1"
+    assert encode_line("m", {"t": "v"}, [("f 1", 1.5), ("n", 2), ("ok", True), ("s", 'a"b\\')], 10) == \
+        r'm,t=v f\ 1=1.5,n=2i,ok=true,s="a\"b\\" 10'
+
+def test_field_values():
+    assert format_field_value(False) == "false"
+    assert format_field_value(3) == "3i"
+    assert format_field_value(0.1) == "0.1"
+
+@pytest.mark.parametrize("text", ["", "a\nevil,x=1 f=1 1", "a\rb", "tab\there", "trailing\\", "nul\x00"])
+def test_unrepresentable_keys_are_rejected(text):
+    with pytest.raises(ValueError):
+        escape_key(text)
+    with pytest.raises(ValueError):
+        line_prefix("temperature", {"installation_id": text})
+
+def _batch(**physical):
+    return MeasurementBatch.model_validate({
+        "electrical": [{
+            "timestamp": "2024-01-01T00:00:00Z",
+            "voltage": {"Phase A": 230.5, "Phase C": 231.0},
+            "Total Active Power (kW)": 4.0,
+            "frequency": 50.0,
+        }],
+        "physical": [dict({"timestamp": datetime(2024, 1, 1, 0, 0, 1, tzinfo=timezone.utc), "temperature": 21.5}, **physical)],
+    })
+
+def test_encode_batch():
+    lines = encode_batch("site 1", _batch(sensor_location="Sala de máquinas"))
+    assert lines == [
+        r"voltage,installation_id=site\ 1 phase_a=230.5,phase_c=231.0 1704067200000000000",
+        r"active_power,installation_id=site\ 1 total=4.0 1704067200000000000",
+        r"frequency,installation_id=site\ 1 value=50.0 1704067200000000000",
+        r"temperature,installation_id=site\ 1,location=Sala\ de\ máquinas value=21.5 1704067201000000000",
+    ]
+
+@pytest.mark.parametrize("location", ["a\nevil,x=1 f=1 1", "room\\", "a,b=c", " leading", ""])
+def test_sensor_location_must_be_a_plain_tag(location):
+    with pytest.raises(ValidationError):
+        _batch(sensor_location=location)
+
+def test_encode_batch_rejects_injected_installation_id():
+    with pytest.raises(ValueError):
+        encode_batch("site\ntemperature,installation_id=other value=1 1", _batch())
@@ -0,0 +1,156 @@
+# tests/test_pagination.py
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bitergy_api.core.config import get_settings
+from bitergy_api.core.enums import AggregateFunction
+from bitergy_api.services import data_provider
+from bitergy_api.services.pagination import PageCursor, decode_cursor, encode_cursor, next_page
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+END = datetime(2024, 1, 2, tzinfo=timezone.utc)
+START_US = 1_704_067_200_000_000
+END_US = START_US + 86_400_000_000
+
+def _cursor(**changes) -> PageCursor:
+    cursor = PageCursor("electrical", "site-ñ", START_US, END_US, 0, "mean", 3, {})
+    return cursor._replace(**changes)
+
+def _read(series, resume_us, limit):
+    """Como range(start: resume_us) |> limit(n: limit) de Flux, sobre series en memoria."""
+    columns = {}
+    for name, points in series.items():
+        rows = [(t, v) for t, v in points if t >= resume_us][:limit]
+        if rows:
+            columns[name] = ("V", [t for t, _ in rows], [v for _, v in rows])
+    return columns
+
+def test_cursor_round_trip():
+    cursor = _cursor(last_us={"Voltage Phase A": START_US + 10}, pending=("Voltage Phase A",))
+    token = encode_cursor(cursor)
+    assert "=" not in token
+    assert decode_cursor(token) == cursor
+
+@pytest.mark.parametrize("token", ["", "not-base64!", encode_cursor(_cursor())[:-4], "W10"])
+def test_decode_rejects_invalid_tokens(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+def test_decode_rejects_inconsistent_state():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(_cursor(pending=("missing",))))
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(_cursor(limit=0)))
+
+def _unsigned(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+def test_decode_rejects_forged_or_tampered_tokens():
+    token = encode_cursor(_cursor())
+    payload, signature = token.split(".")
+    forged = ["electrical", "site-ñ", START_US, END_US, 0, "mean)\n |> yield(name: \"evil\")\n x=(1", 3, {}, []]
+    for bad in (
+        payload, # Sin firma
+        _unsigned(forged),
+        f"{_unsigned(forged)}.{signature}", # Firma de otro payload
+        f"{payload}.{signature[:-2]}",
+        f"{token}.{signature}",
+    ):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+@pytest.mark.parametrize("changes", [
+    {"fn": "mean)\n |> yield(name: \"evil\")\n x=(1"},
+    {"fn": "lttb"}, # Nunca llega a Flux: se pagina con 'mean'
+    {"window_us": 1},
+    {"window_us": 1_500_000},
+    {"window_us": -1_000_000},
+])
+def test_decode_rejects_values_that_reach_flux(changes):
+    # Aunque estén bien firmados (p.ej. con la clave filtrada)
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(_cursor(**changes)))
+
+def test_decode_accepts_every_aggregate_and_whole_second_windows():
+    for fn in ("mean", "min", "max", "last"):
+        assert decode_cursor(encode_cursor(_cursor(fn=fn))).fn == fn
+    assert decode_cursor(encode_cursor(_cursor(window_us=300_000_000))).window_us == 300_000_000
+
+def test_cursor_limit_is_clamped_to_page_max(monkeypatch):
+    limits = []
+
+    async def page(*args, **kwargs):
+        limits.append(kwargs["limit"])
+        return {}
+
+    monkeypatch.setattr(data_provider, "_query_source_columns", page)
+    cursor = decode_cursor(encode_cursor(_cursor(limit=10 ** 9)))
+    asyncio.run(data_provider._load_historical(
+        "site-ñ", START, END, ["voltage"], None, "electrical",
+        None, None, AggregateFunction.MEAN, cursor=cursor
+    ))
+    assert limits and set(limits) == {get_settings().HISTORICAL_PAGE_MAX_LIMIT}
+
+def test_cursor_matches_only_its_own_query():
+    cursor = _cursor()
+    assert cursor.matches("electrical", "site-ñ", START, END)
+    assert cursor.matches("electrical", "site-ñ", START.replace(tzinfo=None), END.replace(tzinfo=None))
+    assert not cursor.matches("physical", "site-ñ", START, END)
+    assert not cursor.matches("electrical", "other", START, END)
+    assert not cursor.matches("electrical", "site-ñ", START, START)
+
+def test_resume_skips_returned_raw_point_but_not_aggregated_window():
+    assert _cursor().resume_us() == START_US
+    state = {"last_us": {"a": START_US + 50, "b": START_US + 20}, "pending": ("a", "b")}
+    assert _cursor(**state).resume_us() == START_US + 21
+    assert _cursor(window_us=10, **state).resume_us() == START_US + 20
+
+def test_pages_return_every_point_once_and_terminate():
+    # Series de distinta longitud y cadencia: las cortas terminan antes y las largas repiten puntos
+    series = {
+        "a": [(START_US + i * 10, float(i)) for i in range(11)],
+        "b": [(START_US + i * 25, float(-i)) for i in range(4)],
+        "c": [(START_US + 5, 1.0)],
+    }
+    cursor, pages, seen = _cursor(), 0, {name: [] for name in series}
+    while cursor is not None:
+        page, cursor = next_page(_read(series, cursor.resume_us(), cursor.limit), cursor)
+        for name, (_, timestamps, values) in page.items():
+            seen[name].extend(zip(timestamps, values))
+        pages += 1
+        assert pages < 20
+    assert seen == series
+
+def test_last_page_without_full_series_has_no_cursor():
+    page, following = next_page({"a": ("V", [START_US, START_US + 1], [1.0, 2.0])}, _cursor())
+    assert following is None
+    assert page["a"][1] == [START_US, START_US + 1]
+
+def test_long_range_without_limit_is_not_paginated(monkeypatch):
+    """Los clientes que no conocen los cursores reciben el rango entero."""
+    calls = []
+
+    async def full(*args):
+        calls.append("full")
+        return {"a": ("V", [START_US], [1.0])}
+
+    async def page(*args, **kwargs):
+        calls.append(("page", kwargs["limit"]))
+        return {}
+
+    monkeypatch.setattr(data_provider, "_load_historical_columns", full)
+    monkeypatch.setattr(data_provider, "_query_source_columns", page)
+
+    def load(**paging):
+        return asyncio.run(data_provider._load_historical(
+            "site-ñ", START, START + timedelta(days=30), ["voltage"], None, "electrical",
+            None, None, AggregateFunction.MEAN, **paging
+        ))
+
+    assert load() == ({"a": ("V", [START_US], [1.0])}, None)
+    assert load(limit=5) == ({}, None)
+    assert calls == ["full", ("page", 5)]
@@ -0,0 +1,57 @@
+# tests/test_realtime_etag.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from bitergy_api.models.electrical import ElectricalVariableValue, PhaseData, RealtimeElectricalData
+from bitergy_api.routers import electrical
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+URL = "/installations/site-1/electrical/realtime"
+
+def _reading(voltage_time, energy_time, energy=100.0):
+    data = RealtimeElectricalData(
+        asset_id="site-1", timestamp=max(voltage_time, energy_time),
+        voltage=PhaseData(a=ElectricalVariableValue(value=230.0, unit="V")),
+        total_energy_kwh=ElectricalVariableValue(value=energy, unit="kWh"),
+    )
+    data._series_times = {"voltage.phase_a": voltage_time, "energy.total_kwh": energy_time}
+    return data
+
+@pytest.fixture
+def client(monkeypatch):
+    current = {}
+
+    async def fake_realtime(installation_id):
+        return current["data"]
+
+    monkeypatch.setattr(electrical, "get_realtime_electrical_data", fake_realtime)
+    app = FastAPI()
+    app.include_router(electrical.router)
+    client = TestClient(app)
+    client.current = current
+    return client
+
+def test_unchanged_reading_is_not_modified(client):
+    client.current["data"] = _reading(T0 + timedelta(seconds=10), T0)
+    first = client.get(URL)
+    assert first.status_code == 200 and first.headers["etag"].startswith('W/"')
+    again = client.get(URL, headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == first.headers["etag"]
+
+def test_slower_series_update_changes_etag(client):
+    client.current["data"] = _reading(T0 + timedelta(seconds=10), T0)
+    etag = client.get(URL).headers["etag"]
+    # Energía nueva pero aún anterior al último voltaje: timestamp y Last-Modified no cambian
+    client.current["data"] = _reading(T0 + timedelta(seconds=10), T0 + timedelta(seconds=5), energy=101.0)
+    response = client.get(URL, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+def test_if_modified_since_alone_never_returns_304(client):
+    client.current["data"] = _reading(T0 + timedelta(seconds=10), T0)
+    last_modified = client.get(URL).headers["last-modified"]
+    assert client.get(URL, headers={"If-Modified-Since": last_modified}).status_code == 200
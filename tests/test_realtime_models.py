@@ -0,0 +1,68 @@
+# tests/test_realtime_models.py
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from bitergy_api.core.config import get_settings
+from bitergy_api.models.electrical import ElectricalVariableValue, PhaseData, RealtimeElectricalData
+from bitergy_api.models.physical import PhysicalVariableValue, RealtimePhysicalData
+from bitergy_api.routers import electrical, physical
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+# Salida por defecto de la API: los modelos se construyen por nombre de campo y los
+# campos con alias salen siempre null. Cambiarlo es un cambio de contrato aparte
+ELECTRICAL_JSON = (
+    b'{"timestamp":"2024-01-01T00:00:00Z","asset_id":"site-1",'
+    b'"voltage":{"Phase A":null,"Phase B":null,"Phase C":null},"current":null,'
+    b'"Active Power (kW)":null,"Apparent Power (kVA)":null,"Reactive Power (kVAR)":null,"Power Factor":null,'
+    b'"frequency":{"value":50.0,"unit":"Hz","severity":"Unknown"},'
+    b'"Total Active Power (kW)":null,"Total Energy (kWh)":null}'
+)
+PHYSICAL_JSON = (
+    '{"timestamp":"2024-01-01T00:00:00Z","asset_id":"site-1",'
+    '"temperature":{"value":21.5,"unit":"°C","severity":"Unknown","sensor_location":null},'
+    '"humidity":null,"Level":null}'
+).encode("utf-8")
+
+def _electrical():
+    def value(number, unit):
+        return ElectricalVariableValue(value=number, unit=unit)
+
+    return RealtimeElectricalData(
+        asset_id="site-1", timestamp=T0,
+        voltage=PhaseData(a=value(230.0, "V"), b=value(231.0, "V")),
+        active_power=PhaseData(a=value(1.5, "kW")),
+        frequency=value(50.0, "Hz"),
+        total_energy_kwh=value(1200.0, "kWh"),
+    )
+
+def _physical():
+    return RealtimePhysicalData(
+        asset_id="site-1", timestamp=T0,
+        temperature=PhysicalVariableValue(value=21.5, unit="°C"),
+        level=PhysicalVariableValue(value=0.7, unit="m", sensor_location="tank-1"),
+    )
+
+@pytest.fixture
+def client(monkeypatch):
+    async def fake_electrical(installation_id):
+        return _electrical()
+
+    async def fake_physical(installation_id):
+        return _physical()
+
+    monkeypatch.setattr(electrical, "get_realtime_electrical_data", fake_electrical)
+    monkeypatch.setattr(physical, "get_realtime_physical_data", fake_physical)
+    app = FastAPI()
+    app.include_router(electrical.router)
+    app.include_router(physical.router)
+    return TestClient(app)
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_default_realtime_output_is_unchanged(client, monkeypatch, fast):
+    monkeypatch.setattr(get_settings(), "FAST_JSON_RESPONSES", fast)
+    assert client.get("/installations/site-1/electrical/realtime").content == ELECTRICAL_JSON
+    assert client.get("/installations/site-1/physical/realtime").content == PHYSICAL_JSON
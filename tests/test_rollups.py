@@ -0,0 +1,177 @@
+# tests/test_rollups.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from bitergy_api.core.config import get_settings
+from bitergy_api.services import rollups
+from bitergy_api.services.rollups import Coverage, RollupTier, RollupWorker
+
+MINUTE = 60 * 1_000_000
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+DAY0 = 1_704_067_200_000_000 # 2024-01-01T00:00:00Z
+
+TIERS = [RollupTier("1m", MINUTE, "raw_1m"), RollupTier("1h", HOUR, "raw_1h"), RollupTier("1d", DAY, "raw_1d")]
+
+def _worker(**options) -> RollupWorker:
+    defaults = dict(interval_seconds=60, lag_seconds=120, backfill_days=1, max_windows=1440)
+    defaults.update(options)
+    return RollupWorker(TIERS, ["voltage"], **defaults)
+
+def _rfc3339(us: int) -> str:
+    return (datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=us)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _epoch_us(time: datetime) -> int:
+    return (time - datetime(1970, 1, 1, tzinfo=timezone.utc)) // timedelta(microseconds=1)
+
+class FakeInflux:
+    """
+    InfluxDB en memoria para el worker: marcas ya escritas por bucket y un punto
+    pivotado por ventana en cada consulta de rollup. `during_query` se ejecuta
+    mientras una consulta de rollup está en curso.
+    """
+
+    def __init__(self, coverage=None, during_query=None):
+        self.coverage = coverage or {} # bucket -> (first_us, last_us)
+        self.during_query = during_query
+        self.rollup_ranges = []
+        self.writes = []
+
+    async def get_query_api(self, lane, name):
+        return self
+
+    def get_influxdb_client(self):
+        return self
+
+    def write_api(self):
+        return self
+
+    def record_rows(self, rows):
+        pass
+
+    async def write(self, bucket, org, record):
+        self.writes.append((bucket, list(record)))
+
+    async def query_raw(self, query, org, params):
+        if 'first(column: "_time")' in query:
+            times = self.coverage.get(params["_bucket"])
+            if times is None:
+                return ""
+            return "".join(
+                f",result,table,_time\n,{name},{i},{_rfc3339(us)}\n\n" for i, (name, us) in enumerate(zip(("first", "last"), times))
+            )
+        start_us, stop_us = _epoch_us(params["_start"]), _epoch_us(params["_stop"])
+        self.rollup_ranges.append((params["_bucket"], start_us, stop_us))
+        if self.during_query is not None:
+            self.during_query()
+        every_us = params["_every"] // timedelta(microseconds=1)
+        rows = "".join(f",mean,0,{_rfc3339(t)},voltage,230.0\n" for t in range(start_us, stop_us, every_us))
+        return ",result,table,_time,_measurement,phase_a\n" + rows
+
+def _install(monkeypatch, fake: FakeInflux) -> None:
+    monkeypatch.setattr(rollups, "get_query_api", fake.get_query_api)
+    monkeypatch.setattr(rollups, "get_influxdb_client", fake.get_influxdb_client)
+
+def test_route_picks_coarsest_tier_that_divides_the_window():
+    worker = _worker()
+    for tier in TIERS:
+        worker.coverage[(tier.name, "site")] = Coverage(DAY0, DAY0 + 2 * DAY)
+    assert worker.route("site", DAY0, DAY0 + 3 * DAY, DAY) == (TIERS[2], DAY0, DAY0 + 2 * DAY)
+    assert worker.route("site", DAY0, DAY0 + 3 * DAY, 6 * HOUR) == (TIERS[1], DAY0, DAY0 + 2 * DAY)
+    assert worker.route("site", DAY0, DAY0 + 3 * DAY, 5 * MINUTE) == (TIERS[0], DAY0, DAY0 + 2 * DAY)
+    # Ventanas que no son múltiplo de ningún nivel van al bucket crudo
+    assert worker.route("site", DAY0, DAY0 + 3 * DAY, 90 * 1_000_000) is None
+    assert worker.route("site", DAY0, DAY0 + 3 * DAY, 30 * 1_000_000) is None
+
+def test_route_edges_fall_on_window_boundaries():
+    worker = _worker()
+    worker.coverage[("1h", "site")] = Coverage(DAY0, DAY0 + 10 * HOUR + 30 * MINUTE)
+    # Inicio a mitad de ventana: la primera ventana completa empieza en la hora siguiente
+    assert worker.route("site", DAY0 + 1, DAY0 + DAY, HOUR) == (TIERS[1], DAY0 + HOUR, DAY0 + 10 * HOUR)
+    # La marca de agua se redondea hacia abajo a la ventana pedida
+    assert worker.route("site", DAY0, DAY0 + DAY, 4 * HOUR) == (TIERS[1], DAY0, DAY0 + 8 * HOUR)
+    # Y nunca pasa del final pedido
+    assert worker.route("site", DAY0, DAY0 + 5 * HOUR, HOUR) == (TIERS[1], DAY0, DAY0 + 5 * HOUR)
+    # Ventanas de 1h sin ninguna completa en el nivel
+    assert worker.route("site", DAY0 + 10 * HOUR, DAY0 + DAY, HOUR) is None
+
+def test_route_falls_back_to_finer_tier_when_coarse_one_starts_later():
+    worker = _worker()
+    worker.coverage[("1m", "site")] = Coverage(DAY0, DAY0 + 2 * DAY)
+    worker.coverage[("1d", "site")] = Coverage(DAY0 + DAY, DAY0 + 2 * DAY)
+    assert worker.route("site", DAY0, DAY0 + 2 * DAY, DAY) == (TIERS[0], DAY0, DAY0 + 2 * DAY)
+    assert worker.route("site", DAY0 + DAY, DAY0 + 2 * DAY, DAY) == (TIERS[2], DAY0 + DAY, DAY0 + 2 * DAY)
+    assert worker.route("other", DAY0, DAY0 + 2 * DAY, DAY) is None
+
+def test_watermark_is_recovered_from_the_rollup_bucket_and_advances(monkeypatch):
+    """Un worker nuevo continúa donde se quedó el anterior en lugar de recalcular la historia."""
+    fake = FakeInflux(coverage={"raw_1m": (DAY0, DAY0 + 10 * MINUTE)})
+    _install(monkeypatch, fake)
+    worker = _worker()
+    now_us = DAY0 + 20 * MINUTE + 30 * 1_000_000
+
+    written = asyncio.run(worker._roll_up("site", TIERS[0], None, now_us))
+
+    # Hasta la última ventana cerrada hace al menos lag_seconds (120 s)
+    assert fake.rollup_ranges == [(get_settings().INFLUXDB_BUCKET, DAY0 + 11 * MINUTE, DAY0 + 18 * MINUTE)]
+    assert written == 7
+    assert worker.coverage[("1m", "site")] == Coverage(DAY0, DAY0 + 18 * MINUTE)
+    assert all(bucket == "raw_1m" for bucket, _ in fake.writes)
+
+    # La siguiente pasada solo procesa lo nuevo
+    asyncio.run(worker._roll_up("site", TIERS[0], None, now_us + 5 * MINUTE))
+    assert fake.rollup_ranges[-1] == (get_settings().INFLUXDB_BUCKET, DAY0 + 18 * MINUTE, DAY0 + 23 * MINUTE)
+
+def test_empty_tier_starts_from_backfill_and_coarse_tier_waits_for_finer(monkeypatch):
+    fake = FakeInflux()
+    _install(monkeypatch, fake)
+    worker = _worker(backfill_days=1)
+    now_us = DAY0 + 2 * DAY + 30 * MINUTE
+
+    asyncio.run(worker._roll_up("site", TIERS[0], None, now_us))
+    asyncio.run(worker._roll_up("site", TIERS[1], TIERS[0], now_us))
+
+    assert worker.coverage[("1m", "site")] == Coverage(DAY0 + DAY + 30 * MINUTE, DAY0 + 2 * DAY + 28 * MINUTE)
+    # El nivel 1h empieza en la primera hora completa del 1m y acaba donde acaba este
+    assert fake.rollup_ranges[-1] == ("raw_1m", DAY0 + DAY + HOUR, DAY0 + 2 * DAY)
+    assert worker.coverage[("1h", "site")] == Coverage(DAY0 + DAY + HOUR, DAY0 + 2 * DAY)
+
+def test_rewind_after_out_of_order_write(monkeypatch):
+    fake = FakeInflux()
+    _install(monkeypatch, fake)
+    worker = _worker()
+    worker.coverage[("1m", "site")] = Coverage(DAY0, DAY0 + 2 * DAY)
+    worker.coverage[("1h", "site")] = Coverage(DAY0, DAY0 + 2 * DAY)
+    worker.coverage[("1d", "site")] = Coverage(DAY0, DAY0 + 2 * DAY)
+
+    # Llega un dato atrasado de las 10:05:30 del primer día
+    worker.rewind("site", DAY0 + 10 * HOUR + 5 * MINUTE + 30 * 1_000_000)
+
+    assert worker.coverage[("1m", "site")].watermark_us == DAY0 + 10 * HOUR + 5 * MINUTE
+    assert worker.coverage[("1h", "site")].watermark_us == DAY0 + 10 * HOUR
+    assert worker.coverage[("1d", "site")].watermark_us == DAY0
+    # route() ya no sirve las ventanas afectadas desde los niveles
+    assert worker.route("site", DAY0, DAY0 + 2 * DAY, DAY) is None
+    assert worker.route("site", DAY0, DAY0 + 2 * DAY, HOUR) == (TIERS[1], DAY0, DAY0 + 10 * HOUR)
+
+    # La siguiente pasada vuelve a consolidar desde la ventana afectada
+    asyncio.run(worker._roll_up("site", TIERS[0], None, DAY0 + 2 * DAY))
+    assert fake.rollup_ranges[-1][1] == DAY0 + 10 * HOUR + 5 * MINUTE
+
+def test_rewind_during_a_run_is_not_lost(monkeypatch):
+    """Un dato atrasado que llega mientras se consolida retrasa también la marca que se anota al terminar."""
+    worker = _worker()
+    worker.coverage[("1m", "site")] = Coverage(DAY0, DAY0 + HOUR)
+    fake = FakeInflux(during_query=lambda: worker.rewind("site", DAY0 + 30 * MINUTE))
+    _install(monkeypatch, fake)
+
+    asyncio.run(worker._roll_up("site", TIERS[0], None, DAY0 + 2 * HOUR))
+
+    assert fake.rollup_ranges == [(get_settings().INFLUXDB_BUCKET, DAY0 + HOUR, DAY0 + 2 * HOUR - 2 * MINUTE)]
+    assert worker.coverage[("1m", "site")] == Coverage(DAY0, DAY0 + 30 * MINUTE)
+
+def test_rewind_never_goes_before_first_window():
+    worker = _worker()
+    worker.coverage[("1m", "site")] = Coverage(DAY0 + DAY, DAY0 + 2 * DAY)
+    worker.rewind("site", DAY0)
+    assert worker.coverage[("1m", "site")] == Coverage(DAY0 + DAY, DAY0 + DAY)
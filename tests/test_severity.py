@@ -0,0 +1,47 @@
+# tests/test_severity.py
+import random
+
+import pytest
+
+from bitergy_api.core.enums import SeverityLevel
+from bitergy_api.models.common import Thresholds
+from bitergy_api.services.data_provider import _calculate_severity
+from bitergy_api.services.severity import classify_series, classify_value, compile_thresholds, summarize_severity
+
+THRESHOLDS = [
+    Thresholds(critical_low=200.0, low=210.0, high=240.0, critical_high=250.0),
+    Thresholds(low=10.0, high=20.0),
+    Thresholds(critical_low=-5.0, critical_high=5.0),
+    Thresholds(low=0.0),
+    Thresholds(critical_high=1.0),
+    Thresholds(),
+    # Bordes coincidentes: manda el crítico
+    Thresholds(critical_low=10.0, low=10.0, high=10.0, critical_high=10.0),
+]
+
+@pytest.mark.parametrize("thresholds", THRESHOLDS)
+def test_classification_matches_reference(thresholds):
+    edges = [e for e in (thresholds.critical_low, thresholds.low, thresholds.high, thresholds.critical_high) if e is not None]
+    rng = random.Random(7)
+    # Los bordes exactos y sus vecinos son los casos que distinguen < de <=
+    values = [e + d for e in edges for d in (-1e-9, 0.0, 1e-9)]
+    values += [rng.uniform(-300, 300) for _ in range(2000)]
+    compiled = compile_thresholds(thresholds)
+    expected = [_calculate_severity(v, thresholds) for v in values]
+    assert classify_series(values, compiled) == expected
+    assert [classify_value(v, compiled) for v in values] == expected
+
+def test_no_thresholds_is_unknown():
+    assert compile_thresholds(None) is None
+    assert classify_value(1.0, None) == SeverityLevel.UNKNOWN
+    assert classify_series([1.0, 2.0], None) == [SeverityLevel.UNKNOWN] * 2
+
+def test_summarize_severity_weights_by_time():
+    levels = [SeverityLevel.NORMAL, SeverityLevel.HIGH, SeverityLevel.UNKNOWN, SeverityLevel.NORMAL]
+    summary = summarize_severity([0, 3_000_000, 4_000_000, 10_000_000], levels)
+    assert summary["counts"] == {SeverityLevel.NORMAL: 2, SeverityLevel.HIGH: 1, SeverityLevel.UNKNOWN: 1}
+    assert summary["seconds"] == {SeverityLevel.NORMAL: 3.0, SeverityLevel.HIGH: 1.0, SeverityLevel.UNKNOWN: 6.0}
+    assert summary["out_of_band_percent"] == 25.0
+
+def test_summarize_severity_without_known_time():
+    assert summarize_severity([0], [SeverityLevel.HIGH])["out_of_band_percent"] == 0.0
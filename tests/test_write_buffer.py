@@ -0,0 +1,101 @@
+# tests/test_write_buffer.py
+import asyncio
+
+from bitergy_api.services.write_buffer import WriteBuffer
+
+class FakeWriter:
+    """Escritor en memoria: falla con los errores de `failures` (uno por llamada) antes de aceptar."""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+        self.written = []
+
+    async def __call__(self, batch):
+        self.calls.append(list(batch))
+        if self.failures:
+            raise self.failures.pop(0)
+        self.written.extend(batch)
+
+class HTTPError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+def _buffer(write, **options):
+    defaults = dict(max_lines=10, flush_lines=4, flush_interval=0.01, max_retries=3,
+                    retry_base_seconds=0.001, retry_max_seconds=0.002)
+    defaults.update(options)
+    return WriteBuffer(write, **defaults)
+
+def _lines(prefix, n):
+    return [f"{prefix}{i}" for i in range(n)]
+
+def test_offer_is_all_or_nothing():
+    buffer = _buffer(FakeWriter())
+    assert buffer.offer(_lines("a", 8))
+    assert not buffer.offer(_lines("b", 3))
+    assert buffer.offer(_lines("c", 2))
+    assert (buffer.rejected_batches, buffer.rejected_lines, buffer.accepted_lines) == (1, 3, 10)
+
+def test_transient_failures_are_retried_in_order():
+    writer = FakeWriter([HTTPError(503), ConnectionError("reset"), HTTPError(429)])
+
+    async def scenario():
+        buffer = _buffer(writer)
+        buffer.start()
+        buffer.offer(_lines("a", 6))
+        await asyncio.sleep(0.1)
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert writer.written == _lines("a", 6)
+    assert (buffer.retries, buffer.dropped_lines, buffer.written_lines) == (3, 0, 6)
+
+def test_client_errors_are_dropped_without_retry():
+    writer = FakeWriter([HTTPError(400)])
+
+    async def scenario():
+        buffer = _buffer(writer)
+        buffer.offer(_lines("a", 6))
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert len(writer.calls) == 2
+    assert writer.written == ["a4", "a5"]
+    assert (buffer.retries, buffer.dropped_lines) == (0, 4)
+
+def test_stop_during_backoff_requeues_batch_at_head():
+    writer = FakeWriter([HTTPError(503)])
+
+    async def scenario():
+        buffer = _buffer(writer, retry_base_seconds=10, retry_max_seconds=10)
+        buffer.start()
+        buffer.offer(_lines("a", 6))
+        await asyncio.sleep(0.05)
+        assert len(writer.calls) == 1 and buffer.retries == 1
+        # Lo que llega durante el backoff va detrás del lote que se reintenta
+        buffer.offer(_lines("b", 2))
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    assert writer.written == _lines("a", 6) + _lines("b", 2)
+
+def test_on_written_fires_after_all_batches_of_offer():
+    writer = FakeWriter([HTTPError(503)])
+    fired = []
+
+    async def scenario():
+        buffer = _buffer(writer, flush_lines=3)
+        buffer.offer(_lines("a", 2), on_written=lambda: fired.append(("a", len(writer.written))))
+        buffer.offer(_lines("b", 5), on_written=lambda: fired.append(("b", len(writer.written))))
+        buffer.offer(["c0"], on_written=lambda: 1 / 0)
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    # max_retries=0 en stop(): el primer lote (a0, a1, b0) se descarta y "a" se avisa igualmente
+    assert writer.written == ["b1", "b2", "b3", "b4", "c0"]
+    # b4 sale en el tercer lote, junto con c0
+    assert fired == [("a", 0), ("b", 5)]